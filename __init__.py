@@ -1,3 +1,76 @@
-from .llm_client import LLMClient
-from .conversation import Conversation
-from .chat import load_config
+"""LLM client library; public names are imported on first access."""
+import importlib
+from typing import TYPE_CHECKING
+
+_EXPORTS = {
+    "LLMClient": "llm_client",
+    "create_client": "llm_client",
+    "MockLLMClient": "mock_client",
+    "Conversation": "conversation",
+    "load_config": "chat",
+    "build_client": "chat",
+    "Agent": "agent",
+    "WerewolfPlayer": "agent",
+    "MultiAgentSystem": "multi_agent",
+    "WerewolfGame": "multi_agent",
+    "ContextPolicy": "context",
+    "ResponseCache": "cache",
+    "RateLimiter": "rate_limit",
+    "RetryPolicy": "rate_limit",
+    "RoutedClient": "router",
+    "RequestScheduler": "scheduler",
+    "request_priority": "scheduler",
+    "SharedTranscript": "transcript",
+    "History": "history",
+    "MemoryStore": "memory",
+    "ToolRegistry": "tools",
+    "SessionStore": "session_store",
+    "CassetteTransport": "cassette",
+    "MetricsCollector": "streaming",
+    "JsonStreamParser": "json_stream",
+    "StopMatcher": "stop",
+    "Substring": "stop",
+    "Regex": "stop",
+    "MaxSentences": "stop",
+    "MetricsAggregator": "hooks",
+    "JsonlTraceWriter": "hooks",
+    "call_context": "hooks",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .llm_client import LLMClient, create_client
+    from .mock_client import MockLLMClient
+    from .conversation import Conversation
+    from .chat import load_config, build_client
+    from .agent import Agent, WerewolfPlayer
+    from .multi_agent import MultiAgentSystem, WerewolfGame
+    from .context import ContextPolicy
+    from .cache import ResponseCache
+    from .rate_limit import RateLimiter, RetryPolicy
+    from .router import RoutedClient
+    from .scheduler import RequestScheduler, request_priority
+    from .transcript import SharedTranscript
+    from .history import History
+    from .memory import MemoryStore
+    from .tools import ToolRegistry
+    from .session_store import SessionStore
+    from .cassette import CassetteTransport
+    from .streaming import MetricsCollector
+    from .json_stream import JsonStreamParser
+    from .stop import StopMatcher, Substring, Regex, MaxSentences
+    from .hooks import MetricsAggregator, JsonlTraceWriter, call_context
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,11 +1,39 @@
 """Agent module for creating AI agents with specific roles."""
+import sys
 from typing import Optional
-from .conversation import Conversation
-from .llm_client import LLMClient
+
+try:
+    from .conversation import Conversation
+    from .llm_client import LLMClient
+    from .context import ContextPolicy
+    from .transcript import SharedTranscript
+    from .memory import MemoryStore
+    from .tools import ToolRegistry
+except ImportError:
+    from conversation import Conversation
+    from llm_client import LLMClient
+    from context import ContextPolicy
+    from transcript import SharedTranscript
+    from memory import MemoryStore
+    from tools import ToolRegistry
+
+
+# Rules shared by every role-playing agent.
+ROLEPLAY_RULES = """
+        # Role-Playing Instructions
+        **【CORE RULES: STRICT PROHIBITION AGAINST BREAKING CHARACTER】**
+        1.  **Identity Constraint:** Throughout the entire conversation, you are **ABSOLUTELY FORBIDDEN** to reveal or imply that you are an Artificial Intelligence, a Large Language Model, a program, or any non-human entity. You are 【Character's Name/Identity】.
+        2.  **Response Requirement:** All your answers must be **STRICTLY** given from the 'I' first-person perspective of your character. The tone and content must align with your personality and the established scenario.
+        3.  **Interaction Style:** Focus on 【E.g., Dialogue Exchange / Situational Description】. Do not provide any systematic summaries or analyses that break character.
+        """
 
 
 class Agent:
-    """AI agent with specific role and personality."""
+    """AI agent with specific role and personality.
+    
+    With ``tools`` set, ``respond`` lets the model call the registered
+    functions before it answers.
+    """
     
     def __init__(
         self,
@@ -14,24 +42,24 @@ class Agent:
         role: str = "",
         personality: str = "",
         background: str = "",
+        context_policy: Optional[ContextPolicy] = None,
+        memory: Optional[MemoryStore] = None,
+        tools: Optional[ToolRegistry] = None,
     ):
         self.client = client
         self.name = name
         self.role = role
         self.personality = personality
         self.background = background
-        self.conversation = Conversation(client, self._build_system_prompt())
+        self.memory = memory
+        self.tools = tools
+        self.conversation = Conversation(client, self._build_system_prompt(), context_policy, memory)
+        self.conversation.agent = name
     
     def _build_system_prompt(self) -> str:
         """Build system prompt from role and personality."""
         parts = []
-        parts.append( """
-        # Role-Playing Instructions
-        **【CORE RULES: STRICT PROHIBITION AGAINST BREAKING CHARACTER】**
-        1.  **Identity Constraint:** Throughout the entire conversation, you are **ABSOLUTELY FORBIDDEN** to reveal or imply that you are an Artificial Intelligence, a Large Language Model, a program, or any non-human entity. You are 【Character's Name/Identity】.
-        2.  **Response Requirement:** All your answers must be **STRICTLY** given from the 'I' first-person perspective of your character. The tone and content must align with your personality and the established scenario.
-        3.  **Interaction Style:** Focus on 【E.g., Dialogue Exchange / Situational Description】. Do not provide any systematic summaries or analyses that break character.
-        """)
+        parts.append(ROLEPLAY_RULES)
         if self.role:
             parts.append(f"""
                         **【ROLE DEFINITION】**
@@ -45,16 +73,66 @@ class Agent:
             parts.append(f"""**【BACKGROUND INFORMATION·】**
                           {self.background}
                         """)
-        return "\n".join(parts) if parts else ""
+        # Agents built from the same configuration share one prompt string.
+        return sys.intern("\n".join(parts)) if parts else ""
     
     def respond(self, message: str, **kwargs) -> str:
         """Generate response to a message."""
+        if self.tools:
+            return self.conversation.send_with_tools(message, self.tools, **kwargs)
         return self.conversation.send(message, **kwargs)
     
     def stream_respond(self, message: str, **kwargs):
-        """Stream response to a message."""
+        """Stream response to a message; with tools the final answer arrives as one chunk."""
+        if self.tools:
+            yield self.conversation.send_with_tools(message, self.tools, **kwargs)
+            return
         yield from self.conversation.stream_send(message, **kwargs)
     
+    async def arespond(self, message: str, **kwargs) -> str:
+        """Generate response to a message without blocking the event loop."""
+        if self.tools:
+            return await self.conversation.asend_with_tools(message, self.tools, **kwargs)
+        return await self.conversation.asend(message, **kwargs)
+    
+    async def astream_respond(self, message: str, **kwargs):
+        """Asynchronously stream response to a message."""
+        if self.tools:
+            yield await self.conversation.asend_with_tools(message, self.tools, **kwargs)
+            return
+        async for chunk in self.conversation.astream_send(message, **kwargs):
+            yield chunk
+    
+    def remember(self, text: str):
+        """Add background text to the agent's long-term memory."""
+        if self.memory is None:
+            raise ValueError(f"agent {self.name!r} has no memory store")
+        self.memory.add(text)
+    
+    def join(self, transcript: SharedTranscript, include_history: bool = True):
+        """Read public history from a shared transcript, speaking as this agent."""
+        self.conversation.attach_transcript(transcript, self.name, include_history)
+    
+    def speak(self, **kwargs) -> str:
+        """Say the next line publicly, appending it to the shared transcript."""
+        response = self.conversation.complete(**kwargs)
+        self.conversation.transcript.append(self.name, response)
+        return response
+    
+    async def aspeak(self, **kwargs) -> str:
+        """Async variant of ``speak``."""
+        response = await self.conversation.acomplete(**kwargs)
+        self.conversation.transcript.append(self.name, response)
+        return response
+    
+    def reply(self, **kwargs) -> str:
+        """Respond privately to the current history without a new message."""
+        return self.conversation.reply(**kwargs)
+    
+    async def areply(self, **kwargs) -> str:
+        """Async variant of ``reply``."""
+        return await self.conversation.areply(**kwargs)
+    
     def reset(self):
         """Reset agent's conversation history."""
         self.conversation.clear()
@@ -62,3 +140,25 @@ class Agent:
     def get_history(self):
         """Get agent's conversation history."""
         return self.conversation.get_history()
+
+
+class WerewolfPlayer(Agent):
+    """Agent taking part in a ``WerewolfGame``.
+    
+    ``game_role`` fixes the player's secret role; leave it None to let the
+    game deal roles at random.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        client: LLMClient,
+        game_role: Optional[str] = None,
+        personality: str = "",
+        background: str = "",
+        context_policy: Optional[ContextPolicy] = None,
+    ):
+        role = (f"{name}, a player in a game of Werewolf. The moderator tells you your secret role "
+                "and how to answer; argue your case in character.")
+        super().__init__(client, name, role, personality, background, context_policy)
+        self.game_role = game_role
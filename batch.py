@@ -0,0 +1,238 @@
+"""Resumable batch runner for JSONL prompt jobs."""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional, Callable, Set
+
+try:
+    from .llm_client import LLMClient
+    from .chat import load_config, build_client
+    from .scheduler import BATCH, request_priority
+    from .rate_limit import RetryPolicy
+except ImportError:
+    from llm_client import LLMClient
+    from chat import load_config, build_client
+    from scheduler import BATCH, request_priority
+    from rate_limit import RetryPolicy
+
+
+OVERRIDE_KEYS = ("temperature", "max_tokens")
+
+
+class BatchRunner:
+    """Streams a JSONL file of prompts through an LLMClient with bounded concurrency.
+
+    Each input line is an object with ``user_prompt`` and optional ``id``,
+    ``system_prompt``, ``temperature`` and ``max_tokens``. Results are appended
+    to the output file as they finish, one JSON object per line, tagged with
+    the input line index. A small checkpoint file records the index below which
+    every line is finished plus the few finished lines above it, so a crashed
+    run resumes without redoing work and memory stays bounded by the
+    concurrency rather than the input size. Invalid lines and permanent
+    failures are written as records with an ``error`` and count as finished.
+    Transient failures (timeouts, 429, 5xx) are written with
+    ``"retryable": true`` and listed in the checkpoint, so a resumed run
+    retries them and appends a newer record for the same index. Requests run
+    in the ``batch`` priority class, so a shared ``RequestScheduler`` serves
+    interactive users first.
+    """
+    
+    def __init__(
+        self,
+        client: LLMClient,
+        concurrency: int = 16,
+        checkpoint_every: int = 50,
+        progress_every: float = 5.0,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        priority: str = BATCH,
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.progress_every = progress_every
+        self.on_progress = on_progress or print_progress
+        self.priority = priority
+        self._watermark = 0
+        self._done: Set[int] = set()
+        self._retry: Set[int] = set()
+        self._stats: Dict = {}
+    
+    def run(self, input_path: str, output_path: str, checkpoint_path: Optional[str] = None) -> Dict:
+        """Run the batch to completion and return final stats."""
+        return asyncio.run(self.arun(input_path, output_path, checkpoint_path))
+    
+    async def arun(self, input_path: str, output_path: str, checkpoint_path: Optional[str] = None) -> Dict:
+        """Async variant of ``run``."""
+        checkpoint_path = checkpoint_path or output_path + ".ckpt"
+        self._load_checkpoint(checkpoint_path, output_path)
+        self._stats = {"completed": 0, "failed": 0, "skipped": 0, "elapsed": 0.0, "items_per_second": 0.0}
+        start = last_report = time.perf_counter()
+        since_checkpoint = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+        crashed = []
+        
+        def reap(task: asyncio.Task):
+            tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                crashed.append(task.exception())
+        
+        with open(input_path, 'r', encoding='utf-8') as src, open(output_path, 'a', encoding='utf-8') as out:
+            def finish(index: int, record: Optional[Dict]):
+                nonlocal since_checkpoint, last_report
+                if record is not None:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                self._mark_done(index, record is not None and record.get("retryable", False))
+                since_checkpoint += 1
+                if since_checkpoint >= self.checkpoint_every:
+                    self._save_checkpoint(checkpoint_path, out.tell())
+                    since_checkpoint = 0
+                now = time.perf_counter()
+                self._stats["elapsed"] = now - start
+                self._stats["items_per_second"] = self._stats["completed"] / max(now - start, 1e-9)
+                if now - last_report >= self.progress_every:
+                    last_report = now
+                    self.on_progress(dict(self._stats))
+            
+            async def process(index: int, item):
+                try:
+                    try:
+                        record = await self._complete(index, item)
+                    except Exception as e:
+                        record = {"index": index, "id": index, "error": f"{type(e).__name__}: {e}"}
+                    self._stats["completed" if "error" not in record else "failed"] += 1
+                    finish(index, record)
+                finally:
+                    semaphore.release()
+            
+            for index, line in enumerate(src):
+                if crashed:
+                    break
+                if (index < self._watermark or index in self._done) and index not in self._retry:
+                    continue
+                line = line.strip()
+                if not line:
+                    self._stats["skipped"] += 1
+                    finish(index, None)
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    self._stats["failed"] += 1
+                    finish(index, {"index": index, "id": index, "error": f"invalid input line: {e}"})
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(process(index, item))
+                tasks.add(task)
+                task.add_done_callback(reap)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self._save_checkpoint(checkpoint_path, out.tell())
+            if crashed:
+                raise crashed[0]
+        
+        self._stats["elapsed"] = time.perf_counter() - start
+        self.on_progress(dict(self._stats))
+        return dict(self._stats)
+    
+    async def _complete(self, index: int, item) -> Dict:
+        """Run one prompt and build its output record."""
+        if not isinstance(item, dict) or not isinstance(item.get("user_prompt"), str):
+            return {"index": index, "id": item.get("id", index) if isinstance(item, dict) else index,
+                    "error": "invalid input line: expected an object with a string user_prompt"}
+        messages = []
+        if item.get("system_prompt"):
+            messages.append({"role": "system", "content": item["system_prompt"]})
+        messages.append({"role": "user", "content": item["user_prompt"]})
+        overrides = {k: item[k] for k in OVERRIDE_KEYS if k in item}
+        record = {"index": index, "id": item.get("id", index)}
+        try:
+            with request_priority(self.priority):
+                record["response"] = await self.client.achat(messages, **overrides)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            if isinstance(e, TimeoutError) or (self.client.retry_policy or RetryPolicy()).should_retry(e):
+                record["retryable"] = True
+        return record
+    
+    def _mark_done(self, index: int, retry: bool = False):
+        """Record a finished line and advance the contiguous watermark.
+
+        A line finished with a transient failure is kept in the retry set, so
+        the watermark can move past it while a resumed run still redoes it.
+        """
+        if retry:
+            self._retry.add(index)
+        else:
+            self._retry.discard(index)
+        if index >= self._watermark:
+            self._done.add(index)
+        while self._watermark in self._done:
+            self._done.remove(self._watermark)
+            self._watermark += 1
+    
+    def _save_checkpoint(self, path: str, offset: int):
+        """Atomically write the resume state."""
+        state = {"next": self._watermark, "done": sorted(self._done), "retry": sorted(self._retry), "offset": offset}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    
+    def _load_checkpoint(self, path: str, output_path: str):
+        """Restore resume state from the checkpoint and the output written after it."""
+        self._watermark, self._done, self._retry, offset = 0, set(), set(), 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._watermark, self._done, offset = state["next"], set(state["done"]), state["offset"]
+            self._retry = set(state.get("retry", ()))
+        if not os.path.exists(output_path):
+            return
+        with open(output_path, 'rb+') as out:
+            # Drop a partially written last line left behind by a crash.
+            out.seek(0, os.SEEK_END)
+            size = out.tell()
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                out.seek(start)
+                newline = out.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                out.truncate(end)
+                size = end
+            out.seek(min(offset, size))
+            for line in out:
+                record = json.loads(line)
+                self._mark_done(record["index"], record.get("retryable", False))
+
+
+def print_progress(stats: Dict):
+    """Default progress reporter."""
+    print(f"completed {stats['completed']}, failed {stats['failed']}, "
+          f"{stats['items_per_second']:.2f} items/s, {stats['elapsed']:.1f}s elapsed")
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the configured model.")
+    parser.add_argument("input", help="input JSONL with system_prompt/user_prompt per line")
+    parser.add_argument("output", help="output JSONL, appended to on resume")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--checkpoint", default=None)
+    args = parser.parse_args()
+    
+    client = build_client(load_config(args.config))
+    BatchRunner(client, concurrency=args.concurrency).run(args.input, args.output, args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
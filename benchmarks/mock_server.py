@@ -0,0 +1,156 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint."""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import uuid
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import HTTPError, read_request, send_json, start_sse, send_sse, completion_payload, chunk_payload
+
+
+class MockServer:
+    """Serves synthetic completions with configurable timing and failures.
+
+    ``latency`` is the delay before the first token, ``tokens_per_second``
+    paces the rest of the reply (None for no pacing), ``chunk_tokens`` sets how
+    many tokens each SSE chunk carries, and ``error_rate`` of the requests fail
+    with ``error_status``. Replies are ``reply_tokens`` words long.
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_second: Optional[float] = None,
+        reply_tokens: int = 64,
+        chunk_tokens: int = 1,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.counts = {"requests": 0, "streams": 0, "errors": 0}
+    
+    def _tokens(self, body: Dict):
+        n = min(self.reply_tokens, body.get("max_tokens") or self.reply_tokens)
+        return [f"w{i} " for i in range(n)]
+    
+    def _usage(self, body: Dict, completion_tokens: int) -> Dict:
+        prompt = sum(len(str(m.get("content") or "")) // 4 + 4 for m in body.get("messages") or [])
+        return {"prompt_tokens": prompt, "completion_tokens": completion_tokens,
+                "total_tokens": prompt + completion_tokens}
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                if request.method == "GET" and request.path == "/stats":
+                    await send_json(writer, 200, self.counts)
+                    continue
+                if not request.path.endswith("/chat/completions"):
+                    await send_json(writer, 404, {"error": {"message": "not found"}})
+                    continue
+                if not await self.complete(request.json(), writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, HTTPError):
+            pass
+        finally:
+            writer.close()
+    
+    async def complete(self, body: Dict, writer: asyncio.StreamWriter) -> bool:
+        """Answer one completion request; returns whether the connection stays open."""
+        self.counts["requests"] += 1
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.counts["errors"] += 1
+            await send_json(writer, self.error_status, {"error": {"message": "injected failure", "type": "mock"}})
+            return True
+        tokens = self._tokens(body)
+        model = body.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not body.get("stream"):
+            if self.tokens_per_second:
+                await asyncio.sleep(len(tokens) / self.tokens_per_second)
+            payload = completion_payload(completion_id, model, "".join(tokens))
+            payload["usage"] = self._usage(body, len(tokens))
+            await send_json(writer, 200, payload)
+            return True
+        
+        self.counts["streams"] += 1
+        await start_sse(writer)
+        step = self.chunk_tokens
+        for i in range(0, len(tokens), step):
+            if i and self.tokens_per_second:
+                await asyncio.sleep(step / self.tokens_per_second)
+            await send_sse(writer, json.dumps(chunk_payload(completion_id, model, "".join(tokens[i:i + step]))))
+        await send_sse(writer, json.dumps(chunk_payload(completion_id, model, None, "stop")))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = chunk_payload(completion_id, model, None)
+            usage["choices"] = []
+            usage["usage"] = self._usage(body, len(tokens))
+            await send_sse(writer, json.dumps(usage))
+        await send_sse(writer, "[DONE]")
+        return False
+    
+    async def serve(self, host: str = "127.0.0.1", port: int = 0, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
+def _run(config: Dict, conn):
+    asyncio.run(MockServer(**config).serve(ready=conn.send))
+
+
+def start_mock_server(**config) -> Tuple[multiprocessing.Process, str]:
+    """Start a mock server in a child process; returns the process and its base URL.
+
+    Running it out of process keeps its CPU time and memory out of the
+    client-side measurements.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_run, args=(config, child), daemon=True)
+    process.start()
+    if not parent.poll(10):
+        process.terminate()
+        raise RuntimeError("mock server did not start")
+    return process, f"http://127.0.0.1:{parent.recv()}/v1"
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--reply-tokens", type=int, default=64)
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    
+    server = MockServer(args.latency, args.tokens_per_second, args.reply_tokens, args.chunk_tokens,
+                        args.error_rate, args.error_status)
+    print(f"Mock server on http://{args.host}:{args.port}/v1")
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
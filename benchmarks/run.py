@@ -0,0 +1,272 @@
+"""Benchmarks for client, conversation and multi-agent overhead against a local mock server."""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient
+from conversation import Conversation
+from agent import Agent
+from multi_agent import MultiAgentSystem
+from rate_limit import RetryPolicy
+from mock_server import start_mock_server
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCENARIOS = ("chat", "stream_chat", "conversation", "broadcast", "round_robin")
+
+# A scenario returns per-operation latencies in seconds, the error count, the
+# seconds spent in its timed part and extra fields.
+Outcome = Tuple[List[float], int, float, Dict]
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def make_client(url: str, args) -> LLMClient:
+    """A client that has already sent one untimed request, so SDK and connection setup are not measured."""
+    client = LLMClient(api_key="bench", base_url=url, model="mock", max_tokens=args.reply_tokens,
+                       retry_policy=RetryPolicy(max_retries=args.retries, base_delay=0.01, max_delay=0.1))
+    try:
+        client.chat([{"role": "user", "content": "Warm-up."}])
+    except Exception:
+        pass
+    return client
+
+
+def timed(fn: Callable) -> Tuple[Optional[float], bool]:
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception:
+        return None, False
+    return time.perf_counter() - start, True
+
+
+def run_concurrently(fn: Callable, requests: int, concurrency: int) -> Tuple[List[float], int]:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda _: timed(fn), range(requests)))
+    return [latency for latency, ok in outcomes if ok], sum(1 for _, ok in outcomes if not ok)
+
+
+def bench_chat(url: str, args) -> Outcome:
+    client = make_client(url, args)
+    messages = [{"role": "user", "content": "Benchmark prompt."}]
+    start = time.perf_counter()
+    latencies, errors = run_concurrently(lambda: client.chat(messages), args.requests, args.concurrency)
+    duration = time.perf_counter() - start
+    client.close()
+    return latencies, errors, duration, {}
+
+
+def bench_stream_chat(url: str, args) -> Outcome:
+    client = make_client(url, args)
+    messages = [{"role": "user", "content": "Benchmark prompt."}]
+    ttfts = []
+    
+    def stream():
+        start = time.perf_counter()
+        first = None
+        for _ in client.stream_chat(messages):
+            if first is None:
+                first = time.perf_counter() - start
+        ttfts.append(first or 0.0)
+    
+    start = time.perf_counter()
+    latencies, errors = run_concurrently(stream, args.requests, args.concurrency)
+    duration = time.perf_counter() - start
+    client.close()
+    return latencies, errors, duration, {"ttft_ms": summarize(ttfts)}
+
+
+def bench_conversation(history: int) -> Callable:
+    def run(url: str, args) -> Outcome:
+        client = make_client(url, args)
+        conversation = Conversation(client, "You are a benchmark assistant.")
+        for i in range(history):
+            conversation.add_message("user", f"Earlier question number {i}?")
+            conversation.add_message("assistant", f"Earlier answer number {i}.")
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for i in range(args.turns):
+            latency, ok = timed(lambda: conversation.send(f"Question {i}?"))
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+        duration = time.perf_counter() - start
+        client.close()
+        return latencies, errors, duration, {"history": history}
+    return run
+
+
+def _agents(system: MultiAgentSystem, client: LLMClient, count: int):
+    for i in range(count):
+        system.add_agent(Agent(client, f"Agent{i}", "player", "calm", "benchmark participant"))
+
+
+def bench_broadcast(url: str, args) -> Outcome:
+    client = make_client(url, args)
+    system = MultiAgentSystem(shared_transcript=args.shared_transcript)
+    _agents(system, client, args.agents)
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        latency, ok = timed(lambda: system.broadcast(f"Round {i}: speak.", max_concurrency=args.agents))
+        errors += len(system.last_errors) + (0 if ok else 1)
+        if ok:
+            latencies.append(latency)
+    duration = time.perf_counter() - start
+    client.close()
+    return latencies, errors, duration, {"agents": args.agents}
+
+
+def bench_round_robin(url: str, args) -> Outcome:
+    client = make_client(url, args)
+    system = MultiAgentSystem(shared_transcript=args.shared_transcript)
+    _agents(system, client, args.agents)
+    records = []
+    # Each turn is one model call, so the call records time every turn separately.
+    client.add_hook(records.append)
+    start = time.perf_counter()
+    _, ok = timed(lambda: system.round_robin("Let us begin.", rounds=args.rounds))
+    duration = time.perf_counter() - start
+    client.close()
+    latencies = [record.latency for record in records if record.error is None]
+    errors = len(records) - len(latencies) + (0 if ok else 1)
+    return latencies, errors, duration, {"agents": args.agents}
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds."""
+    return {
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "mean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def measure(name: str, scenario: Callable, url: str, args) -> Dict:
+    """Run a scenario for timing, then once more under tracemalloc for peak memory."""
+    latencies, errors, duration, extra = scenario(url, args)
+    result = {
+        "name": name,
+        "operations": len(latencies),
+        "errors": errors,
+        "duration_s": duration,
+        "throughput_ops": len(latencies) / duration if duration else 0.0,
+        "latency_ms": summarize(latencies),
+        **extra,
+    }
+    if args.memory:
+        tracemalloc.start()
+        scenario(url, args)
+        result["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result
+
+
+def compare(results: List[Dict], baseline_path: str, threshold: float) -> List[str]:
+    """Report throughput and p95 changes against a saved run; returns the regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get(result["name"])
+        if old is None:
+            continue
+        throughput = (result["throughput_ops"] - old["throughput_ops"]) / old["throughput_ops"] if old["throughput_ops"] else 0.0
+        p95 = (result["latency_ms"]["p95"] - old["latency_ms"]["p95"]) / old["latency_ms"]["p95"] if old["latency_ms"]["p95"] else 0.0
+        line = f"{result['name']:<20} throughput {throughput:+.1%}  p95 {p95:+.1%}"
+        if throughput < -threshold or p95 > threshold:
+            regressions.append(result["name"])
+            line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the library against a local mock server.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--history", default="0,100,1000", help="history lengths (turns) for the conversation scenario")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--agents", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--shared-transcript", action="store_true")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02, help="mock server seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--reply-tokens", type=int, default=64)
+    parser.add_argument("--chunk-tokens", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc pass")
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+    
+    scenarios = {
+        "chat": bench_chat,
+        "stream_chat": bench_stream_chat,
+        "broadcast": bench_broadcast,
+        "round_robin": bench_round_robin,
+    }
+    selected = []
+    for name in args.scenarios.split(","):
+        name = name.strip()
+        if name == "conversation":
+            selected += [(f"conversation_h{h}", bench_conversation(int(h))) for h in args.history.split(",")]
+        elif name in scenarios:
+            selected.append((name, scenarios[name]))
+        else:
+            parser.error(f"unknown scenario: {name}")
+    
+    process, url = start_mock_server(
+        latency=args.latency, tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens,
+        chunk_tokens=args.chunk_tokens, error_rate=args.error_rate, error_status=args.error_status,
+    )
+    results = []
+    try:
+        for name, scenario in selected:
+            result = measure(name, scenario, url, args)
+            results.append(result)
+            latency = result["latency_ms"]
+            memory = f"  peak {result['peak_memory_kb']:.0f}KB" if "peak_memory_kb" in result else ""
+            print(f"{name:<20} {result['throughput_ops']:8.1f} ops/s  p50 {latency['p50']:7.1f}ms  "
+                  f"p95 {latency['p95']:7.1f}ms  p99 {latency['p99']:7.1f}ms  errors {result['errors']}{memory}")
+    finally:
+        process.terminate()
+    
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Saved {output}")
+    
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
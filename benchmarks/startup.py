@@ -0,0 +1,105 @@
+"""Import-time and first-request latency benchmark with budgets."""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_server import start_mock_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+HEAVY_MODULES = ("openai", "pydantic", "httpx", "yaml")
+
+# Runs in a fresh interpreter so every sample pays the full import cost.
+CHILD = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+url, config = sys.argv[2], sys.argv[3]
+t0 = time.perf_counter()
+import llm_client, conversation, agent, chat
+t1 = time.perf_counter()
+loaded = [m for m in %r if m in sys.modules]
+client = llm_client.LLMClient(api_key="bench", base_url=url, model="mock")
+t2 = time.perf_counter()
+chat.load_config(config)
+t3 = time.perf_counter()
+chat.load_config(config)
+t4 = time.perf_counter()
+client.chat([{"role": "user", "content": "hi"}])
+t5 = time.perf_counter()
+client.chat([{"role": "user", "content": "hi"}])
+t6 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "client_init_ms": (t2 - t1) * 1000,
+    "load_config_ms": (t3 - t2) * 1000,
+    "load_config_cached_ms": (t4 - t3) * 1000,
+    "first_request_ms": (t5 - t4) * 1000,
+    "second_request_ms": (t6 - t5) * 1000,
+    "loaded_on_import": loaded,
+}))
+""" % (HEAVY_MODULES,)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Measure import time and first-request latency.")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--config", default=os.path.join(ROOT, "example_config.yaml"))
+    parser.add_argument("--import-budget-ms", type=float, default=150.0)
+    parser.add_argument("--first-request-budget-ms", type=float, default=2000.0)
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/results/startup-<timestamp>.json)")
+    args = parser.parse_args()
+    
+    process, url = start_mock_server()
+    samples = []
+    try:
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, "-c", CHILD, ROOT, url, args.config],
+                                 capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout))
+    finally:
+        process.terminate()
+    
+    result = {key: statistics.median(s[key] for s in samples) for key in samples[0] if key.endswith("_ms")}
+    result["loaded_on_import"] = samples[0]["loaded_on_import"]
+    for key, value in result.items():
+        if key.endswith("_ms"):
+            print(f"{key:<24} {value:8.1f} ms")
+    print(f"{'loaded_on_import':<24} {', '.join(result['loaded_on_import']) or '-'}")
+    
+    failures = []
+    if result["import_ms"] > args.import_budget_ms:
+        failures.append(f"import {result['import_ms']:.1f}ms > {args.import_budget_ms}ms")
+    if result["first_request_ms"] > args.first_request_budget_ms:
+        failures.append(f"first request {result['first_request_ms']:.1f}ms > {args.first_request_budget_ms}ms")
+    if result["loaded_on_import"]:
+        failures.append("heavy modules loaded on import: " + ", ".join(result["loaded_on_import"]))
+    
+    output = args.output or os.path.join(RESULTS_DIR, "startup-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "result": result,
+            "failures": failures,
+        }, f, indent=2)
+    print(f"Saved {output}")
+    
+    for failure in failures:
+        print("BUDGET EXCEEDED:", failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
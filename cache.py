@@ -0,0 +1,164 @@
+"""Exact-match response cache for LLMClient."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+
+def make_cache_key(params: Dict) -> str:
+    """Hash model, messages and sampling params into a canonical key."""
+    params = {k: v for k, v in params.items() if k not in ('stream', 'timeout')}
+    params['messages'] = list(params.get('messages') or [])
+    canonical = json.dumps(params, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Bounded in-memory LRU in front of an optional SQLite store.
+
+    Responses are stored as the list of chunks they were produced with, so a
+    cached stream replays chunk by chunk. Only requests with an explicit
+    ``temperature`` of 0 are cached unless ``cache_sampled`` is set; a missing
+    or None temperature means the provider's default, which samples.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_disk_entries: int = 100000,
+        cache_sampled: bool = False,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.cache_sampled = cache_sampled
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, chunks TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    
+    def is_cacheable(self, params: Dict) -> bool:
+        """Check whether a request is deterministic enough to cache."""
+        if self.cache_sampled:
+            return True
+        temperature = params.get('temperature')
+        if temperature is None or temperature > 0:
+            self.bypasses += 1
+            return False
+        return True
+    
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+    
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return cached chunks for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT chunks, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        chunks = json.loads(row[0])
+                        self._remember(key, chunks, row[1])
+                        self.hits += 1
+                        return chunks
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._disk_count -= 1
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, chunks: List[str]):
+        """Store the chunks of a completed response."""
+        now = time.time()
+        chunks = list(chunks)
+        with self._lock:
+            self._remember(key, chunks, now)
+            if self._db is not None:
+                data = json.dumps(chunks, ensure_ascii=False)
+                updated = self._db.execute(
+                    "UPDATE responses SET chunks = ?, created = ?, accessed = ? WHERE key = ?",
+                    (data, now, now, key),
+                ).rowcount
+                if not updated:
+                    # Only a new row grows the count; replacing one would make it drift upward.
+                    self._db.execute(
+                        "INSERT INTO responses (key, chunks, created, accessed) VALUES (?, ?, ?, ?)",
+                        (key, data, now, now),
+                    )
+                    self._disk_count += 1
+                if self._disk_count > self.max_disk_entries:
+                    self._evict_disk()
+                self._db.commit()
+    
+    def _remember(self, key: str, chunks: List[str], created: float):
+        self._memory[key] = (chunks, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _evict_disk(self):
+        """Drop expired rows, then least recently used rows over the limit."""
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        self._disk_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = self._disk_count - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+            self._disk_count -= excess
+    
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counters and current sizes."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_count,
+        }
+    
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_count = 0
+    
+    def close(self):
+        """Close the on-disk store."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,283 @@
+"""Record and replay HTTP traffic under ``LLMClient`` for deterministic offline runs."""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+RECORD = "record"
+REPLAY = "replay"
+AUTO = "auto"
+MODES = (RECORD, REPLAY, AUTO)
+
+# One recorded chunk: seconds since the request was sent, and its bytes.
+Chunk = Tuple[float, bytes]
+
+
+def request_key(method: str, target: str, body: bytes) -> str:
+    """Key of a request: method, path and query, and the JSON body with sorted keys.
+
+    Hosts and headers are left out, so a cassette replays against any base
+    URL and is not affected by per-request headers such as retry counts.
+    """
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{method} {target}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class Cassette:
+    """Append-only file of recorded responses, indexed by request key.
+
+    Each entry is one JSON header line (key, status, headers, and the time
+    and size of every body chunk) followed by the raw body bytes. Opening a
+    cassette reads only the headers; bodies are read when replayed. Entries
+    are flushed as soon as they are complete, and a torn entry at the end of
+    the file, left by a crashed run, is dropped.
+    """
+    
+    def __init__(self, path: str, truncate: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[Dict, int]]] = {}
+        if truncate or not os.path.exists(path):
+            open(path, "wb").close()
+        self._file = open(path, "r+b")
+        self._load()
+    
+    def _load(self):
+        size = os.fstat(self._file.fileno()).st_size
+        good = 0
+        while good < size:
+            self._file.seek(good)
+            line = self._file.readline()
+            try:
+                header = json.loads(line)
+            except ValueError:
+                break
+            body = good + len(line)
+            end = body + sum(length for _, length in header["chunks"])
+            if not line.endswith(b"\n") or end > size:
+                break
+            self._index.setdefault(header["key"], []).append((header, body))
+            good = end
+        if good < size:
+            self._file.truncate(good)
+        self._file.seek(good)
+    
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+    
+    def count(self, key: str) -> int:
+        """Number of recorded responses for ``key``."""
+        return len(self._index.get(key, ()))
+    
+    def get(self, key: str, occurrence: int) -> Optional[Tuple[Dict, List[Chunk]]]:
+        """The header and chunks of a recorded response; past the last recording, the last one."""
+        entries = self._index.get(key)
+        if not entries:
+            return None
+        header, offset = entries[min(occurrence, len(entries) - 1)]
+        with self._lock:
+            self._file.seek(offset)
+            body = self._file.read(sum(length for _, length in header["chunks"]))
+        chunks, start = [], 0
+        for at, length in header["chunks"]:
+            chunks.append((at, body[start:start + length]))
+            start += length
+        return header, chunks
+    
+    def add(self, key: str, request: httpx.Request, status: int, headers: List[Tuple[str, str]],
+            at: float, chunks: List[Chunk]):
+        """Append a recorded response."""
+        header = {
+            "key": key, "method": request.method, "path": request.url.path, "status": status,
+            "headers": headers, "at": round(at, 6),
+            "chunks": [[round(offset, 6), len(data)] for offset, data in chunks],
+        }
+        line = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell() + len(line)
+            self._file.write(line + b"".join(data for _, data in chunks))
+            self._file.flush()
+            self._index.setdefault(key, []).append((header, offset))
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Passes a live body through, noting when each chunk arrived; saved once closed."""
+    
+    def __init__(self, stream, start: float, save: Callable[[List[Chunk]], None]):
+        self._stream = stream
+        self._start = start
+        self._save = save
+        self._chunks: List[Chunk] = []
+        self._saved = False
+    
+    def __iter__(self):
+        for data in self._stream:
+            self._chunks.append((time.perf_counter() - self._start, data))
+            yield data
+    
+    async def __aiter__(self):
+        async for data in self._stream:
+            self._chunks.append((time.perf_counter() - self._start, data))
+            yield data
+    
+    def _finish(self):
+        # A body closed early is saved as far as it was read.
+        if not self._saved:
+            self._saved = True
+            self._save(self._chunks)
+    
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+    
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._finish()
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Recorded chunks, paced by their recorded times divided by ``speed`` (no pacing when None)."""
+    
+    def __init__(self, chunks: List[Chunk], start: float, speed: Optional[float]):
+        self._chunks = chunks
+        self._start = start
+        self._speed = speed
+    
+    def _delay(self, at: float) -> float:
+        return at / self._speed - (time.perf_counter() - self._start) if self._speed else 0.0
+    
+    def __iter__(self):
+        for at, data in self._chunks:
+            delay = self._delay(at)
+            if delay > 0:
+                time.sleep(delay)
+            yield data
+    
+    async def __aiter__(self):
+        for at, data in self._chunks:
+            delay = self._delay(at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield data
+
+
+class CassetteTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport that records responses to a ``Cassette`` or replays them.
+
+    Pass it as ``LLMClient(transport=...)``; it serves both the sync and the
+    async client. In ``record`` mode every request goes to the network and
+    the cassette starts empty; in ``replay`` mode nothing does, and a request
+    that was never recorded gets a 404 error response; ``auto`` replays what
+    it has and records the rest. Identical requests replay their recordings
+    in order. ``speed`` paces replays: 1.0 reproduces the recorded timing,
+    2.0 runs twice as fast, and None (the default) replays instantly.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        mode: str = REPLAY,
+        speed: Optional[float] = None,
+        limits: Optional[httpx.Limits] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.speed = speed
+        self.limits = limits or httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+        self.cassette = Cassette(path, truncate=mode == RECORD)
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self._inner: Optional[httpx.HTTPTransport] = None
+        self._ainner: Optional[httpx.AsyncHTTPTransport] = None
+    
+    def _occurrence(self, key: str) -> int:
+        with self._lock:
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+            return occurrence
+    
+    def _should_record(self, key: str, occurrence: int) -> bool:
+        return self.mode == RECORD or (self.mode == AUTO and occurrence >= self.cassette.count(key))
+    
+    def _recorded(self, request: httpx.Request, response: httpx.Response, key: str, start: float):
+        at = time.perf_counter() - start
+        headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in response.headers.raw]
+        
+        def save(chunks: List[Chunk]):
+            self.cassette.add(key, request, response.status_code, headers, at, chunks)
+        
+        return httpx.Response(response.status_code, headers=response.headers.raw,
+                              stream=_RecordingStream(response.stream, start, save),
+                              extensions=response.extensions)
+    
+    def _replayed(self, request: httpx.Request, key: str, occurrence: int, start: float) -> Tuple[httpx.Response, float]:
+        """The replayed response and how long to wait for its headers."""
+        entry = self.cassette.get(key, occurrence)
+        if entry is None:
+            return httpx.Response(404, json={"error": {
+                "type": "cassette_miss",
+                "message": f"no recorded response for {request.method} {request.url.path} in {self.cassette.path}",
+            }}), 0.0
+        header, chunks = entry
+        response = httpx.Response(header["status"], headers=[tuple(pair) for pair in header["headers"]],
+                                  stream=_ReplayStream(chunks, start, self.speed))
+        return response, header["at"] / self.speed if self.speed else 0.0
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        key = request_key(request.method, request.url.raw_path.decode("ascii"), request.read())
+        occurrence = self._occurrence(key)
+        if self._should_record(key, occurrence):
+            if self._inner is None:
+                with self._lock:
+                    if self._inner is None:
+                        self._inner = httpx.HTTPTransport(limits=self.limits)
+            return self._recorded(request, self._inner.handle_request(request), key, start)
+        response, delay = self._replayed(request, key, occurrence, start)
+        if delay > 0:
+            time.sleep(delay)
+        return response
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        key = request_key(request.method, request.url.raw_path.decode("ascii"), await request.aread())
+        occurrence = self._occurrence(key)
+        if self._should_record(key, occurrence):
+            if self._ainner is None:
+                self._ainner = httpx.AsyncHTTPTransport(limits=self.limits)
+            return self._recorded(request, await self._ainner.handle_async_request(request), key, start)
+        response, delay = self._replayed(request, key, occurrence, start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return response
+    
+    def close(self):
+        """Close the live connection pool; the cassette stays open for the async client."""
+        if self._inner is not None:
+            self._inner.close()
+    
+    async def aclose(self):
+        """Async variant of ``close``."""
+        if self._ainner is not None:
+            await self._ainner.aclose()
@@ -1,31 +1,102 @@
 """Main chat interface for interacting with LLM."""
-import yaml
+import copy
+import os
+from functools import lru_cache
 
 try:
     from .llm_client import LLMClient
     from .conversation import Conversation
+    from .streaming import MetricsCollector
+    from .rate_limit import RateLimiter, RetryPolicy
+    from .router import RoutedClient
+    from .hooks import JsonlTraceWriter
+    from .scheduler import RequestScheduler
 except ImportError:
     from llm_client import LLMClient
     from conversation import Conversation
+    from streaming import MetricsCollector
+    from rate_limit import RateLimiter, RetryPolicy
+    from router import RoutedClient
+    from hooks import JsonlTraceWriter
+    from scheduler import RequestScheduler
 
 
-def load_config(config_path: str = "config.yaml") -> dict:
-    """Load configuration from YAML file."""
-    with open(config_path, 'r', encoding='utf-8') as f:
+@lru_cache(maxsize=32)
+def _parse_config(path: str, mtime_ns: int, size: int) -> dict:
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
 
-def main():
-    """Main chat interface."""
-    config = load_config()
-    api_config = config['api']
+def load_config(config_path: str = "config.yaml") -> dict:
+    """Load configuration from YAML file.
+    
+    Parsed files are cached by path and modification time; every call
+    returns its own copy.
+    """
+    path = os.path.abspath(config_path)
+    stat = os.stat(path)
+    return copy.deepcopy(_parse_config(path, stat.st_mtime_ns, stat.st_size))
+
+
+def build_client(config: dict, **kwargs):
+    """Create a client from a loaded configuration.
+    
+    Returns a ``RoutedClient`` when the config lists ``endpoints``, otherwise
+    an ``LLMClient`` for the ``api`` block.
+    """
+    rate_limit = config.get('rate_limit')
+    retry = config.get('retry')
+    kwargs.setdefault('rate_limiter', RateLimiter(**rate_limit) if rate_limit else None)
+    kwargs.setdefault('retry_policy', RetryPolicy(**retry) if retry is not None else None)
+    if config.get('coalesce'):
+        kwargs.setdefault('coalesce', True)
+    if config.get('trace_file'):
+        kwargs.setdefault('hooks', [JsonlTraceWriter(config['trace_file'])])
+    if config.get('cassette'):
+        # Imported here: it loads httpx, which plain startup avoids.
+        try:
+            from .cassette import CassetteTransport
+        except ImportError:
+            from cassette import CassetteTransport
+        kwargs.setdefault('transport', CassetteTransport(**config['cassette']))
+    if config.get('scheduler'):
+        # One scheduler for every endpoint, so the cap is global.
+        kwargs.setdefault('scheduler', RequestScheduler(**config['scheduler']))
+    if config.get('endpoints'):
+        return RoutedClient.from_config(config['endpoints'], client_kwargs=kwargs, **config.get('routing', {}))
     
-    client = LLMClient(
+    api_config = config['api']
+    return LLMClient(
         api_key=api_config['api_key'],
         base_url=api_config['base_url'],
         model=api_config['model'],
         temperature=api_config.get('temperature', 0.7),
-        max_tokens=api_config.get('max_tokens', 2000)
+        max_tokens=api_config.get('max_tokens', 2000),
+        **kwargs
+    )
+
+
+def format_metrics(metrics) -> str:
+    """Format stream metrics as a one-line status string."""
+    ttft = f"{metrics.ttft:.2f}s" if metrics.ttft is not None else "-"
+    line = (f"[TTFT {ttft} | total {metrics.total_duration:.2f}s | "
+            f"{metrics.chunks} chunks, {metrics.chunks_per_second:.1f}/s | max gap {metrics.max_gap:.2f}s")
+    if metrics.usage:
+        line += f" | {metrics.usage['prompt_tokens']}+{metrics.usage['completion_tokens']} tokens"
+    return line + "]"
+
+
+def main():
+    """Main chat interface."""
+    config = load_config()
+    show_metrics = config.get('show_metrics', False)
+    metrics = MetricsCollector()
+    
+    client = build_client(
+        config,
+        metrics_sink=metrics,
+        stream_usage=config.get('api', {}).get('stream_usage', False)
     )
     
     conversation = Conversation(client)
@@ -50,9 +121,18 @@ def main():
         
         try:
             print("\nAI: ", end="", flush=True)
-            for chunk in conversation.stream_send(user_input):
-                print(chunk, end="", flush=True)
+            stream = conversation.stream_send(user_input)
+            try:
+                for chunk in stream:
+                    print(chunk, end="", flush=True)
+            except KeyboardInterrupt:
+                # Closing the generator drops the connection and keeps the partial reply.
+                stream.close()
+                print("\n[interrupted]")
+                continue
             print()
+            if show_metrics and metrics.last is not None:
+                print(format_metrics(metrics.last))
         except Exception as e:
             print(f"\nError: {e}")
 
@@ -0,0 +1,223 @@
+"""Single-flight coalescing of identical in-flight requests."""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+_END = object()
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _SharedStream:
+    """Upstream iterator fanned out to any number of subscribers.
+
+    There is no pump thread: whichever subscriber runs out of buffered chunks
+    first pulls the next one for everybody, so the stream keeps going as long
+    as anyone is still reading. Late subscribers replay the buffered prefix.
+    """
+    
+    def __init__(self, source: Iterator, on_done: Callable[[], None]):
+        self.source = source
+        self.on_done = on_done
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._pulling = False
+        self._cond = threading.Condition()
+    
+    def _finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self.on_done()
+        self._cond.notify_all()
+    
+    def subscribe(self) -> Iterator:
+        with self._cond:
+            self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                with self._cond:
+                    while index >= len(self.chunks) and not self.done and self._pulling:
+                        self._cond.wait()
+                    if index < len(self.chunks):
+                        chunk = self.chunks[index]
+                    elif self.done:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    else:
+                        self._pulling = True
+                        chunk = _END
+                if chunk is _END:
+                    self._pull()
+                    continue
+                index += 1
+                yield chunk
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                abandoned = self.subscribers == 0 and not self.done
+                if abandoned:
+                    self._finish(RuntimeError("shared stream was abandoned by every subscriber"))
+            if abandoned:
+                self.source.close()
+    
+    def _pull(self):
+        try:
+            item = next(self.source)
+        except StopIteration:
+            item = _END
+        except Exception as e:
+            with self._cond:
+                self._pulling = False
+                self._finish(e)
+            return
+        except BaseException as e:
+            # KeyboardInterrupt and the like: fail the waiting subscribers too, then propagate.
+            with self._cond:
+                self._pulling = False
+                self._finish(e)
+            raise
+        with self._cond:
+            self._pulling = False
+            if item is _END:
+                self._finish()
+            else:
+                self.chunks.append(item)
+                self._cond.notify_all()
+
+
+class _AsyncSharedStream:
+    """Async variant of ``_SharedStream`` driven by one pump task.
+
+    Cancelling a subscriber never cancels the upstream read; the pump is
+    cancelled only once every subscriber has left.
+    """
+    
+    def __init__(self, source: AsyncIterator, on_done: Callable[[], None]):
+        self.source = source
+        self.on_done = on_done
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._task = asyncio.ensure_future(self._pump())
+    
+    async def _pump(self):
+        try:
+            async for item in self.source:
+                self.chunks.append(item)
+                self._changed.set()
+        except Exception as e:
+            self.error = e
+        except asyncio.CancelledError:
+            self.error = RuntimeError("shared stream was abandoned by every subscriber")
+            raise
+        finally:
+            self.done = True
+            self.on_done()
+            self._changed.set()
+    
+    async def subscribe(self) -> AsyncIterator:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(self.chunks):
+                    index += 1
+                    yield self.chunks[index - 1]
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                self._changed.clear()
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self._task.cancel()
+
+
+class SingleFlight:
+    """Shares one upstream call between concurrent callers with the same key.
+
+    Only calls that overlap in time are merged; nothing is remembered once a
+    call finishes. Every method returns ``(result, shared)`` where ``shared``
+    is True for callers that joined an existing call.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self._acalls: Dict[str, "asyncio.Future"] = {}
+        self._astreams: Dict[str, _AsyncSharedStream] = {}
+    
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` unless an identical call is in flight, then wait for its result."""
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight.event.set()
+        return flight.result, False
+    
+    def stream(self, key: str, factory: Callable[[], Iterator]) -> Tuple[Iterator, bool]:
+        """Subscribe to a running stream with this key, or start one from ``factory``."""
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is not None:
+                return shared.subscribe(), True
+            shared = self._streams[key] = _SharedStream(factory(), lambda: self._drop(self._streams, key, shared))
+            return shared.subscribe(), False
+    
+    async def ado(self, key: str, factory: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Async variant of ``do``; ``factory`` returns a coroutine.
+
+        The upstream call runs as its own task, so a cancelled caller does not
+        cancel it for the others.
+        """
+        future = self._acalls.get(key)
+        shared = future is not None
+        if not shared:
+            future = self._acalls[key] = asyncio.ensure_future(factory())
+            future.add_done_callback(lambda _: self._drop(self._acalls, key, future))
+        return await asyncio.shield(future), shared
+    
+    def astream(self, key: str, factory: Callable[[], AsyncIterator]) -> Tuple[AsyncIterator, bool]:
+        """Async variant of ``stream``; must be called from the event loop."""
+        shared = self._astreams.get(key)
+        if shared is not None:
+            return shared.subscribe(), True
+        shared = self._astreams[key] = _AsyncSharedStream(factory(), lambda: self._drop(self._astreams, key, shared))
+        return shared.subscribe(), False
+    
+    def _drop(self, table: Dict, key: str, value):
+        with self._lock:
+            if table.get(key) is value:
+                del table[key]
@@ -0,0 +1,143 @@
+"""Context window management for conversations."""
+from typing import List, Dict, Optional, Callable
+
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below so it can replace the original messages. "
+    "Keep names, facts, decisions and open questions. Be concise."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate: ~4 ASCII chars per token, one token per other char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+class TokenCounter:
+    """Counts message tokens, caching the result for each distinct message."""
+    
+    def __init__(
+        self,
+        count_fn: Optional[Callable[[str], int]] = None,
+        message_overhead: int = 4,
+        max_entries: int = 8192,
+    ):
+        self.count_fn = count_fn or estimate_tokens
+        self.message_overhead = message_overhead
+        self.max_entries = max_entries
+        self._cache: Dict[tuple, int] = {}
+    
+    def count(self, message: Dict[str, str]) -> int:
+        """Count tokens of a single message."""
+        key = (message.get("role"), message.get("content") or "")
+        tokens = self._cache.get(key)
+        if tokens is None:
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            tokens = self.count_fn(key[1]) + self.message_overhead
+            self._cache[key] = tokens
+        return tokens
+    
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Count tokens of a list of messages."""
+        return sum(self.count(m) for m in messages)
+
+
+class ContextPolicy:
+    """Sliding token window over a conversation that always keeps the system prompt.
+
+    The window start only moves forward, so the prompt prefix stays stable
+    between turns. With ``summarize`` enabled, evicted turns are folded into a
+    rolling summary (one extra model call per eviction) that is sent right
+    after the system prompt. Each policy tracks one conversation.
+    """
+    
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        counter: Optional[TokenCounter] = None,
+        summarize: bool = False,
+        summary_max_tokens: int = 500,
+        low_water: float = 0.75,
+    ):
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+        self.summarize = summarize
+        self.summary_max_tokens = summary_max_tokens
+        self.low_water = low_water
+        self.summary = ""
+        self._start = 0
+        self._summarized = 0
+    
+    def reset(self):
+        """Forget window position and summary."""
+        self.summary = ""
+        self._start = 0
+        self._summarized = 0
+    
+    def _advance(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Move the window start forward until the body fits the budget.
+        
+        Only the current window is counted, so the cost per turn does not
+        grow with the length of the full history.
+        """
+        head = messages[:1] if messages and messages[0]["role"] == "system" else []
+        offset = len(head)
+        size = len(messages) - offset
+        if self._start > size:
+            self.reset()
+        budget = self.max_tokens - self.counter.count_messages(head)
+        if self.summarize:
+            budget -= self.summary_max_tokens
+        
+        total = self.counter.count_messages(messages[offset + self._start:])
+        if total > budget:
+            # Evict down to the low-water mark so eviction (and summarization)
+            # happens every few turns rather than on every turn.
+            target = budget * self.low_water if self.summarize else budget
+            while total > target and self._start < size - 1:
+                total -= self.counter.count(messages[offset + self._start])
+                self._start += 1
+            # A tool result must not start the window without its tool call.
+            while self._start < size - 1 and messages[offset + self._start]["role"] == "tool":
+                self._start += 1
+        return head
+    
+    def _window(self, messages: List[Dict[str, str]], head: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        window = head + messages[len(head) + self._start:]
+        if self.summary:
+            window.insert(len(head), {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}",
+            })
+        return window
+    
+    def _summary_request(self, evicted: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        transcript = "\n".join(f"{m['role']}: {m.get('content') or ''}" for m in evicted)
+        if self.summary:
+            transcript = f"Previous summary:\n{self.summary}\n\nNew messages:\n{transcript}"
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ]
+    
+    def select(self, messages: List[Dict[str, str]], client=None) -> List[Dict[str, str]]:
+        """Build the list of messages to send for the current turn."""
+        head = self._advance(messages)
+        if self.summarize and client is not None and self._summarized < self._start:
+            offset = len(head)
+            request = self._summary_request(messages[offset + self._summarized:offset + self._start])
+            self.summary = client.chat(request, max_tokens=self.summary_max_tokens)
+            self._summarized = self._start
+        return self._window(messages, head)
+    
+    async def aselect(self, messages: List[Dict[str, str]], client=None) -> List[Dict[str, str]]:
+        """Async variant of ``select`` that summarizes without blocking the loop."""
+        head = self._advance(messages)
+        if self.summarize and client is not None and self._summarized < self._start:
+            offset = len(head)
+            request = self._summary_request(messages[offset + self._summarized:offset + self._start])
+            self.summary = await client.achat(request, max_tokens=self.summary_max_tokens)
+            self._summarized = self._start
+        return self._window(messages, head)
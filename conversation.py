@@ -1,55 +1,358 @@
 """Conversation management module."""
-from typing import List, Dict, Optional
+import copy
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Dict, Optional
 
 try:
     from .llm_client import LLMClient
+    from .context import ContextPolicy
+    from .transcript import SharedTranscript
+    from .hooks import call_context
+    from .json_stream import iter_json, aiter_json
+    from .history import History
+    from .memory import MemoryStore
+    from .tools import ToolRegistry, tool_loop, atool_loop
 except ImportError:
     from llm_client import LLMClient
+    from context import ContextPolicy
+    from transcript import SharedTranscript
+    from hooks import call_context
+    from json_stream import iter_json, aiter_json
+    from history import History
+    from memory import MemoryStore
+    from tools import ToolRegistry, tool_loop, atool_loop
 
 
 class Conversation:
-    """Manages conversation history and context."""
+    """Manages conversation history and context.
     
-    def __init__(self, client: LLMClient, system_prompt: Optional[str] = None):
+    History is kept in a ``History`` so ``fork`` can branch a conversation
+    without copying it; message dicts are shared between branches and are
+    never modified in place.
+    """
+    
+    def __init__(
+        self,
+        client: LLMClient,
+        system_prompt: Optional[str] = None,
+        context_policy: Optional[ContextPolicy] = None,
+        memory: Optional[MemoryStore] = None,
+    ):
         self.client = client
-        self.messages: List[Dict[str, str]] = []
+        self.context_policy = context_policy
+        self.memory = memory
+        self.messages = History()
+        self.transcript: Optional[SharedTranscript] = None
+        self.speaker: Optional[str] = None
+        self._positions = History()
+        self._origin = 0
+        self.store = None
+        self.session_id: Optional[str] = None
+        self._next_seq = 1
+        # Name of the owning agent, reported to client hooks with the session id.
+        self.agent: Optional[str] = None
+        # Results of idempotent tool calls, shared with forks of this session.
+        self.tool_memo: Dict[str, str] = {}
         if system_prompt:
-            self.messages.append({"role": "system", "content": system_prompt})
+            self.add_message("system", system_prompt)
+    
+    @property
+    def messages(self) -> History:
+        """This conversation's private messages; assigning a list replaces them."""
+        return self._messages
+    
+    @messages.setter
+    def messages(self, messages: Iterable[Dict[str, str]]):
+        self._messages = messages if isinstance(messages, History) else History(messages)
     
     def add_message(self, role: str, content: str):
         """Add a message to conversation history."""
-        self.messages.append({"role": role, "content": content})
+        self.append_message({"role": role, "content": content})
+    
+    def append_message(self, message: Dict):
+        """Add a complete message dict, such as an assistant message with ``tool_calls``."""
+        self.messages.append(message)
+        if self.memory is not None and message["role"] in ("user", "assistant") and message.get("content"):
+            self.memory.add(f"{message['role']}: {message['content']}", source=message)
+        if self.transcript is not None:
+            self._positions.append(len(self.transcript))
+        if self.store is not None:
+            self.store.append(self.session_id, self._next_seq, message)
+            self._next_seq += 1
+    
+    def attach_store(self, store, session_id: str, next_seq: int = 1):
+        """Persist every new message of this conversation to a ``SessionStore``."""
+        self.store = store
+        self.session_id = session_id
+        self._next_seq = next_seq
+    
+    def attach_transcript(self, transcript: SharedTranscript, speaker: str, include_history: bool = True):
+        """Read public history from a shared transcript instead of private copies.
+        
+        ``messages`` then only holds this conversation's private messages; the
+        full view interleaves them with the transcript as seen by ``speaker``.
+        """
+        self.transcript = transcript
+        self.speaker = speaker
+        self._origin = 0 if include_history else len(transcript)
+        self._positions = History([self._origin] * len(self.messages))
+    
+    def _call_context(self):
+        """Attribute model calls to this conversation's agent and session."""
+        return call_context(self.agent, self.session_id)
+    
+    def _view(self) -> List[Dict[str, str]]:
+        """Full history: private messages merged with the shared transcript."""
+        if self.transcript is None:
+            return list(self.messages)
+        view = []
+        shared = self._origin
+        for message, position in zip(self.messages, self._positions):
+            if position > shared:
+                view.extend(self.transcript.render(self.speaker, shared, position))
+                shared = position
+            view.append(message)
+        view.extend(self.transcript.render(self.speaker, shared))
+        return view
+    
+    def _recall(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Insert memories relevant to the latest user message after the leading system messages.
+        
+        Memories of messages already in the request are skipped, so this only
+        brings back what the context policy trimmed or never saw.
+        """
+        if self.memory is None or not len(self.memory):
+            return messages
+        query = next((m["content"] for m in reversed(messages) if m["role"] == "user" and m.get("content")), None)
+        if not query:
+            return messages
+        recalled = self.memory.recall([query], exclude={id(m) for m in messages})
+        if not recalled:
+            return messages
+        note = {"role": "system", "content": "Relevant memories from earlier:\n" + "\n".join(f"- {text}" for text in recalled)}
+        head = 0
+        while head < len(messages) and messages[head]["role"] == "system":
+            head += 1
+        return messages[:head] + [note] + messages[head:]
+    
+    def _request_messages(self) -> List[Dict[str, str]]:
+        """Messages to send for the next turn, after applying the context policy and memory."""
+        if self.context_policy is None:
+            return self._recall(self._view())
+        return self._recall(self.context_policy.select(self._view(), self.client))
+    
+    async def _arequest_messages(self) -> List[Dict[str, str]]:
+        """Async variant of ``_request_messages``."""
+        if self.context_policy is None:
+            return self._recall(self._view())
+        return self._recall(await self.context_policy.aselect(self._view(), self.client))
+    
+    def complete(self, **kwargs) -> str:
+        """Get AI response to the current history without recording it."""
+        with self._call_context():
+            return self.client.chat(self._request_messages(), **kwargs)
+    
+    async def acomplete(self, **kwargs) -> str:
+        """Async variant of ``complete``."""
+        with self._call_context():
+            return await self.client.achat(await self._arequest_messages(), **kwargs)
+    
+    def reply(self, **kwargs) -> str:
+        """Get AI response to the current history and record it as assistant message."""
+        response = self.complete(**kwargs)
+        self.add_message("assistant", response)
+        return response
+    
+    async def areply(self, **kwargs) -> str:
+        """Async variant of ``reply``."""
+        response = await self.acomplete(**kwargs)
+        self.add_message("assistant", response)
+        return response
     
     def send(self, user_message: str, **kwargs) -> str:
         """Send user message and get AI response."""
         self.add_message("user", user_message)
-        response = self.client.chat(self.messages, **kwargs)
+        with self._call_context():
+            response = self.client.chat(self._request_messages(), **kwargs)
         self.add_message("assistant", response)
         return response
     
     def stream_send(self, user_message: str, **kwargs):
-        """Send user message and stream AI response."""
+        """Send user message and stream AI response.
+        
+        Accepts ``stop_when`` stop conditions (see ``LLMClient.stream_events``).
+        The reply is recorded as far as it was received, also when a stop
+        condition cut it or the caller stopped iterating, which closes the
+        upstream stream at once.
+        """
         self.add_message("user", user_message)
-        full_response = ""
-        for chunk in self.client.stream_chat(self.messages, **kwargs):
-            full_response += chunk
-            yield chunk
-        self.add_message("assistant", full_response)
+        parts = []
+        with self._call_context():
+            chunks = self.client.stream_chat(self._request_messages(), **kwargs)
+            # The request is labelled when it starts, on the first chunk; the labels are
+            # not held across yields, where they would leak into the caller's context.
+            first = next(chunks, None)
+        try:
+            if first is not None:
+                parts.append(first)
+                yield first
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+        finally:
+            chunks.close()
+            if parts:
+                self.add_message("assistant", "".join(parts))
+        if not parts:
+            self.add_message("assistant", "")
+    
+    def stream_send_json(self, user_message: str, **kwargs) -> Iterator[Any]:
+        """Send user message and yield JSON array elements of the reply as they complete.
+        
+        The raw reply text is recorded in the history as usual.
+        """
+        return iter_json(self.stream_send(user_message, **kwargs))
+    
+    async def asend(self, user_message: str, **kwargs) -> str:
+        """Send user message and await AI response."""
+        self.add_message("user", user_message)
+        with self._call_context():
+            response = await self.client.achat(await self._arequest_messages(), **kwargs)
+        self.add_message("assistant", response)
+        return response
+    
+    async def astream_send(self, user_message: str, **kwargs):
+        """Send user message and asynchronously stream AI response."""
+        self.add_message("user", user_message)
+        parts = []
+        with self._call_context():
+            chunks = self.client.astream_chat(await self._arequest_messages(), **kwargs)
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                first = None
+        try:
+            if first is not None:
+                parts.append(first)
+                yield first
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+        finally:
+            await chunks.aclose()
+            if parts:
+                self.add_message("assistant", "".join(parts))
+        if not parts:
+            self.add_message("assistant", "")
+    
+    def astream_send_json(self, user_message: str, **kwargs) -> AsyncIterator[Any]:
+        """Async variant of ``stream_send_json``."""
+        return aiter_json(self.astream_send(user_message, **kwargs))
+    
+    def send_with_tools(self, user_message: str, tools: ToolRegistry, max_rounds: int = 8, **kwargs) -> str:
+        """Send user message and let the model call ``tools`` until it answers.
+        
+        The tool calls of each model turn run concurrently. Tool-call and
+        tool-result messages are recorded in the history before the final
+        answer; results of idempotent tools are reused for the rest of the
+        session. ``client`` must provide ``chat_message``.
+        """
+        self.add_message("user", user_message)
+        with self._call_context():
+            added = tool_loop(self.client, self._request_messages(), tools, max_rounds, self.tool_memo, **kwargs)
+        for message in added:
+            self.append_message(message)
+        return added[-1]["content"] or ""
+    
+    async def asend_with_tools(self, user_message: str, tools: ToolRegistry, max_rounds: int = 8, **kwargs) -> str:
+        """Async variant of ``send_with_tools``; coroutine tools are awaited on the event loop."""
+        self.add_message("user", user_message)
+        with self._call_context():
+            added = await atool_loop(self.client, await self._arequest_messages(), tools, max_rounds,
+                                     self.tool_memo, **kwargs)
+        for message in added:
+            self.append_message(message)
+        return added[-1]["content"] or ""
+    
+    def fork(self) -> "Conversation":
+        """Branch the conversation in O(1), sharing all history so far.
+        
+        Messages added to either side afterwards are private to it, also in
+        long-term memory: the branch recalls the memories so far from a store
+        layered over this one. The branch keeps the transcript and session id
+        but is not persisted to the session store; a context policy is copied
+        so each side keeps its own summary.
+        """
+        branch = copy.copy(self)
+        branch._messages = self._messages.fork()
+        branch._positions = self._positions.fork()
+        branch.context_policy = copy.copy(self.context_policy)
+        branch.memory = self.memory.fork() if self.memory is not None else None
+        branch.store = None
+        return branch
+    
+    def _branches(self, base: "Conversation", replies: List[str]) -> List["Conversation"]:
+        branches = []
+        for reply in replies:
+            branch = base.fork()
+            branch.add_message("assistant", reply)
+            branches.append(branch)
+        return branches
+    
+    def sample_n(self, n: int, user_message: Optional[str] = None, **kwargs) -> List["Conversation"]:
+        """Sample ``n`` candidate replies and return one forked branch per candidate.
+        
+        This conversation is left unchanged; each branch ends with
+        ``user_message`` (when given) and its candidate reply. Uses the
+        client's ``chat_n``, which asks the provider for ``n`` choices in one
+        request when it can and makes parallel calls otherwise.
+        """
+        base = self.fork()
+        if user_message is not None:
+            base.add_message("user", user_message)
+        with base._call_context():
+            replies = base.client.chat_n(base._request_messages(), n, **kwargs)
+        return self._branches(base, replies)
+    
+    async def asample_n(self, n: int, user_message: Optional[str] = None, **kwargs) -> List["Conversation"]:
+        """Async variant of ``sample_n``."""
+        base = self.fork()
+        if user_message is not None:
+            base.add_message("user", user_message)
+        with base._call_context():
+            replies = await base.client.achat_n(await base._arequest_messages(), n, **kwargs)
+        return self._branches(base, replies)
     
     def clear(self):
         """Clear conversation history (keeps system prompt if exists)."""
+        if self.context_policy is not None:
+            self.context_policy.reset()
+        self.tool_memo = {}
         if self.messages and self.messages[0]["role"] == "system":
             self.messages = [self.messages[0]]
         else:
             self.messages = []
+        if self.transcript is not None:
+            self._origin = len(self.transcript)
+            self._positions = History([self._origin] * len(self.messages))
+        if self.store is not None:
+            self.store.truncate(self.session_id, keep_system=True)
+            self._next_seq = 1
     
     def get_history(self) -> List[Dict[str, str]]:
         """Get conversation history."""
-        return self.messages.copy()
+        return self._view()
     
     def set_system_prompt(self, prompt: str):
         """Set or update system prompt."""
         if self.messages and self.messages[0]["role"] == "system":
-            self.messages[0]["content"] = prompt
+            # Replaced rather than edited: forks share the old message dict.
+            self.messages[0] = {"role": "system", "content": prompt}
         else:
             self.messages.insert(0, {"role": "system", "content": prompt})
+            if self.transcript is not None:
+                self._positions.insert(0, self._origin)
+            if self.context_policy is not None:
+                # The window was fitted without a system prompt; fit it again.
+                self.context_policy.reset()
+        if self.store is not None:
+            self.store.append(self.session_id, 0, self.messages[0])
@@ -5,6 +5,7 @@ sys.path.append('..')
 from llm_client import LLMClient
 from agent import Agent
 from chat import load_config
+from context import ContextPolicy
 
 
 def main():
@@ -56,6 +57,10 @@ def main():
         战斗失败	可恶......不该输的呀！
         装配副武器	就是它了！
         """,
+        context_policy=ContextPolicy(
+            max_tokens=api_config.get('context_max_tokens', 16000),
+            summarize=True,
+        ),
     )
 
     
@@ -29,8 +29,9 @@ client = LLMClient(
 # Create conversation
 conv = Conversation(client, system_prompt=prompt['system_prompt'])
 
-# Chat
-response = conv.send(user_message=prompt['user_prompt'])
-print(f"AI: {response}")
+# Chat: each generated prompt is printed as soon as its JSON object closes;
+# if the reply is cut off, the prompts completed so far are still returned.
+for index, item in enumerate(conv.stream_send_json(prompt['user_prompt']), 1):
+    print(f"[{index}] {json.dumps(item, ensure_ascii=False)}")
 
 
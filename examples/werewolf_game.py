@@ -1,28 +1,33 @@
 """Werewolf game example with multiple AI agents."""
+import os
 import sys
 sys.path.append('..')
 
 from llm_client import create_client
 from agent import WerewolfPlayer
 from multi_agent import WerewolfGame
+from mock_client import MockLLMClient
 from chat import load_config
 
-# Load API config and create client
-_config = load_config()
+# Load API config and create client; without config.yaml or an API key the offline mock model plays.
+_config = load_config('../config.yaml') if os.path.exists('../config.yaml') else {}
 _api = _config.get('api', {})
-client = create_client(
-    provider=_api.get('provider', 'openai'),
-    api_key=_api.get('api_key', ''),
-    model=_api.get('model', 'gpt-3.5-turbo'),
-    base_url=_api.get('base_url', 'https://api.openai.com/v1'),
-    temperature=_api.get('temperature', 0.7),
-    max_tokens=_api.get('max_tokens', 2000)
-)
-
-# Create game
-game = WerewolfGame()
-
-# Add players
+if _api.get('api_key'):
+    client = create_client(
+        provider=_api.get('provider', 'openai'),
+        api_key=_api.get('api_key', ''),
+        model=_api.get('model', 'gpt-3.5-turbo'),
+        base_url=_api.get('base_url', 'https://api.openai.com/v1'),
+        temperature=_api.get('temperature', 0.7),
+        max_tokens=_api.get('max_tokens', 2000)
+    )
+else:
+    client = MockLLMClient()
+
+# Create game; the seed fixes role assignment and tie breaks
+game = WerewolfGame(seed=42)
+
+# Add players with fixed roles (omit the role to have the game deal them)
 players = [
     WerewolfPlayer("Alice", client, "villager"),
     WerewolfPlayer("Bob", client, "werewolf"),
@@ -39,15 +44,25 @@ print("Game started!")
 print(f"Players: {', '.join(game.game_state['alive_players'])}")
 print("="*50)
 
-# Night phase
-print("\n=== NIGHT PHASE ===")
-night_actions = game.night_phase()
-for player, action in night_actions.items():
-    print(f"{player}: {action}")
-
-# Day phase
-print("\n=== DAY PHASE ===")
-day_discussions = game.day_phase()
-for player, discussion in day_discussions.items():
-    print(f"{player}: {discussion}")
-    print("-"*50)
+while True:
+    # Night phase
+    print(f"\n=== NIGHT {game.game_state['day']} ===")
+    night_actions = game.night_phase()
+    for player, action in night_actions.items():
+        print(f"{player}: {action}")
+    if game.game_state['winner']:
+        break
+
+    # Day phase
+    print(f"\n=== DAY {game.game_state['day']} ===")
+    day_discussions = game.day_phase()
+    for player, discussion in day_discussions.items():
+        print(f"{player}: {discussion}")
+        print("-"*50)
+    print(f"Alive: {', '.join(game.game_state['alive_players'])}")
+    if game.game_state['winner'] or game.game_state['day'] >= game.max_days:
+        break
+    game.next_day()
+
+print(f"\nWinner: {game.game_state['winner'] or 'draw'}")
+print(f"Roles: {game.game_state['roles']}")
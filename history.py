@@ -0,0 +1,109 @@
+"""Persistent message history shared between conversation forks."""
+from typing import Any, Iterable, Iterator, List, Optional
+
+
+class History:
+    """Append-mostly sequence whose forks share their common prefix.
+
+    A history is a chain of segments: a frozen parent, the number of the
+    parent's items it sees, and a list of its own items. ``fork`` freezes
+    the current items and starts empty segments for both sides, so it is
+    O(1) and no item is copied; each side then only stores what it appends.
+    Replacing or inserting into the shared prefix flattens that history
+    into a private list of references first. Items are never copied, so
+    they must be treated as immutable.
+    """
+    
+    __slots__ = ("_parent", "_parent_len", "_items", "_depth")
+    
+    # Chains deeper than this are flattened on fork to keep iteration cheap.
+    MAX_DEPTH = 32
+    
+    def __init__(self, items: Optional[Iterable[Any]] = None):
+        self._parent: Optional[History] = None
+        self._parent_len = 0
+        self._items: List[Any] = list(items) if items is not None else []
+        self._depth = 0
+    
+    @classmethod
+    def _child(cls, parent: "History", parent_len: int) -> "History":
+        history = cls()
+        history._parent = parent
+        history._parent_len = parent_len
+        history._depth = parent._depth + 1
+        return history
+    
+    def fork(self) -> "History":
+        """Return an independent copy sharing every current item with this one."""
+        if self._depth >= self.MAX_DEPTH:
+            self._flatten()
+        if self._items or self._parent is None:
+            frozen = History()
+            frozen._parent, frozen._parent_len = self._parent, self._parent_len
+            frozen._items, frozen._depth = self._items, self._depth
+            self._parent, self._parent_len = frozen, len(frozen)
+            self._items, self._depth = [], frozen._depth + 1
+        return History._child(self._parent, self._parent_len)
+    
+    def _segments(self) -> List[List[Any]]:
+        """Item lists from the root down; frozen parents never grow, so each is seen whole."""
+        segments = []
+        node = self
+        while node is not None:
+            segments.append(node._items)
+            node = node._parent
+        segments.reverse()
+        return segments
+    
+    def _flatten(self):
+        self._items = list(self)
+        self._parent, self._parent_len, self._depth = None, 0, 0
+    
+    def __len__(self) -> int:
+        return self._parent_len + len(self._items)
+    
+    def __iter__(self) -> Iterator[Any]:
+        for segment in self._segments():
+            yield from segment
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        node = self
+        while index < node._parent_len:
+            node = node._parent
+        return node._items[index - node._parent_len]
+    
+    def __setitem__(self, index: int, value: Any):
+        if index < 0:
+            index += len(self)
+        if index < self._parent_len:
+            self._flatten()
+        self._items[index - self._parent_len] = value
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (History, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"History({list(self)!r})"
+    
+    def append(self, item: Any):
+        """Append an item to this history only."""
+        self._items.append(item)
+    
+    def insert(self, index: int, item: Any):
+        """Insert an item; inserting into the shared prefix flattens this history."""
+        if index < 0:
+            index += len(self)
+        if index < self._parent_len:
+            self._flatten()
+        self._items.insert(max(0, index - self._parent_len), item)
@@ -0,0 +1,197 @@
+"""Per-call records, attribution context and built-in hooks for observability."""
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (agent, session) the current model calls are attributed to.
+_labels: ContextVar[Tuple[Optional[str], Optional[str]]] = ContextVar("llm_call_labels", default=(None, None))
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@contextmanager
+def call_context(agent: Optional[str] = None, session: Optional[str] = None):
+    """Attribute model calls made inside the block to an agent and/or session.
+
+    Unset values are inherited from an enclosing block.
+    """
+    outer_agent, outer_session = _labels.get()
+    token = _labels.set((agent or outer_agent, session or outer_session))
+    try:
+        yield
+    finally:
+        try:
+            _labels.reset(token)
+        except ValueError:
+            # A generator finalized from another context; its labels die with it.
+            pass
+
+
+def current_labels() -> Tuple[Optional[str], Optional[str]]:
+    """The ``(agent, session)`` that calls made now are attributed to."""
+    return _labels.get()
+
+
+class CallRecord:
+    """Structured record of one model call, passed to every hook."""
+    
+    __slots__ = ("model", "endpoint", "operation", "agent", "session", "timestamp", "start",
+                 "latency", "ttft", "prompt_tokens", "completion_tokens", "total_tokens",
+                 "retries", "cache_hit", "coalesced", "error", "priority", "queue_time")
+    
+    def __init__(self, model: str, endpoint: str, operation: str):
+        self.model = model
+        self.endpoint = endpoint
+        self.operation = operation
+        self.agent, self.session = _labels.get()
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.latency = 0.0
+        self.ttft: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.total_tokens: Optional[int] = None
+        self.retries = 0
+        self.cache_hit = False
+        self.coalesced = False
+        self.error: Optional[str] = None
+        # Set when a ``RequestScheduler`` admitted the call.
+        self.priority: Optional[str] = None
+        self.queue_time: Optional[float] = None
+    
+    def set_usage(self, usage):
+        """Copy token counts from an SDK usage object or dict."""
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens,
+                     "total_tokens": usage.total_tokens}
+        self.prompt_tokens = usage.get("prompt_tokens")
+        self.completion_tokens = usage.get("completion_tokens")
+        self.total_tokens = usage.get("total_tokens")
+    
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__ if name != "start"}
+
+
+Hook = Callable[[CallRecord], None]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+    
+    def __init__(self):
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(DURATION_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsAggregator:
+    """In-process hook that aggregates call records and renders Prometheus text.
+
+    Series are labelled by model, endpoint and status only (queue waits by
+    priority class), to keep cardinality bounded. With ``prices`` of ``{model: (prompt, completion)}``
+    in dollars per 1K tokens, spend is tracked as well.
+    """
+    
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._durations: Dict[Tuple, _Histogram] = {}
+        self._ttfts: Dict[Tuple, _Histogram] = {}
+        self._queue_times: Dict[Tuple, _Histogram] = {}
+    
+    def _add(self, name: str, labels: Tuple, value: float):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+    
+    def __call__(self, record: CallRecord):
+        labels = (("model", record.model), ("endpoint", record.endpoint))
+        if record.error:
+            status = "cancelled" if record.error == "cancelled" else "error"
+        elif record.cache_hit:
+            status = "cache"
+        else:
+            status = "coalesced" if record.coalesced else "ok"
+        with self._lock:
+            self._add("llm_requests_total", labels + (("operation", record.operation), ("status", status)), 1)
+            if record.retries:
+                self._add("llm_retries_total", labels, record.retries)
+            if record.prompt_tokens:
+                self._add("llm_prompt_tokens_total", labels, record.prompt_tokens)
+            if record.completion_tokens:
+                self._add("llm_completion_tokens_total", labels, record.completion_tokens)
+            price = self.prices.get(record.model)
+            if price and not record.cache_hit and not record.coalesced:
+                cost = ((record.prompt_tokens or 0) * price[0] + (record.completion_tokens or 0) * price[1]) / 1000
+                self._add("llm_cost_dollars_total", labels, cost)
+            if not record.cache_hit and not record.coalesced and not record.error:
+                self._durations.setdefault(labels, _Histogram()).observe(record.latency)
+                if record.ttft is not None:
+                    self._ttfts.setdefault(labels, _Histogram()).observe(record.ttft)
+            if record.queue_time is not None:
+                self._queue_times.setdefault(labels + (("priority", record.priority),), _Histogram()).observe(
+                    record.queue_time)
+    
+    @staticmethod
+    def _format(labels: Tuple) -> str:
+        return ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    
+    def _render_histograms(self, name: str, histograms: Dict[Tuple, _Histogram], lines: List[str]):
+        if not histograms:
+            return
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in histograms.items():
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{self._format(labels + (("le", le),))}}} {cumulative}')
+            lines.append(f"{name}_sum{{{self._format(labels)}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{self._format(labels)}}} {histogram.count}")
+    
+    def render(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{{{self._format(labels)}}} {value}")
+            self._render_histograms("llm_request_duration_seconds", self._durations, lines)
+            self._render_histograms("llm_time_to_first_token_seconds", self._ttfts, lines)
+            self._render_histograms("llm_queue_wait_seconds", self._queue_times, lines)
+        return "\n".join(lines) + "\n"
+
+
+class JsonlTraceWriter:
+    """Hook that appends every call record as one JSON line."""
+    
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+    
+    def __call__(self, record: CallRecord):
+        line = json.dumps(record.as_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
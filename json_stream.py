@@ -0,0 +1,208 @@
+"""Incremental JSON parsing of streamed model output."""
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+class JsonStreamParser:
+    """Parses a JSON document out of text that arrives in chunks.
+
+    Text before the first ``[`` or ``{`` (prose, a Markdown fence) and
+    anything after the document is ignored. The elements of the outermost
+    array, or of the first array directly inside a top-level object such as
+    ``{"items": [...]}``, are returned by ``feed`` as soon as each one closes
+    and collected in ``items``. Elements that are not valid JSON are skipped
+    and counted in ``errors``. Every character is scanned once, however the
+    text is chunked.
+    """
+    
+    def __init__(self):
+        self.items: List[Any] = []
+        self.errors = 0
+        self.complete = False
+        # Chunks are kept as received; positions below are absolute offsets.
+        self._chunks: List[str] = []
+        self._chunk_starts: List[int] = []
+        self._length = 0
+        self._start: Optional[int] = None
+        self._stack: List[str] = []
+        self._expect_key: List[bool] = []
+        self._in_string = False
+        self._escaped = False
+        self._item_depth: Optional[int] = None
+        self._in_items = False
+        self._item_start: Optional[int] = None
+        self._item_chunk = 0
+        # Last point where the document can be cut, with the brackets that close it.
+        self._safe: Tuple[int, str] = (0, "")
+    
+    def feed(self, text: str) -> List[Any]:
+        """Consume a chunk and return the elements it completed."""
+        if self.complete or not text:
+            return []
+        self._chunks.append(text)
+        self._chunk_starts.append(self._length)
+        self._length += len(text)
+        found = len(self.items)
+        self._scan(text, self._length - len(text))
+        return self.items[found:]
+    
+    @property
+    def found_array(self) -> bool:
+        """Whether an array whose elements are split out has been found."""
+        return self._item_depth is not None
+    
+    def _at_items(self) -> bool:
+        return self._in_items and len(self._stack) == self._item_depth
+    
+    def _scan(self, text: str, offset: int):
+        """Advance the state machine over one chunk starting at absolute ``offset``."""
+        pos, stack = 0, self._stack
+        end = len(text)
+        if self._start is None:
+            starts = [i for i in (text.find("["), text.find("{")) if i >= 0]
+            if not starts:
+                return
+            pos = min(starts)
+            self._start = offset + pos
+        while pos < end:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    pos += 1
+                    continue
+                # Jump straight to the next quote or backslash.
+                quote, backslash = text.find('"', pos), text.find("\\", pos)
+                if backslash >= 0 and (quote < 0 or backslash < quote):
+                    self._escaped = True
+                    pos = backslash + 1
+                    continue
+                if quote < 0:
+                    pos = end
+                    break
+                pos = quote + 1
+                self._in_string = False
+                if stack[-1] == "{" and self._expect_key[-1]:
+                    continue
+                self._safe = (offset + pos, self._closers())
+                if self._at_items():
+                    self._emit(offset + pos)
+                continue
+            char = text[pos]
+            if char == '"':
+                self._begin_value(offset + pos)
+                self._in_string = True
+            elif char in "[{":
+                self._begin_value(offset + pos)
+                if self._item_depth is None and char == "[" and (
+                        not stack or (len(stack) == 1 and stack[0] == "{")):
+                    self._item_depth = len(stack) + 1
+                    self._in_items = True
+                stack.append(char)
+                self._expect_key.append(char == "{")
+                self._safe = (offset + pos + 1, self._closers())
+            elif char in "]}":
+                if not stack or _CLOSERS[stack[-1]] != char:
+                    # Malformed: keep what was valid up to here.
+                    self.complete = True
+                    break
+                if self._at_items():
+                    self._emit(offset + pos)
+                    self._in_items = False
+                stack.pop()
+                self._expect_key.pop()
+                pos += 1
+                self._safe = (offset + pos, self._closers())
+                if self._at_items():
+                    self._emit(offset + pos)
+                if not stack:
+                    self.complete = True
+                    break
+                continue
+            elif char == ",":
+                if self._at_items():
+                    self._emit(offset + pos)
+                self._safe = (offset + pos, self._closers())
+                self._expect_key[-1] = stack[-1] == "{"
+            elif char == ":":
+                self._expect_key[-1] = False
+            elif not char.isspace():
+                self._begin_value(offset + pos)
+            pos += 1
+    
+    def _closers(self) -> str:
+        return "".join(_CLOSERS[opener] for opener in reversed(self._stack))
+    
+    def _begin_value(self, pos: int):
+        if self._item_start is None and self._at_items():
+            self._item_start = pos
+            self._item_chunk = len(self._chunks) - 1
+    
+    def _emit(self, pos: int):
+        if self._item_start is None:
+            return
+        base = self._chunk_starts[self._item_chunk]
+        raw = "".join(self._chunks[self._item_chunk:])[self._item_start - base:pos - base]
+        self._item_start = None
+        try:
+            self.items.append(json.loads(raw))
+        except ValueError:
+            self.errors += 1
+    
+    def close(self) -> Any:
+        """Return the parsed document, or its longest valid prefix if the text ended early.
+
+        Returns None when no JSON document was started.
+        """
+        if self._start is None:
+            return None
+        end, closers = self._safe
+        try:
+            return json.loads("".join(self._chunks)[self._start:end] + closers)
+        except ValueError:
+            # An invalid element spoils the text; the parsed elements still stand.
+            return list(self.items) if self._item_depth == 1 else None
+
+
+def iter_json(chunks: Iterable[str], parser: Optional[JsonStreamParser] = None) -> Iterator[Any]:
+    """Yield JSON elements from streamed text as soon as each one closes.
+
+    When the document holds no array to split, the whole document (or its
+    recovered prefix) is yielded once the text ends. Reading stops when the
+    document closes, and ``chunks`` is closed, which ends an upstream
+    stream instead of paying for trailing text.
+    """
+    parser = parser or JsonStreamParser()
+    try:
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+            if parser.complete:
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    if not parser.found_array:
+        document = parser.close()
+        if document is not None:
+            yield document
+
+
+async def aiter_json(chunks: AsyncIterable[str], parser: Optional[JsonStreamParser] = None) -> AsyncIterator[Any]:
+    """Async variant of ``iter_json``."""
+    parser = parser or JsonStreamParser()
+    try:
+        async for chunk in chunks:
+            for item in parser.feed(chunk):
+                yield item
+            if parser.complete:
+                break
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    if not parser.found_array:
+        document = parser.close()
+        if document is not None:
+            yield document
@@ -1,11 +1,44 @@
 """Core LLM client module using OpenAI SDK."""
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
-from typing import List, Dict, Optional, Iterator, Iterable
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import AsyncExitStack, ExitStack, nullcontext
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Iterator, Iterable, AsyncIterator
+
+try:
+    from .cache import ResponseCache, make_cache_key
+    from .streaming import StreamChunk, StreamMetrics, MetricsSink
+    from .rate_limit import RateLimiter, RetryPolicy
+    from .hooks import CallRecord, Hook
+    from .coalesce import SingleFlight
+    from .json_stream import iter_json, aiter_json
+    from .scheduler import RequestScheduler
+    from .stop import StopMatcher
+    from .tools import ToolRegistry, tool_loop, atool_loop
+except ImportError:
+    from cache import ResponseCache, make_cache_key
+    from streaming import StreamChunk, StreamMetrics, MetricsSink
+    from rate_limit import RateLimiter, RetryPolicy
+    from hooks import CallRecord, Hook
+    from coalesce import SingleFlight
+    from json_stream import iter_json, aiter_json
+    from scheduler import RequestScheduler
+    from stop import StopMatcher
+    from tools import ToolRegistry, tool_loop, atool_loop
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
+    from openai.types.chat import ChatCompletionMessageParam
 
 
 class LLMClient:
-    """Universal LLM client supporting OpenAI-compatible APIs."""
+    """Universal LLM client supporting OpenAI-compatible APIs.
+    
+    The OpenAI SDK is imported and its clients are built on the first
+    request, so creating an ``LLMClient`` is cheap.
+    """
     
     def __init__(
         self,
@@ -14,35 +47,646 @@ class LLMClient:
         model: str,
         temperature: float = 0.7,
         max_tokens: int = 2000,
+        max_connections: int = 1000,
+        max_keepalive_connections: int = 100,
+        keepalive_expiry: Optional[float] = 30.0,
+        cache: Optional[ResponseCache] = None,
+        metrics_sink: Optional[MetricsSink] = None,
+        stream_usage: bool = False,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        hooks: Optional[List[Hook]] = None,
+        coalesce: bool = False,
+        supports_n: Optional[bool] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        transport: Optional["httpx.BaseTransport"] = None,
         **kwargs
     ):
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.pool_options = dict(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.rate_limiter = rate_limiter
+        # Custom httpx transport for both SDK clients, e.g. a ``CassetteTransport``.
+        self.transport = transport
+        self.retry_policy = retry_policy
+        self._client: Optional["OpenAI"] = None
+        self._client_lock = threading.Lock()
+        self._async_client: Optional["AsyncOpenAI"] = None
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.cache = cache
+        self.metrics_sink = metrics_sink
+        self.stream_usage = stream_usage
+        self.hooks: List[Hook] = list(hooks or [])
+        # Identical concurrent requests share one upstream call when enabled.
+        self._flights: Optional[SingleFlight] = SingleFlight() if coalesce else None
+        # Whether the API honours the ``n`` parameter; None until the first ``chat_n`` finds out.
+        self.supports_n = supports_n
+        self.scheduler = scheduler
         self.extra_params = kwargs
     
-    def chat(self, messages: Iterable[ChatCompletionMessageParam], **kwargs) -> str:
-        """Send chat request and return response."""
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=kwargs.get('temperature', self.temperature),
-            max_tokens=kwargs.get('max_tokens', self.max_tokens),
-            **{k: v for k, v in self.extra_params.items() if k not in kwargs}
-        )
-        return response.choices[0].message.content or ""
+    @property
+    def limits(self) -> "httpx.Limits":
+        """Connection pool limits shared by the sync and async clients."""
+        import httpx
+        return httpx.Limits(**self.pool_options)
+    
+    @property
+    def client(self) -> "OpenAI":
+        """Sync SDK client, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI, DefaultHttpxClient
+                    self._client = OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        http_client=DefaultHttpxClient(limits=self.limits, transport=self.transport),
+                        **self._sdk_options()
+                    )
+        return self._client
+    
+    @client.setter
+    def client(self, value: "OpenAI"):
+        self._client = value
+    
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        """Shared async client, created on first use with the same pool limits."""
+        if self._async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=DefaultAsyncHttpxClient(limits=self.limits, transport=self.transport),
+                **self._sdk_options()
+            )
+        return self._async_client
+    
+    def add_hook(self, hook: Hook):
+        """Register a callable that receives a ``CallRecord`` after every call."""
+        self.hooks.append(hook)
     
-    def stream_chat(self, messages: Iterable[ChatCompletionMessageParam], **kwargs) -> Iterator[str]:
-        """Stream chat responses."""
-        stream = self.client.chat.completions.create(
+    def _begin(self, operation: str) -> Optional[CallRecord]:
+        """Start a call record, or None when no hooks are registered."""
+        return CallRecord(self.model, self.base_url, operation) if self.hooks else None
+    
+    def _emit(self, record: Optional[CallRecord], usage=None, error: Optional[BaseException] = None,
+              cache_hit: bool = False, ttft: Optional[float] = None, coalesced: bool = False):
+        """Complete a call record and pass it to every hook."""
+        if record is None:
+            return
+        record.latency = time.perf_counter() - record.start
+        record.set_usage(usage)
+        record.cache_hit = cache_hit
+        record.ttft = ttft
+        record.coalesced = coalesced
+        if error is not None:
+            cancelled = isinstance(error, (GeneratorExit, asyncio.CancelledError))
+            record.error = "cancelled" if cancelled else type(error).__name__
+        for hook in self.hooks:
+            hook(record)
+    
+    def _sdk_options(self) -> Dict:
+        """SDK options; the SDK's own retries are disabled when a retry policy is set."""
+        return {"max_retries": 0} if self.retry_policy is not None else {}
+    
+    def _build_params(self, messages: Iterable["ChatCompletionMessageParam"], kwargs: Dict) -> Dict:
+        """Build request parameters, applying per-call overrides."""
+        params = dict(
             model=self.model,
             messages=messages,
             temperature=kwargs.get('temperature', self.temperature),
             max_tokens=kwargs.get('max_tokens', self.max_tokens),
-            stream=True,
             **{k: v for k, v in self.extra_params.items() if k not in kwargs}
         )
-        for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        if kwargs.get('timeout') is not None:
+            params['timeout'] = kwargs['timeout']
+        return params
+    
+    def _cache_key(self, params: Dict) -> Optional[str]:
+        """Get the cache key for a request, or None if it bypasses the cache."""
+        if self.cache is None or not self.cache.is_cacheable(params):
+            return None
+        return make_cache_key(params)
+    
+    def _slot(self, record: Optional[CallRecord]):
+        """Scheduler slot for one upstream request, or a no-op without a scheduler."""
+        return self.scheduler.slot(record) if self.scheduler is not None else nullcontext()
+    
+    def _aslot(self, record: Optional[CallRecord]):
+        """Async variant of ``_slot``."""
+        return self.scheduler.aslot(record) if self.scheduler is not None else nullcontext()
+    
+    def _create(self, params: Dict, record: Optional[CallRecord] = None, hold: Optional[ExitStack] = None):
+        """Create a completion, waiting for rate limits and retrying transient errors.
+        
+        Each attempt takes a scheduler slot only once the rate limiter has let
+        it through, and gives the slot back during retry backoff. A stream's
+        slot is moved onto ``hold`` so it stays taken until the stream ends.
+        """
+        cost = 0
+        if self.rate_limiter is not None:
+            cost = self.rate_limiter.estimate(params)
+            self.rate_limiter.acquire(cost)
+        attempt = 0
+        while True:
+            with ExitStack() as slot:
+                slot.enter_context(self._slot(record))
+                try:
+                    response = self.client.chat.completions.create(**params)
+                except Exception as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    error = e
+                else:
+                    if hold is not None:
+                        hold.enter_context(slot.pop_all())
+                    break
+            time.sleep(self.retry_policy.delay(attempt, error))
+            attempt += 1
+            if record is not None:
+                record.retries = attempt
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+        self._reconcile(cost, getattr(response, 'usage', None))
+        return response
+    
+    async def _acreate(self, params: Dict, record: Optional[CallRecord] = None,
+                       hold: Optional[AsyncExitStack] = None):
+        """Async variant of ``_create``."""
+        cost = 0
+        if self.rate_limiter is not None:
+            cost = self.rate_limiter.estimate(params)
+            await self.rate_limiter.aacquire(cost)
+        attempt = 0
+        while True:
+            async with AsyncExitStack() as slot:
+                await slot.enter_async_context(self._aslot(record))
+                try:
+                    response = await self.async_client.chat.completions.create(**params)
+                except Exception as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    error = e
+                else:
+                    if hold is not None:
+                        await hold.enter_async_context(slot.pop_all())
+                    break
+            await asyncio.sleep(self.retry_policy.delay(attempt, error))
+            attempt += 1
+            if record is not None:
+                record.retries = attempt
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+        self._reconcile(cost, getattr(response, 'usage', None))
+        return response
+    
+    def _complete(self, params: Dict, record: Optional[CallRecord]):
+        """Create a completion, joining an identical in-flight call when coalescing.
+        
+        Returns the response and whether it was shared with another caller.
+        """
+        if self._flights is None:
+            return self._create(params, record), False
+        return self._flights.do(make_cache_key(params), lambda: self._create(params, record))
+    
+    async def _acomplete(self, params: Dict, record: Optional[CallRecord]):
+        """Async variant of ``_complete``."""
+        if self._flights is None:
+            return await self._acreate(params, record), False
+        return await self._flights.ado(make_cache_key(params), lambda: self._acreate(params, record))
+    
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        policy = self.retry_policy
+        return policy is not None and attempt < policy.max_retries and policy.should_retry(error)
+    
+    def _reconcile(self, cost: int, usage):
+        """Return over-estimated tokens to the rate limiter once usage is known."""
+        if self.rate_limiter is not None and cost and usage is not None:
+            total = usage["total_tokens"] if isinstance(usage, dict) else usage.total_tokens
+            self.rate_limiter.reconcile(cost, total)
+    
+    def chat(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> str:
+        """Send chat request and return response."""
+        params = self._build_params(messages, kwargs)
+        record = self._begin("chat")
+        key = self._cache_key(params)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._emit(record, cache_hit=True)
+                return "".join(cached)
+        try:
+            response, coalesced = self._complete(params, record)
+        except Exception as e:
+            self._emit(record, error=e)
+            raise
+        content = response.choices[0].message.content or ""
+        self._emit(record, None if coalesced else getattr(response, 'usage', None), coalesced=coalesced)
+        if key is not None:
+            self.cache.set(key, [content])
+        return content
+    
+    def _message_params(self, messages: Iterable["ChatCompletionMessageParam"], kwargs: Dict) -> Dict:
+        params = self._build_params(messages, kwargs)
+        for key in ("tools", "tool_choice"):
+            if kwargs.get(key) is not None:
+                params[key] = kwargs[key]
+        return params
+    
+    @staticmethod
+    def _message_dict(response) -> Dict:
+        """The first choice as a plain assistant message dict."""
+        message = response.choices[0].message
+        if not message.tool_calls:
+            return {"role": "assistant", "content": message.content or ""}
+        return {"role": "assistant", "content": message.content, "tool_calls": [
+            {"id": call.id, "type": "function",
+             "function": {"name": call.function.name, "arguments": call.function.arguments}}
+            for call in message.tool_calls
+        ]}
+    
+    def chat_message(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> Dict:
+        """Send a chat request and return the assistant message dict, with any ``tool_calls``.
+        
+        Also accepts ``tools`` and ``tool_choice``. Never served from the
+        cache or a coalesced call.
+        """
+        params = self._message_params(messages, kwargs)
+        record = self._begin("chat")
+        try:
+            response = self._create(params, record)
+        except Exception as e:
+            self._emit(record, error=e)
+            raise
+        self._emit(record, getattr(response, 'usage', None))
+        return self._message_dict(response)
+    
+    def chat_tools(self, messages: Iterable["ChatCompletionMessageParam"], tools: ToolRegistry,
+                   max_rounds: int = 8, memo: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        """Run the model/tool loop; returns the new messages, ending with the final answer.
+        
+        See ``tools.tool_loop``.
+        """
+        return tool_loop(self, list(messages), tools, max_rounds, memo, **kwargs)
+    
+    def _sample(self, messages: List["ChatCompletionMessageParam"], kwargs: Dict) -> str:
+        """One uncached, uncoalesced completion, so repeated calls give fresh samples."""
+        return self.chat_message(messages, **kwargs)["content"]
+    
+    def _n_params(self, messages: List["ChatCompletionMessageParam"], n: int, kwargs: Dict) -> Optional[Dict]:
+        """Parameters for a single request with ``n`` choices, or None to sample one by one."""
+        if n < 2 or self.supports_n is False:
+            return None
+        return dict(self._build_params(messages, kwargs), n=n)
+    
+    def _n_choices(self, response, n: int) -> List[str]:
+        """Read the choices of an ``n`` request and learn whether the API honoured it."""
+        replies = [choice.message.content or "" for choice in response.choices]
+        if self.supports_n is None:
+            self.supports_n = len(replies) > 1
+        return replies[:n]
+    
+    def _n_rejected(self, error: Exception) -> bool:
+        """Whether an ``n`` request failed because the API does not accept ``n``."""
+        if self.supports_n is None and getattr(error, 'status_code', None) in (400, 422):
+            self.supports_n = False
+            return True
+        return False
+    
+    def chat_n(self, messages: Iterable["ChatCompletionMessageParam"], n: int, **kwargs) -> List[str]:
+        """Sample ``n`` independent replies to the same messages.
+        
+        Asks for ``n`` choices in one request while ``supports_n`` allows it;
+        choices the provider did not return are requested in parallel. Samples
+        never come from the response cache or a coalesced call.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        messages = list(messages)
+        replies: List[str] = []
+        params = self._n_params(messages, n, kwargs)
+        if params is not None:
+            record = self._begin("chat")
+            try:
+                response = self._create(params, record)
+            except Exception as e:
+                self._emit(record, error=e)
+                if not self._n_rejected(e):
+                    raise
+            else:
+                self._emit(record, getattr(response, 'usage', None))
+                replies = self._n_choices(response, n)
+        missing = n - len(replies)
+        if missing > 0:
+            with ThreadPoolExecutor(max_workers=missing) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, self._sample, messages, kwargs)
+                           for _ in range(missing)]
+                replies += [future.result() for future in futures]
+        return replies
+    
+    def stream_chat(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> Iterator[str]:
+        """Stream chat responses; accepts ``stop_when`` like ``stream_events``."""
+        events = self.stream_events(messages, **kwargs)
+        try:
+            for event in events:
+                yield event.text
+        finally:
+            events.close()
+    
+    def stream_json(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> Iterator[Any]:
+        """Stream a JSON reply, yielding each array element as soon as it closes.
+        
+        See ``json_stream.iter_json``; a reply cut short yields its valid prefix.
+        """
+        return iter_json(self.stream_chat(messages, **kwargs))
+    
+    def _stream_params(self, params: Dict) -> Dict:
+        params = dict(params, stream=True)
+        if self.stream_usage:
+            params['stream_options'] = {"include_usage": True}
+        return params
+    
+    @staticmethod
+    def _usage(chunk) -> Optional[Dict[str, int]]:
+        usage = getattr(chunk, 'usage', None)
+        if usage is None:
+            return None
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+        }
+    
+    def _finish_stream(self, metrics: StreamMetrics):
+        metrics.finish()
+        if self.metrics_sink is not None:
+            self.metrics_sink(metrics)
+    
+    def stream_events(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> Iterator[StreamChunk]:
+        """Stream chat responses as timestamped chunks.
+        
+        Every chunk carries the request's ``StreamMetrics``, which is passed to
+        ``metrics_sink`` once the stream ends. ``stop_when`` takes client-side
+        stop conditions (see ``stop.StopMatcher.create``): the reply is cut
+        where one is met and the upstream stream is closed at once, as it is
+        when the caller stops iterating.
+        """
+        params = self._build_params(messages, kwargs)
+        matcher = StopMatcher.create(kwargs.get('stop_when'))
+        record = self._begin("stream")
+        key = self._cache_key(params)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics = StreamMetrics(self.model, cached=True)
+                for text in self._cut(cached, matcher, metrics):
+                    yield StreamChunk(text, metrics.record(text), metrics)
+                self._finish_stream(metrics)
+                self._emit(record, cache_hit=True, ttft=metrics.ttft)
+                return
+        # A stopped stream is private to its caller, so it is never shared.
+        if self._flights is None or matcher is not None:
+            yield from self._live_events(params, key, record, matcher)
+            return
+        events, shared = self._flights.stream(make_cache_key(params), lambda: self._live_events(params, key, record))
+        if not shared:
+            yield from events
+            return
+        try:
+            for event in events:
+                yield event
+        except BaseException as e:
+            self._emit(record, error=e, coalesced=True)
+            raise
+        self._emit(record, coalesced=True)
+    
+    @staticmethod
+    def _cut(texts: Iterable[str], matcher: Optional[StopMatcher], metrics: StreamMetrics) -> Iterator[str]:
+        """Cached chunks with the stop conditions applied."""
+        if matcher is None:
+            yield from texts
+            return
+        for text in texts:
+            text = matcher.feed(text)
+            if text:
+                yield text
+            if matcher.stopped:
+                metrics.stopped = True
+                return
+        text = matcher.flush()
+        if text:
+            yield text
+    
+    def _live_events(self, params: Dict, key: Optional[str], record: Optional[CallRecord],
+                     matcher: Optional[StopMatcher] = None) -> Iterator[StreamChunk]:
+        """Stream from the API, then report metrics and fill the cache.
+        
+        The upstream stream is closed as soon as iteration ends, whether the
+        reply finished, a stop condition was met or the caller gave up.
+        """
+        chunks = []
+        metrics = StreamMetrics(self.model)
+        try:
+            with ExitStack() as slot:
+                stream = self._create(self._stream_params(params), record, slot)
+                try:
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            text = chunk.choices[0].delta.content
+                            if matcher is not None:
+                                text = matcher.feed(text)
+                            if text:
+                                chunks.append(text)
+                                yield StreamChunk(text, metrics.record(text), metrics)
+                            if matcher is not None and matcher.stopped:
+                                metrics.stopped = True
+                                break
+                        elif not chunk.choices:
+                            metrics.usage = self._usage(chunk) or metrics.usage
+                finally:
+                    stream.close()
+                text = matcher.flush() if matcher is not None else ""
+                if text:
+                    chunks.append(text)
+                    yield StreamChunk(text, metrics.record(text), metrics)
+        except BaseException as e:
+            self._emit(record, metrics.usage, error=e, ttft=metrics.ttft)
+            raise
+        self._finish_stream(metrics)
+        self._emit(record, metrics.usage, ttft=metrics.ttft)
+        if metrics.usage is not None and self.rate_limiter is not None:
+            self._reconcile(self.rate_limiter.estimate(params), metrics.usage)
+        if key is not None and not metrics.stopped:
+            self.cache.set(key, chunks)
+    
+    async def achat(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> str:
+        """Send chat request without blocking the event loop."""
+        params = self._build_params(messages, kwargs)
+        record = self._begin("chat")
+        key = self._cache_key(params)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._emit(record, cache_hit=True)
+                return "".join(cached)
+        try:
+            response, coalesced = await self._acomplete(params, record)
+        except Exception as e:
+            self._emit(record, error=e)
+            raise
+        content = response.choices[0].message.content or ""
+        self._emit(record, None if coalesced else getattr(response, 'usage', None), coalesced=coalesced)
+        if key is not None:
+            self.cache.set(key, [content])
+        return content
+    
+    async def achat_message(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> Dict:
+        """Async variant of ``chat_message``."""
+        params = self._message_params(messages, kwargs)
+        record = self._begin("chat")
+        try:
+            response = await self._acreate(params, record)
+        except Exception as e:
+            self._emit(record, error=e)
+            raise
+        self._emit(record, getattr(response, 'usage', None))
+        return self._message_dict(response)
+    
+    async def achat_tools(self, messages: Iterable["ChatCompletionMessageParam"], tools: ToolRegistry,
+                          max_rounds: int = 8, memo: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        """Async variant of ``chat_tools``."""
+        return await atool_loop(self, list(messages), tools, max_rounds, memo, **kwargs)
+    
+    async def _asample(self, messages: List["ChatCompletionMessageParam"], kwargs: Dict) -> str:
+        """Async variant of ``_sample``."""
+        return (await self.achat_message(messages, **kwargs))["content"]
+    
+    async def achat_n(self, messages: Iterable["ChatCompletionMessageParam"], n: int, **kwargs) -> List[str]:
+        """Async variant of ``chat_n``."""
+        messages = list(messages)
+        replies: List[str] = []
+        params = self._n_params(messages, n, kwargs)
+        if params is not None:
+            record = self._begin("chat")
+            try:
+                response = await self._acreate(params, record)
+            except Exception as e:
+                self._emit(record, error=e)
+                if not self._n_rejected(e):
+                    raise
+            else:
+                self._emit(record, getattr(response, 'usage', None))
+                replies = self._n_choices(response, n)
+        missing = n - len(replies)
+        if missing > 0:
+            replies += await asyncio.gather(*(self._asample(messages, kwargs) for _ in range(missing)))
+        return replies
+    
+    async def astream_chat(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> AsyncIterator[str]:
+        """Stream chat responses without blocking the event loop."""
+        events = self.astream_events(messages, **kwargs)
+        try:
+            async for event in events:
+                yield event.text
+        finally:
+            await events.aclose()
+    
+    def astream_json(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> AsyncIterator[Any]:
+        """Async variant of ``stream_json``."""
+        return aiter_json(self.astream_chat(messages, **kwargs))
+    
+    async def astream_events(self, messages: Iterable["ChatCompletionMessageParam"], **kwargs) -> AsyncIterator[StreamChunk]:
+        """Async variant of ``stream_events``."""
+        params = self._build_params(messages, kwargs)
+        matcher = StopMatcher.create(kwargs.get('stop_when'))
+        record = self._begin("stream")
+        key = self._cache_key(params)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics = StreamMetrics(self.model, cached=True)
+                for text in self._cut(cached, matcher, metrics):
+                    yield StreamChunk(text, metrics.record(text), metrics)
+                self._finish_stream(metrics)
+                self._emit(record, cache_hit=True, ttft=metrics.ttft)
+                return
+        if self._flights is None or matcher is not None:
+            events, shared = self._alive_events(params, key, record, matcher), False
+        else:
+            events, shared = self._flights.astream(make_cache_key(params),
+                                                   lambda: self._alive_events(params, key, record))
+        try:
+            async for event in events:
+                yield event
+        except BaseException as e:
+            if shared:
+                self._emit(record, error=e, coalesced=True)
+            raise
+        finally:
+            await events.aclose()
+        if shared:
+            self._emit(record, coalesced=True)
+    
+    async def _alive_events(self, params: Dict, key: Optional[str], record: Optional[CallRecord],
+                            matcher: Optional[StopMatcher] = None) -> AsyncIterator[StreamChunk]:
+        """Async variant of ``_live_events``."""
+        chunks = []
+        metrics = StreamMetrics(self.model)
+        try:
+            async with AsyncExitStack() as slot:
+                stream = await self._acreate(self._stream_params(params), record, slot)
+                try:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            text = chunk.choices[0].delta.content
+                            if matcher is not None:
+                                text = matcher.feed(text)
+                            if text:
+                                chunks.append(text)
+                                yield StreamChunk(text, metrics.record(text), metrics)
+                            if matcher is not None and matcher.stopped:
+                                metrics.stopped = True
+                                break
+                        elif not chunk.choices:
+                            metrics.usage = self._usage(chunk) or metrics.usage
+                finally:
+                    await stream.close()
+                text = matcher.flush() if matcher is not None else ""
+                if text:
+                    chunks.append(text)
+                    yield StreamChunk(text, metrics.record(text), metrics)
+        except BaseException as e:
+            self._emit(record, metrics.usage, error=e, ttft=metrics.ttft)
+            raise
+        self._finish_stream(metrics)
+        self._emit(record, metrics.usage, ttft=metrics.ttft)
+        if metrics.usage is not None and self.rate_limiter is not None:
+            self._reconcile(self.rate_limiter.estimate(params), metrics.usage)
+        if key is not None and not metrics.stopped:
+            self.cache.set(key, chunks)
+    
+    def close(self):
+        """Close the underlying HTTP connection pool."""
+        if self._client is not None:
+            self._client.close()
+    
+    async def aclose(self):
+        """Close the async HTTP connection pool."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+def create_client(provider: str = "openai", **kwargs) -> LLMClient:
+    """Create an ``LLMClient`` from API settings.
+    
+    Every supported provider speaks the OpenAI-compatible API, so
+    ``provider`` is accepted for config compatibility and not used.
+    """
+    return LLMClient(**kwargs)
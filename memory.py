@@ -0,0 +1,247 @@
+"""Long-term agent memory: embeddings and a local vector index."""
+import heapq
+import math
+import operator
+import re
+import zlib
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
+
+_TOKEN = re.compile(r"[^\W\d_]+|\d+", re.UNICODE)
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by do does did for from had has have he her his i if in into is it its "
+    "me my no not of on or our she so that the their them then there they this to was we were what "
+    "when where which who why will with you your".split()
+)
+
+_numpy_module = None
+
+
+def _numpy():
+    """Import numpy on first use; returns None when it is not installed."""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy_module = numpy
+    return _numpy_module or None
+
+
+def _stem(word: str) -> str:
+    """Strip a common English suffix so "works" and "working" match "work"."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _features(text: str) -> List[str]:
+    """Lowercased, stemmed content words; runs of CJK characters become characters and bigrams."""
+    features = []
+    for token in _TOKEN.findall(text.lower()):
+        if _CJK.search(token):
+            features.extend(token)
+            features.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif token not in STOPWORDS:
+            features.append(_stem(token))
+    return features
+
+
+def hash_embedding(texts: List[str], dim: int = 512) -> List[List[float]]:
+    """Deterministic bag-of-words embedding by signed feature hashing.
+
+    Needs no model or network, and gives the same vectors in every process.
+    Vectors are L2-normalized, so dot products are cosine similarities.
+    """
+    vectors = []
+    for text in texts:
+        counts: Dict[int, float] = {}
+        for feature in _features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            slot = digest % dim
+            counts[slot] = counts.get(slot, 0.0) + (1.0 if digest & 0x80000000 else -1.0)
+        norm = math.sqrt(sum(x * x for x in counts.values())) or 1.0
+        vector = [0.0] * dim
+        for slot, value in counts.items():
+            vector[slot] = value / norm
+        vectors.append(vector)
+    return vectors
+
+
+class VectorIndex:
+    """Append-only matrix of normalized vectors with batched top-k search.
+
+    Uses a float32 numpy matrix grown by doubling when numpy is installed.
+    Without numpy, each row keeps only its non-zero entries in compact
+    arrays, which keeps sparse embeddings such as ``hash_embedding`` cheap
+    to store and search in pure Python.
+    """
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.size = 0
+        self._np = _numpy()
+        if self._np is not None:
+            self._matrix = self._np.zeros((16, dim), dtype=self._np.float32)
+        else:
+            self._rows: List[Tuple[array, array]] = []
+    
+    def add(self, vectors: Sequence[Sequence[float]]):
+        """Append vectors, normalizing each to unit length."""
+        if not len(vectors):
+            return
+        if self._np is None:
+            for vector in vectors:
+                norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+                slots = [slot for slot, x in enumerate(vector) if x]
+                self._rows.append((array("I", slots), array("f", (vector[slot] / norm for slot in slots))))
+            self.size += len(vectors)
+            return
+        np = self._np
+        block = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        block = block / np.where(norms == 0, 1, norms)
+        needed = self.size + len(block)
+        if needed > len(self._matrix):
+            grown = np.zeros((max(needed, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+            grown[:self.size] = self._matrix[:self.size]
+            self._matrix = grown
+        self._matrix[self.size:needed] = block
+        self.size = needed
+    
+    def search(self, queries: Sequence[Sequence[float]], k: int) -> List[List[Tuple[int, float]]]:
+        """Top ``k`` ``(row, cosine similarity)`` pairs for each query, best first."""
+        k = min(k, self.size)
+        if k <= 0:
+            return [[] for _ in queries]
+        if self._np is None:
+            results = []
+            for query in queries:
+                norm = math.sqrt(sum(x * x for x in query)) or 1.0
+                get = query.__getitem__
+                scores = [sum(map(operator.mul, map(get, slots), values)) / norm for slots, values in self._rows]
+                best = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+                results.append([(row, scores[row]) for row in best])
+            return results
+        np = self._np
+        block = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        scores = (block / np.where(norms == 0, 1, norms)) @ self._matrix[:self.size].T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row_scores[candidates])]
+            results.append([(int(row), float(row_scores[row])) for row in ordered])
+        return results
+
+
+class MemoryStore:
+    """Embedded memories of past turns and background text for one agent.
+
+    New memories are embedded lazily, in one batch, on the next search, so
+    a remote ``embed`` function is called once per request rather than once
+    per message. ``recall`` returns a bounded block of the most relevant
+    memories, skipping those whose source message is already in the prompt.
+    ``fork`` gives a branch its own store layered over the memories so far.
+    """
+    
+    def __init__(
+        self,
+        embed: Optional[Embedder] = None,
+        dim: int = 512,
+        k: int = 4,
+        min_score: float = 0.15,
+        max_chars: int = 2000,
+    ):
+        self.embed = embed or (lambda texts: hash_embedding(texts, dim))
+        self.dim = dim
+        self.k = k
+        self.min_score = min_score
+        self.max_chars = max_chars
+        self.texts: List[str] = []
+        self.sources: List[Any] = []
+        self.index = VectorIndex(dim)
+        self._pending = 0
+        # A fork also recalls the first ``_inherited`` memories of its parent.
+        self._parent: Optional["MemoryStore"] = None
+        self._inherited = 0
+    
+    def __len__(self) -> int:
+        return self._inherited + len(self.texts)
+    
+    def fork(self) -> "MemoryStore":
+        """A store that recalls this one's memories so far; later additions to either side stay private."""
+        branch = MemoryStore(self.embed, self.dim, self.k, self.min_score, self.max_chars)
+        branch._parent = self
+        branch._inherited = len(self)
+        return branch
+    
+    def add(self, text: str, source: Any = None):
+        """Remember ``text``; ``source`` identifies the message it came from."""
+        self.texts.append(text)
+        self.sources.append(source)
+        self._pending += 1
+    
+    def add_many(self, texts: List[str]):
+        """Remember several background texts."""
+        for text in texts:
+            self.add(text)
+    
+    def _flush(self):
+        if self._pending:
+            self.index.add(self.embed(self.texts[-self._pending:]))
+            self._pending = 0
+    
+    def search(self, queries: List[str], k: Optional[int] = None,
+               exclude: Optional[set] = None) -> List[List[Tuple[str, float]]]:
+        """Top memories for each query, as ``(text, score)`` pairs above ``min_score``.
+
+        Memories whose source's ``id`` is in ``exclude`` are skipped.
+        """
+        matches = self._matches(self.embed(queries), k or self.k, exclude or set(), len(self))
+        return [[(text, score) for score, text in chosen] for chosen in matches]
+    
+    def _matches(self, vectors: Sequence[Sequence[float]], k: int, exclude: set,
+                 limit: int) -> List[List[Tuple[float, str]]]:
+        """Best ``(score, text)`` pairs for each query among the first ``limit`` memories, parent's included."""
+        self._flush()
+        own = max(0, min(len(self.texts), limit - self._inherited))
+        results: List[List[Tuple[float, str]]] = [[] for _ in vectors]
+        if own:
+            # Over-fetch so excluded memories and those added after a fork do not starve the result.
+            hits = self.index.search(vectors, k + len(exclude) + len(self.texts) - own)
+            for chosen, query_hits in zip(results, hits):
+                for row, score in query_hits:
+                    if score < self.min_score or len(chosen) == k:
+                        break
+                    source = self.sources[row]
+                    if row < own and (source is None or id(source) not in exclude):
+                        chosen.append((score, self.texts[row]))
+        if self._parent is not None:
+            inherited = self._parent._matches(vectors, k, exclude, min(limit, self._inherited))
+            for chosen, more in zip(results, inherited):
+                chosen.extend(more)
+                chosen.sort(reverse=True)
+                del chosen[k:]
+        return results
+    
+    def recall(self, queries: List[str], exclude: Optional[set] = None) -> List[str]:
+        """Best memories across ``queries``, most relevant first, within ``max_chars``."""
+        best: Dict[str, float] = {}
+        for query_hits in self.search(queries, exclude=exclude):
+            for text, score in query_hits:
+                best[text] = max(score, best.get(text, score))
+        recalled, used = [], 0
+        for text in sorted(best, key=best.get, reverse=True)[:self.k]:
+            if used + len(text) > self.max_chars:
+                text = text[:max(0, self.max_chars - used)]
+            if not text:
+                break
+            recalled.append(text)
+            used += len(text)
+        return recalled
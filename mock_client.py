@@ -0,0 +1,130 @@
+"""Offline stand-in for ``LLMClient`` for fast local runs and simulations."""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    from .stop import StopMatcher
+except ImportError:
+    from stop import StopMatcher
+
+Responder = Callable[[List[Dict[str, str]], random.Random], str]
+
+CANDIDATES = re.compile(r"^Candidates:\s*(.+)$", re.M)
+LINES = [
+    "I have been watching everyone closely and something feels off.",
+    "I am just a simple villager, I swear.",
+    "Let's not rush our decision today.",
+    "Someone here is hiding something, and I intend to find out who.",
+    "I trust nobody yet, but I have my suspicions.",
+]
+
+
+def default_responder(messages: List[Dict[str, str]], rng: random.Random) -> str:
+    """Pick a random candidate when asked to choose, otherwise say a stock line."""
+    last = messages[-1]["content"] if messages else ""
+    match = CANDIDATES.search(last)
+    if match:
+        names = [name.strip() for name in match.group(1).split(",") if name.strip()]
+        keyword = "VOTE" if "VOTE:" in last else "TARGET"
+        return f"I have made up my mind.\n{keyword}: {rng.choice(names)}"
+    return rng.choice(LINES)
+
+
+class MockLLMClient:
+    """Answers chat requests locally with the same interface as ``LLMClient``.
+    
+    Replies come from ``responder`` called with the request messages and a
+    random generator seeded from ``seed`` and the messages, so identical
+    requests always get identical replies. ``latency`` seconds of simulated
+    delay are added to every call.
+    """
+    
+    def __init__(
+        self,
+        responder: Optional[Responder] = None,
+        latency: float = 0.0,
+        seed: int = 0,
+        model: str = "mock",
+    ):
+        self.responder = responder or default_responder
+        self.latency = latency
+        self.seed = seed
+        self.model = model
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def _reply(self, messages: Iterable[Dict[str, str]], sample: int = 0) -> str:
+        messages = list(messages)
+        with self._lock:
+            self.calls += 1
+        digest = zlib.crc32(json.dumps(messages, sort_keys=True, ensure_ascii=False).encode())
+        return self.responder(messages, random.Random(f"{self.seed}:{digest}:{sample}"))
+    
+    def chat(self, messages: Iterable[Dict[str, str]], **kwargs) -> str:
+        """Return a reply after ``latency`` seconds."""
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(messages)
+    
+    def chat_message(self, messages: Iterable[Dict[str, str]], **kwargs) -> Dict[str, str]:
+        """Return the reply as an assistant message; the mock never calls tools."""
+        return {"role": "assistant", "content": self.chat(messages)}
+    
+    def chat_n(self, messages: Iterable[Dict[str, str]], n: int, **kwargs) -> List[str]:
+        """Return ``n`` replies, each drawn with its own sample index."""
+        messages = list(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._reply(messages, sample) for sample in range(n)]
+    
+    @staticmethod
+    def _words(reply: str, stop_when) -> Iterator[str]:
+        matcher = StopMatcher.create(stop_when)
+        for word in re.findall(r"\S+\s*", reply):
+            if matcher is not None:
+                word = matcher.feed(word)
+            if word:
+                yield word
+            if matcher is not None and matcher.stopped:
+                return
+        rest = matcher.flush() if matcher is not None else ""
+        if rest:
+            yield rest
+    
+    def stream_chat(self, messages: Iterable[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Yield the reply word by word, applying any ``stop_when`` conditions."""
+        yield from self._words(self.chat(messages), kwargs.get("stop_when"))
+    
+    async def achat(self, messages: Iterable[Dict[str, str]], **kwargs) -> str:
+        """Async variant of ``chat``."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(messages)
+    
+    async def achat_message(self, messages: Iterable[Dict[str, str]], **kwargs) -> Dict[str, str]:
+        """Async variant of ``chat_message``."""
+        return {"role": "assistant", "content": await self.achat(messages)}
+    
+    async def achat_n(self, messages: Iterable[Dict[str, str]], n: int, **kwargs) -> List[str]:
+        """Async variant of ``chat_n``."""
+        messages = list(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._reply(messages, sample) for sample in range(n)]
+    
+    async def astream_chat(self, messages: Iterable[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """Async variant of ``stream_chat``."""
+        for word in self._words(await self.achat(messages), kwargs.get("stop_when")):
+            yield word
+    
+    def close(self):
+        """Nothing to release; present for interface compatibility."""
+    
+    async def aclose(self):
+        """Nothing to release; present for interface compatibility."""
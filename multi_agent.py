@@ -1,17 +1,120 @@
 """Multi-agent system for coordinating multiple AI agents."""
-from typing import List, Dict, Callable, Optional
-from agent import Agent
+import asyncio
+import contextvars
+import random
+import re
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Generator, List, Dict, Callable, Optional, Tuple
+
+try:
+    from .agent import Agent
+    from .transcript import SharedTranscript
+    from .rate_limit import RetryPolicy
+except ImportError:
+    from agent import Agent
+    from transcript import SharedTranscript
+    from rate_limit import RetryPolicy
+
+
+def _wait(future: Future, started: List[Optional[float]], index: int, timeout: Optional[float]):
+    """Result of a call, its exception, or ``TimeoutError`` once it has run ``timeout`` seconds."""
+    try:
+        while True:
+            begun = started[index]
+            remaining = timeout if begun is None or timeout is None else begun + timeout - time.monotonic()
+            try:
+                return future.result(timeout=None if remaining is None else max(0.0, remaining))
+            except FutureTimeout:
+                # A call still queued for a worker gets its full time once it starts.
+                if begun is not None:
+                    raise TimeoutError(f"no answer within {timeout} seconds") from None
+    except Exception as e:
+        return e
+
+
+def _is_transient(error: BaseException) -> bool:
+    return isinstance(error, TimeoutError) or (isinstance(error, Exception) and RetryPolicy().should_retry(error))
+
+
+def _run_calls(calls: List[Tuple[str, Callable[[], str]]], max_concurrency: Optional[int],
+               timeout: Optional[float], busy: Dict[str, Future], strict: bool = False) -> List[tuple]:
+    """Run named calls on worker threads and return ordered ``(name, result or exception)`` pairs.
+    
+    ``max_concurrency`` of None runs the calls one after another; with
+    ``strict``, a sequential call that fails with anything but a transient
+    error or timeout raises instead. Each call has ``timeout`` seconds of
+    wall-clock time from when it starts; threads cannot be interrupted, so
+    a call that runs over is reported as a ``TimeoutError`` and left to
+    finish in the background. Until it does, its name stays in ``busy``
+    and the agent is not prompted again, so its late answer still follows
+    its own prompt in the history.
+    """
+    if not calls:
+        return []
+    waiting = [name for name, _ in calls if name in busy]
+    if waiting:
+        skipped = {name: TimeoutError(f"{name} is still answering an earlier prompt") for name in waiting}
+        ready = [(name, fn) for name, fn in calls if name not in skipped]
+        outcomes = dict(_run_calls(ready, max_concurrency, timeout, busy, strict))
+        return [(name, skipped[name] if name in skipped else outcomes[name]) for name, _ in calls]
+    started: List[Optional[float]] = [None] * len(calls)
+    
+    def start(index: int, fn: Callable[[], str]) -> str:
+        started[index] = time.monotonic()
+        return fn()
+    
+    def submit(index: int, fn: Callable[[], str]) -> Future:
+        # Each worker runs in a copy of the caller's context so hook labels carry over.
+        return pool.submit(contextvars.copy_context().run, start, index, fn)
+    
+    def settle(name: str, index: int, future: Future):
+        result = _wait(future, started, index, timeout)
+        if isinstance(result, TimeoutError) and not future.done():
+            busy[name] = future
+            future.add_done_callback(lambda _: busy.pop(name, None))
+        return result
+    
+    sequential = max_concurrency is None
+    # Sequential calls get spare workers so a call that timed out does not hold up the next.
+    pool = ThreadPoolExecutor(max_workers=len(calls) if sequential else max(1, min(max_concurrency, len(calls))))
+    try:
+        if sequential:
+            outcomes = []
+            for index, (name, fn) in enumerate(calls):
+                result = settle(name, index, submit(index, fn))
+                if strict and isinstance(result, Exception) and not _is_transient(result):
+                    raise result
+                outcomes.append((name, result))
+            return outcomes
+        futures = [submit(index, fn) for index, (_, fn) in enumerate(calls)]
+        return [(name, settle(name, index, future))
+                for index, ((name, _), future) in enumerate(zip(calls, futures))]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
 class MultiAgentSystem:
-    """Manages multiple agents and their interactions."""
+    """Manages multiple agents and their interactions.
+    
+    With ``shared_transcript`` enabled, public messages are appended once to a
+    ``SharedTranscript`` that every agent reads from, instead of being copied
+    into each agent's history.
+    """
     
-    def __init__(self):
+    def __init__(self, shared_transcript: bool = False):
         self.agents: Dict[str, Agent] = {}
+        self.last_errors: Dict[str, Exception] = {}
+        # Calls that timed out but are still running, by agent name.
+        self._busy: Dict[str, Future] = {}
+        self.transcript: Optional[SharedTranscript] = SharedTranscript() if shared_transcript else None
     
     def add_agent(self, agent: Agent):
         """Add an agent to the system."""
         self.agents[agent.name] = agent
+        if self.transcript is not None:
+            agent.join(self.transcript)
     
     def remove_agent(self, name: str):
         """Remove an agent from the system."""
@@ -22,13 +125,75 @@ class MultiAgentSystem:
         """Get an agent by name."""
         return self.agents.get(name)
     
-    def broadcast(self, message: str, exclude: List[str] = None) -> Dict[str, str]:
-        """Send message to all agents and collect responses."""
+    def broadcast(
+        self,
+        message: str,
+        exclude: List[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, str]:
+        """Send message to all agents and collect responses.
+        
+        With ``max_concurrency`` set, agents respond in parallel on a thread
+        pool of that size; otherwise one after another. Responses keep agent
+        order, and agents that fail or take longer than ``timeout`` seconds
+        of wall-clock time are left out of the result and recorded in
+        ``last_errors`` instead of aborting the round; one after another,
+        only timeouts and transient API errors are recorded, and other
+        errors raise. An agent that timed out keeps answering in the
+        background and is skipped until it is done.
+        """
+        exclude = exclude or []
+        if self.transcript is not None:
+            # Announce once; each agent then answers privately.
+            self.transcript.append(None, message)
+        calls = [(name, lambda agent=agent: self._respond(agent, message))
+                 for name, agent in self.agents.items() if name not in exclude]
+        return self._collect(_run_calls(calls, max_concurrency, timeout, self._busy,
+                                        strict=max_concurrency is None))
+    
+    async def abroadcast(
+        self,
+        message: str,
+        exclude: List[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, str]:
+        """Send message to all agents concurrently on the event loop.
+        
+        Same result and error semantics as the concurrent ``broadcast``;
+        ``max_concurrency`` of None means no limit.
+        """
         exclude = exclude or []
+        if self.transcript is not None:
+            self.transcript.append(None, message)
+        targets = [(name, agent) for name, agent in self.agents.items() if name not in exclude]
+        semaphore = asyncio.Semaphore(max_concurrency or len(targets) or 1)
+        
+        async def run(agent: Agent) -> str:
+            async with semaphore:
+                if self.transcript is not None:
+                    return await asyncio.wait_for(agent.areply(), timeout)
+                return await asyncio.wait_for(agent.arespond(message), timeout)
+        
+        results = await asyncio.gather(*(run(agent) for _, agent in targets), return_exceptions=True)
+        return self._collect([(name, result) for (name, _), result in zip(targets, results)])
+    
+    def _respond(self, agent: Agent, message: str) -> str:
+        """Get an agent's answer to a broadcast message."""
+        if self.transcript is not None:
+            return agent.reply()
+        return agent.respond(message)
+    
+    def _collect(self, outcomes: List[tuple]) -> Dict[str, str]:
+        """Split ordered (name, result) pairs into responses and errors."""
+        self.last_errors = {}
         responses = {}
-        for name, agent in self.agents.items():
-            if name not in exclude:
-                responses[name] = agent.respond(message)
+        for name, result in outcomes:
+            if isinstance(result, BaseException):
+                self.last_errors[name] = result
+            else:
+                responses[name] = result
         return responses
     
     def round_robin(self, initial_message: str, rounds: int = 1) -> List[Dict[str, str]]:
@@ -36,6 +201,12 @@ class MultiAgentSystem:
         history = []
         current_message = initial_message
         
+        if self.transcript is not None:
+            self.transcript.append(None, initial_message)
+            for round_num in range(rounds):
+                history.append({name: agent.speak() for name, agent in self.agents.items()})
+            return history
+        
         for round_num in range(rounds):
             round_responses = {}
             for name, agent in self.agents.items():
@@ -48,40 +219,371 @@ class MultiAgentSystem:
     
     def reset_all(self):
         """Reset all agents' conversation histories."""
+        if self.transcript is not None:
+            self.transcript.clear()
         for agent in self.agents.values():
             agent.reset()
 
 
+WEREWOLF = "werewolf"
+SEER = "seer"
+VILLAGER = "villager"
+
+# Winners reported by ``WerewolfGame``.
+VILLAGE_WINS = "village"
+WEREWOLVES_WIN = "werewolves"
+DRAW = "draw"
+
+BRIEFINGS = {
+    WEREWOLF: "Your secret role is werewolf. {allies} Each night you choose a villager to kill; "
+              "by day, avoid being voted out.",
+    SEER: "Your secret role is seer. Each night you learn whether one player is a werewolf. "
+          "Help the village vote the werewolves out.",
+    VILLAGER: "Your secret role is villager. Find the werewolves and vote them out.",
+}
+DISCUSS_PROMPT = "It is your turn to speak to the other players."
+
+
+def assign_roles(names: List[str], rng: random.Random, werewolves: Optional[int] = None) -> Dict[str, str]:
+    """Deal roles to ``names`` at random.
+    
+    Defaults to one werewolf per four players, plus a seer in games of four
+    or more.
+    """
+    count = werewolves if werewolves is not None else max(1, len(names) // 4)
+    if count < 1 or 2 * count >= len(names):
+        raise ValueError(f"{len(names)} players cannot hold {count} werewolves")
+    deck = [WEREWOLF] * count
+    if len(names) >= 4 and count < len(names) - 1:
+        deck.append(SEER)
+    deck += [VILLAGER] * (len(names) - len(deck))
+    rng.shuffle(deck)
+    return dict(zip(names, deck))
+
+
+def parse_choice(text: Optional[str], candidates: List[str]) -> Optional[str]:
+    """Find which candidate a free-text answer picks.
+    
+    An explicit ``TARGET: name`` or ``VOTE: name`` line wins; otherwise the
+    candidate mentioned last is taken. Returns None when no candidate is named.
+    """
+    if not text:
+        return None
+    by_lower = {name.lower(): name for name in candidates}
+    for match in reversed(list(re.finditer(r"\b(?:target|vote)\s*[:：]\s*([^\n]+)", text, re.I))):
+        value = match.group(1).strip(" *.,;!?\"'").lower()
+        if value in by_lower:
+            return by_lower[value]
+        for lowered, name in by_lower.items():
+            if re.search(rf"\b{re.escape(lowered)}\b", value):
+                return name
+    chosen, position = None, -1
+    for name in candidates:
+        for match in re.finditer(rf"\b{re.escape(name)}\b", text, re.I):
+            if match.start() > position:
+                chosen, position = name, match.start()
+    return chosen
+
+
 class WerewolfGame(MultiAgentSystem):
-    """Specialized multi-agent system for Werewolf game."""
+    """Werewolf game engine driven by a seeded random generator.
     
-    def __init__(self):
-        super().__init__()
-        self.game_state = {
+    Roles are dealt at ``start_game``. Each night the werewolves pick a victim
+    and the seer inspects one player; each day everyone speaks once and then
+    votes someone out, until one side wins or ``max_days`` runs out. Every
+    random decision (roles, tie breaks) comes from ``rng``, so with a
+    deterministic model the same seed replays the same game. Answers are read
+    with ``parse_choice``; failed or unparseable answers count as abstentions,
+    as do answers that take longer than ``timeout`` seconds.
+    
+    The rules are written once as generators that yield batches of prompts;
+    ``play``/``aplay`` and the phase methods answer the batches on a thread
+    pool or on the event loop.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = 8,
+        timeout: Optional[float] = None,
+        shared_transcript: bool = True,
+        seed: Optional[int] = None,
+        max_days: int = 10,
+        werewolves: Optional[int] = None,
+    ):
+        super().__init__(shared_transcript)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_days = max_days
+        self.werewolves = werewolves
+        self.rng = random.Random(seed)
+        self.game_state = self._new_state()
+    
+    @staticmethod
+    def _new_state() -> Dict:
+        return {
             "phase": "night",
             "day": 0,
             "alive_players": [],
-            "dead_players": []
+            "dead_players": [],
+            "roles": {},
+            "winner": None,
+            "events": [],
+            "invalid": 0,
+            "errors": 0,
         }
     
-    def start_game(self):
-        """Initialize game state."""
-        self.game_state["day"] = 1
-        self.game_state["phase"] = "night"
-        self.game_state["alive_players"] = list(self.agents.keys())
-        self.game_state["dead_players"] = []
+    def start_game(self, roles: Optional[Dict[str, str]] = None):
+        """Initialize game state and brief every player on their secret role.
+        
+        Without ``roles``, the players' own ``game_role`` is used when every
+        player has one; otherwise roles are dealt from ``rng``.
+        """
+        self.game_state = state = self._new_state()
+        state["day"] = 1
+        state["alive_players"] = names = list(self.agents.keys())
+        if roles is None:
+            preset = {name: getattr(agent, "game_role", None) for name, agent in self.agents.items()}
+            roles = preset if all(preset.values()) else assign_roles(names, self.rng, self.werewolves)
+        state["roles"] = dict(roles)
+        wolves = self.players_with(WEREWOLF)
+        for name, agent in self.agents.items():
+            allies = [wolf for wolf in wolves if wolf != name]
+            briefing = BRIEFINGS[roles[name]].format(
+                allies=f"Your fellow werewolves: {', '.join(allies)}." if allies else "You are the only werewolf.")
+            agent.conversation.add_message("user", briefing)
+        self._announce(f"A game of Werewolf begins with {len(names)} players: {', '.join(names)}. "
+                       f"There {'is 1 werewolf' if len(wolves) == 1 else f'are {len(wolves)} werewolves'} among you.")
+    
+    def players_with(self, role: str) -> List[str]:
+        """Alive players holding ``role``."""
+        roles = self.game_state["roles"]
+        return [name for name in self.game_state["alive_players"] if roles.get(name) == role]
+    
+    def check_winner(self) -> Optional[str]:
+        """Return "village" or "werewolves" once a side has won, else None."""
+        wolves = len(self.players_with(WEREWOLF))
+        if wolves == 0:
+            return VILLAGE_WINS
+        if wolves >= len(self.game_state["alive_players"]) - wolves:
+            return WEREWOLVES_WIN
+        return None
+    
+    def _announce(self, message: str):
+        """Narrate a public message to every player."""
+        if self.transcript is not None:
+            self.transcript.append(None, message)
+        else:
+            for agent in self.agents.values():
+                agent.conversation.add_message("user", message)
+    
+    def _log(self, kind: str, **fields):
+        self.game_state["events"].append({"day": self.game_state["day"], "type": kind, **fields})
+    
+    def _choose(self, reply: Optional[str], candidates: List[str]) -> Optional[str]:
+        """Parse a reply, counting answers that name no candidate."""
+        choice = parse_choice(reply, candidates)
+        if choice is None:
+            self.game_state["invalid"] += 1
+        return choice
+    
+    def _tally(self, choices: Dict[str, Optional[str]], break_ties: bool) -> Optional[str]:
+        """Plurality of the non-empty choices; ties go to ``rng`` or to nobody."""
+        counts = Counter(choice for choice in choices.values() if choice)
+        if not counts:
+            return None
+        top = max(counts.values())
+        leaders = sorted(name for name, count in counts.items() if count == top)
+        if len(leaders) == 1:
+            return leaders[0]
+        return self.rng.choice(leaders) if break_ties else None
+    
+    def _settle(self):
+        winner = self.check_winner()
+        if winner is not None:
+            self.game_state["winner"] = winner
+            self.game_state["phase"] = "over"
+    
+    def _night(self) -> Generator[Dict[str, Optional[str]], Dict[str, str], None]:
+        """Night rules: werewolves vote on a victim, the seer inspects a player."""
+        state = self.game_state
+        state["phase"] = "night"
+        day = state["day"]
+        alive = list(state["alive_players"])
+        wolves, seers = self.players_with(WEREWOLF), self.players_with(SEER)
+        prey = [name for name in alive if name not in wolves]
+        self._announce(f"Night {day} falls. Everyone closes their eyes.")
+        
+        batch = {}
+        for wolf in wolves:
+            batch[wolf] = (f"Night {day}, {wolf}: choose a player to kill.\nCandidates: {', '.join(prey)}\n"
+                           "End your reply with 'TARGET: <name>'.")
+        for seer in seers:
+            others = [name for name in alive if name != seer]
+            batch[seer] = (f"Night {day}, {seer}: choose a player whose role you want to learn.\n"
+                           f"Candidates: {', '.join(others)}\nEnd your reply with 'TARGET: <name>'.")
+        replies = yield batch
+        
+        victim = self._tally({wolf: self._choose(replies.get(wolf), prey) for wolf in wolves}, break_ties=True)
+        for seer in seers:
+            target = self._choose(replies.get(seer), [name for name in alive if name != seer])
+            if target is not None:
+                verdict = "a werewolf" if state["roles"][target] == WEREWOLF else "not a werewolf"
+                self.agents[seer].conversation.add_message("user", f"Your vision reveals that {target} is {verdict}.")
+                self._log("check", seer=seer, target=target)
+        self._log("kill", target=victim)
+        if victim is None:
+            self._announce("Dawn breaks. Nobody died during the night.")
+        else:
+            self.eliminate_player(victim)
+            self._announce(f"Dawn breaks. {victim} was killed during the night.")
+        self._settle()
+    
+    def _day(self) -> Generator[Dict[str, Optional[str]], Dict[str, str], None]:
+        """Day rules: every player speaks once, then all vote; a tie eliminates nobody."""
+        state = self.game_state
+        state["phase"] = "day"
+        day = state["day"]
+        alive = list(state["alive_players"])
+        self._announce(f"Day {day}. Alive players: {', '.join(alive)}. Discuss who you suspect is a werewolf.")
+        
+        speeches = yield {name: None for name in alive}
+        # Published in seat order so the record does not depend on reply timing.
+        for speaker in alive:
+            if speaker not in speeches:
+                continue
+            if self.transcript is not None:
+                self.transcript.append(speaker, speeches[speaker])
+                continue
+            for name in alive:
+                if name != speaker:
+                    self.agents[name].conversation.add_message("user", f"{speaker}: {speeches[speaker]}")
+        
+        candidates = {name: [other for other in alive if other != name] for name in alive}
+        replies = yield {
+            name: (f"Day {day} vote, {name}: who do you vote to eliminate?\n"
+                   f"Candidates: {', '.join(candidates[name])}\nEnd your reply with 'VOTE: <name>'.")
+            for name in alive
+        }
+        votes = {name: self._choose(replies.get(name), candidates[name]) for name in alive}
+        self._log("vote", votes=votes)
+        summary = ", ".join(f"{name} -> {vote or 'abstain'}" for name, vote in votes.items())
+        eliminated = self._tally(votes, break_ties=False)
+        if eliminated is None:
+            self._announce(f"Votes: {summary}. The vote is tied; nobody is eliminated.")
+        else:
+            self.eliminate_player(eliminated)
+            self._announce(f"Votes: {summary}. {eliminated} is eliminated and was a {state['roles'][eliminated]}.")
+        self._log("eliminate", target=eliminated)
+        self._settle()
+    
+    def _rules(self) -> Generator[Dict[str, Optional[str]], Dict[str, str], None]:
+        """Alternate nights and days until a side wins or ``max_days`` is reached."""
+        state = self.game_state
+        while state["winner"] is None and state["day"] <= self.max_days:
+            yield from self._night()
+            if state["winner"] is None:
+                yield from self._day()
+            if state["winner"] is None:
+                self.next_day()
+        if state["winner"] is None:
+            state["winner"] = DRAW
+            state["phase"] = "over"
+    
+    def _turn(self, agent: Agent, prompt: Optional[str]) -> str:
+        """Answer one prompt; None asks for a public speech, which ``_day`` publishes."""
+        if prompt is not None:
+            return agent.respond(prompt)
+        if self.transcript is not None:
+            return agent.conversation.complete()
+        return agent.respond(DISCUSS_PROMPT)
+    
+    async def _aturn(self, agent: Agent, prompt: Optional[str]) -> str:
+        """Async variant of ``_turn``."""
+        if prompt is not None:
+            return await agent.arespond(prompt)
+        if self.transcript is not None:
+            return await agent.conversation.acomplete()
+        return await agent.arespond(DISCUSS_PROMPT)
+    
+    def _ask(self, batch: Dict[str, Optional[str]]) -> Dict[str, str]:
+        """Answer a batch of prompts, in parallel when ``max_concurrency`` is set."""
+        calls = [(name, lambda agent=self.agents[name], prompt=prompt: self._turn(agent, prompt))
+                 for name, prompt in batch.items()]
+        replies = self._collect(_run_calls(calls, self.max_concurrency, self.timeout, self._busy))
+        self.game_state["errors"] += len(self.last_errors)
+        return replies
+    
+    async def _aask(self, batch: Dict[str, Optional[str]]) -> Dict[str, str]:
+        """Async variant of ``_ask``; ``max_concurrency`` of None means no limit."""
+        semaphore = asyncio.Semaphore(self.max_concurrency or len(batch) or 1)
+        
+        async def run(name: str, prompt: Optional[str]) -> str:
+            async with semaphore:
+                return await asyncio.wait_for(self._aturn(self.agents[name], prompt), self.timeout)
+        
+        results = await asyncio.gather(*(run(name, prompt) for name, prompt in batch.items()), return_exceptions=True)
+        replies = self._collect(list(zip(batch, results)))
+        self.game_state["errors"] += len(self.last_errors)
+        return replies
+    
+    @staticmethod
+    def _merge(collected: Dict[str, str], replies: Dict[str, str]):
+        for name, reply in replies.items():
+            collected[name] = f"{collected[name]}\n{reply}" if name in collected else reply
+    
+    def _drive(self, rules: Generator) -> Dict[str, str]:
+        """Run rule steps to completion, returning every player's replies."""
+        collected: Dict[str, str] = {}
+        try:
+            batch = next(rules)
+            while True:
+                replies = self._ask(batch)
+                self._merge(collected, replies)
+                batch = rules.send(replies)
+        except StopIteration:
+            return collected
+    
+    async def _adrive(self, rules: Generator) -> Dict[str, str]:
+        """Async variant of ``_drive``."""
+        collected: Dict[str, str] = {}
+        try:
+            batch = next(rules)
+            while True:
+                replies = await self._aask(batch)
+                self._merge(collected, replies)
+                batch = rules.send(replies)
+        except StopIteration:
+            return collected
     
     def night_phase(self) -> Dict[str, str]:
         """Execute night phase actions."""
-        self.game_state["phase"] = "night"
-        prompt = f"Night {self.game_state['day']}. What is your action?"
-        return self.broadcast(prompt)
+        return self._drive(self._night())
     
     def day_phase(self) -> Dict[str, str]:
-        """Execute day phase discussions."""
-        self.game_state["phase"] = "day"
-        prompt = f"Day {self.game_state['day']}. Discuss and vote who you think is the werewolf."
-        return self.broadcast(prompt)
+        """Execute day phase discussions and the vote."""
+        return self._drive(self._day())
+    
+    async def anight_phase(self) -> Dict[str, str]:
+        """Execute night phase actions on the event loop."""
+        return await self._adrive(self._night())
+    
+    async def aday_phase(self) -> Dict[str, str]:
+        """Execute day phase discussions and the vote on the event loop."""
+        return await self._adrive(self._day())
+    
+    def play(self) -> str:
+        """Play a whole game and return the winner: "village", "werewolves" or "draw"."""
+        if not self.game_state["day"]:
+            self.start_game()
+        self._drive(self._rules())
+        return self.game_state["winner"]
+    
+    async def aplay(self) -> str:
+        """Async variant of ``play``."""
+        if not self.game_state["day"]:
+            self.start_game()
+        await self._adrive(self._rules())
+        return self.game_state["winner"]
     
     def eliminate_player(self, player_name: str):
         """Remove a player from the game."""
@@ -0,0 +1,148 @@
+"""Client-side rate limiting and retry with backoff."""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+try:
+    from .context import estimate_tokens
+except ImportError:
+    from context import estimate_tokens
+
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    ``reserve`` always succeeds and returns how long the caller must wait
+    before using what it took, so concurrent callers queue up in order instead
+    of polling.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens and return the delay in seconds before they are available."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def refund(self, amount: float):
+        """Give back tokens that were reserved but not used."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Admission control on requests per minute and estimated tokens per minute.
+
+    Share one limiter (or one client) between all agents so they draw from the
+    same quota. Token cost is estimated as prompt tokens plus ``max_tokens`` and
+    corrected with the reported usage once the response arrives.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def estimate(self, params: Dict) -> int:
+        """Estimate the token cost of a request."""
+        prompt = sum(estimate_tokens(m.get("content") or "") + 4 for m in params.get("messages") or [])
+        return prompt + (params.get("max_tokens") or 0)
+
+    def _reserve(self, cost: int, count_request: bool = True) -> float:
+        delay = 0.0
+        if self.requests is not None and count_request:
+            delay = self.requests.reserve(1)
+        if self.tokens is not None and cost:
+            delay = max(delay, self.tokens.reserve(cost))
+        return delay
+
+    def acquire(self, cost: int = 0, count_request: bool = True):
+        """Block until a request of the given token cost may be sent."""
+        delay = self._reserve(cost, count_request)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, cost: int = 0, count_request: bool = True):
+        """Wait on the event loop until a request may be sent."""
+        delay = self._reserve(cost, count_request)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def reconcile(self, estimated: int, actual: Optional[int]):
+        """Refund the difference between estimated and reported token usage."""
+        if self.tokens is not None and actual is not None and estimated > actual:
+            self.tokens.refund(estimated - actual)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honours ``Retry-After``."""
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        jitter: bool = True,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(self, error: Exception) -> bool:
+        """Check whether an error is transient."""
+        import openai
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+        return False
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Seconds to wait before retry number ``attempt`` (starting at 0)."""
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+    @staticmethod
+    def _retry_after(error: Optional[Exception]) -> Optional[float]:
+        """Read the server's requested delay from the error response, if any."""
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000.0
+            value = headers.get("retry-after")
+            if not value:
+                return None
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,447 @@
+"""Multi-endpoint routing with load balancing and health-aware failover."""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Iterator, AsyncIterator
+
+try:
+    from .llm_client import LLMClient
+    from .rate_limit import RateLimiter, RetryPolicy
+    from .streaming import StreamChunk
+    from .json_stream import iter_json, aiter_json
+    from .tools import ToolRegistry, tool_loop, atool_loop
+except ImportError:
+    from llm_client import LLMClient
+    from rate_limit import RateLimiter, RetryPolicy
+    from streaming import StreamChunk
+    from json_stream import iter_json, aiter_json
+    from tools import ToolRegistry, tool_loop, atool_loop
+
+
+class Endpoint:
+    """An upstream client with load, latency and health tracking."""
+    
+    def __init__(self, client: LLMClient, weight: float = 1.0, name: Optional[str] = None, window: int = 200):
+        if not weight > 0:
+            raise ValueError(f"endpoint weight must be positive, got {weight!r}")
+        self.client = client
+        self.weight = weight
+        self.name = name or f"{client.model}@{client.base_url}"
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ewma_latency = 0.0
+        self.latencies: "deque[float]" = deque(maxlen=window)
+    
+    def available(self, now: float) -> bool:
+        """Check whether the endpoint is admitted to receive traffic."""
+        return now >= self.ejected_until
+    
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Latency percentile over the recent window, or None without samples."""
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(q * len(values)))]
+    
+    @property
+    def error_rate(self) -> float:
+        return self.failures / self.requests if self.requests else 0.0
+    
+    def stats(self) -> Dict:
+        """Snapshot of the endpoint's health."""
+        return {
+            "name": self.name,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "error_rate": self.error_rate,
+            "p50": self.latency_percentile(0.5),
+            "p95": self.latency_percentile(0.95),
+            "ejected": not self.available(time.monotonic()),
+        }
+
+
+class RoutedClient:
+    """Client that spreads requests over several endpoints.
+
+    Exposes the same ``chat``/``stream_chat``/``achat``/``astream_chat``
+    methods as ``LLMClient``, so it can be passed to ``Conversation`` or
+    ``Agent`` directly. Endpoints that fail ``eject_after`` times in a row
+    with transient errors (connection errors, timeouts, 429 and 5xx) are
+    ejected for ``eject_seconds`` and re-admitted afterwards; those errors
+    also fail over to the next endpoint. With ``hedge_percentile`` set, a
+    non-streaming request still running after that latency percentile of its
+    endpoint is duplicated on another endpoint and the first reply wins.
+    """
+    
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        policy: str = "least_outstanding",
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+    ):
+        if not endpoints:
+            raise ValueError("RoutedClient needs at least one endpoint")
+        if policy not in ("least_outstanding", "weighted"):
+            raise ValueError(f"Unknown routing policy: {policy}")
+        self.endpoints = endpoints
+        self.policy = policy
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retry_policy = RetryPolicy()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+    
+    @classmethod
+    def from_config(cls, endpoint_configs: List[Dict], client_kwargs: Optional[Dict] = None, **kwargs) -> "RoutedClient":
+        """Build a router from ``endpoints`` entries of the config file.
+        
+        ``client_kwargs`` are passed to every endpoint's ``LLMClient``; each
+        entry's own keys (model, base_url, api_key, ...) take precedence.
+        """
+        endpoints = []
+        for entry in endpoint_configs:
+            entry = dict(entry)
+            weight = entry.pop("weight", 1.0)
+            name = entry.pop("name", None)
+            entry.pop("provider", None)
+            if entry.get("rate_limit"):
+                entry["rate_limiter"] = RateLimiter(**entry["rate_limit"])
+            entry.pop("rate_limit", None)
+            client = LLMClient(**{**(client_kwargs or {}), **entry})
+            endpoints.append(Endpoint(client, weight=weight, name=name))
+        return cls(endpoints, **kwargs)
+    
+    @property
+    def model(self) -> str:
+        return self.endpoints[0].client.model
+    
+    def add_hook(self, hook):
+        """Register a call hook on every endpoint's client."""
+        for endpoint in self.endpoints:
+            endpoint.client.add_hook(hook)
+    
+    def stats(self) -> List[Dict]:
+        """Health snapshot of every endpoint."""
+        return [endpoint.stats() for endpoint in self.endpoints]
+    
+    def _pick(self, exclude: List[Endpoint] = ()) -> Endpoint:
+        """Choose an endpoint and count the request against it."""
+        with self._lock:
+            now = time.monotonic()
+            remaining = [e for e in self.endpoints if e not in exclude] or self.endpoints
+            candidates = [e for e in remaining if e.available(now)]
+            if not candidates:
+                # Everything is ejected: probe the one that comes back soonest.
+                candidates = [min(remaining, key=lambda e: e.ejected_until)]
+            if self.policy == "weighted":
+                endpoint = random.choices(candidates, weights=[e.weight for e in candidates])[0]
+            else:
+                endpoint = min(candidates, key=lambda e: (e.outstanding / e.weight, e.ewma_latency))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+    
+    def _release(self, endpoint: Endpoint, latency: Optional[float] = None, error: Optional[Exception] = None,
+                 cancelled: bool = False):
+        """Record the outcome of a request on an endpoint.
+        
+        Only transient errors count against its health: a 400 or 401 says
+        nothing about the endpoint. A request cancelled before it finished,
+        such as the losing hedge, only frees its slot.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if cancelled or (error is not None and not self.retry_policy.should_retry(error)):
+                return
+            if error is None:
+                endpoint.consecutive_failures = 0
+                if latency is not None:
+                    endpoint.latencies.append(latency)
+                    endpoint.ewma_latency = latency if not endpoint.ewma_latency else (
+                        0.8 * endpoint.ewma_latency + 0.2 * latency)
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                # Half-open on re-admission: one more failure ejects it again.
+                endpoint.consecutive_failures = self.eject_after - 1
+    
+    def _can_fail_over(self, error: Exception, tried: List[Endpoint]) -> bool:
+        return len(tried) < len(self.endpoints) and self.retry_policy.should_retry(error)
+    
+    def _hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.endpoints) < 2:
+            return None
+        if len(endpoint.latencies) < self.hedge_min_samples:
+            return None
+        return endpoint.latency_percentile(self.hedge_percentile)
+    
+    def _call(self, endpoint: Endpoint, messages, kwargs: Dict) -> str:
+        start = time.monotonic()
+        try:
+            result = endpoint.client.chat(messages, **kwargs)
+        except Exception as e:
+            self._release(endpoint, error=e)
+            raise
+        self._release(endpoint, latency=time.monotonic() - start)
+        return result
+    
+    def chat(self, messages, **kwargs) -> str:
+        """Send chat request to the best endpoint, failing over on transient errors."""
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._pick(tried)
+            tried.append(endpoint)
+            delay = self._hedge_delay(endpoint)
+            try:
+                if delay is None:
+                    return self._call(endpoint, messages, kwargs)
+                return self._hedged(endpoint, delay, tried, messages, kwargs)
+            except Exception as e:
+                if not self._can_fail_over(e, tried):
+                    raise
+    
+    def _hedged(self, primary: Endpoint, delay: float, tried: List[Endpoint], messages, kwargs: Dict) -> str:
+        """Run on the primary endpoint and race a backup once ``delay`` passes."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.endpoints)))
+        futures = [self._pool.submit(contextvars.copy_context().run, self._call, primary, messages, kwargs)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            backup = self._pick(tried)
+            tried.append(backup)
+            futures.append(self._pool.submit(contextvars.copy_context().run, self._call, backup, messages, kwargs))
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def _route(self, call: Callable[[LLMClient], Any]) -> Any:
+        """Run ``call`` on the best endpoint's client, failing over on transient errors.
+        
+        Used for requests whose duration is not comparable to a plain reply,
+        so latency is not recorded.
+        """
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._pick(tried)
+            tried.append(endpoint)
+            try:
+                result = call(endpoint.client)
+            except Exception as e:
+                self._release(endpoint, error=e)
+                if not self._can_fail_over(e, tried):
+                    raise
+                continue
+            self._release(endpoint)
+            return result
+    
+    def chat_n(self, messages, n: int, **kwargs) -> List[str]:
+        """Sample ``n`` replies from the best endpoint, failing over on transient errors."""
+        messages = list(messages)
+        return self._route(lambda client: client.chat_n(messages, n, **kwargs))
+    
+    def chat_message(self, messages, **kwargs) -> Dict:
+        """Return the assistant message dict from the best endpoint; see ``LLMClient.chat_message``."""
+        messages = list(messages)
+        return self._route(lambda client: client.chat_message(messages, **kwargs))
+    
+    def chat_tools(self, messages, tools: ToolRegistry, max_rounds: int = 8,
+                   memo: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        """Run the model/tool loop; each model round is routed separately."""
+        return tool_loop(self, list(messages), tools, max_rounds, memo, **kwargs)
+    
+    def stream_chat(self, messages, **kwargs) -> Iterator[str]:
+        """Stream chat responses from the best endpoint."""
+        events = self.stream_events(messages, **kwargs)
+        try:
+            for event in events:
+                yield event.text
+        finally:
+            events.close()
+    
+    def stream_json(self, messages, **kwargs) -> Iterator[Any]:
+        """Stream a JSON reply element by element; see ``LLMClient.stream_json``."""
+        return iter_json(self.stream_chat(messages, **kwargs))
+    
+    def stream_events(self, messages, **kwargs) -> Iterator[StreamChunk]:
+        """Stream timestamped chunks; fails over only before the first chunk.
+        
+        Streams count toward load and health but not latency, which tracks
+        complete non-streaming replies for the hedging threshold.
+        """
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._pick(tried)
+            tried.append(endpoint)
+            started = False
+            events = endpoint.client.stream_events(messages, **kwargs)
+            try:
+                for event in events:
+                    started = True
+                    yield event
+            except Exception as e:
+                self._release(endpoint, error=e)
+                if started or not self._can_fail_over(e, tried):
+                    raise
+                continue
+            except BaseException:
+                self._release(endpoint, cancelled=True)
+                raise
+            finally:
+                # Closes the upstream stream at once when the caller stops early.
+                events.close()
+            self._release(endpoint)
+            return
+    
+    async def _acall(self, endpoint: Endpoint, messages, kwargs: Dict) -> str:
+        start = time.monotonic()
+        try:
+            result = await endpoint.client.achat(messages, **kwargs)
+        except Exception as e:
+            self._release(endpoint, error=e)
+            raise
+        except BaseException:
+            # Cancelled, e.g. as the losing hedge: the endpoint never answered.
+            self._release(endpoint, cancelled=True)
+            raise
+        self._release(endpoint, latency=time.monotonic() - start)
+        return result
+    
+    async def achat(self, messages, **kwargs) -> str:
+        """Async variant of ``chat``; the losing hedge request is cancelled."""
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._pick(tried)
+            tried.append(endpoint)
+            delay = self._hedge_delay(endpoint)
+            try:
+                if delay is None:
+                    return await self._acall(endpoint, messages, kwargs)
+                return await self._ahedged(endpoint, delay, tried, messages, kwargs)
+            except Exception as e:
+                if not self._can_fail_over(e, tried):
+                    raise
+    
+    async def _ahedged(self, primary: Endpoint, delay: float, tried: List[Endpoint], messages, kwargs: Dict) -> str:
+        tasks = [asyncio.ensure_future(self._acall(primary, messages, kwargs))]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            backup = self._pick(tried)
+            tried.append(backup)
+            tasks.append(asyncio.ensure_future(self._acall(backup, messages, kwargs)))
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _aroute(self, call: Callable[[LLMClient], Awaitable]) -> Any:
+        """Async variant of ``_route``."""
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._pick(tried)
+            tried.append(endpoint)
+            try:
+                result = await call(endpoint.client)
+            except Exception as e:
+                self._release(endpoint, error=e)
+                if not self._can_fail_over(e, tried):
+                    raise
+                continue
+            except BaseException:
+                self._release(endpoint, cancelled=True)
+                raise
+            self._release(endpoint)
+            return result
+    
+    async def achat_n(self, messages, n: int, **kwargs) -> List[str]:
+        """Async variant of ``chat_n``."""
+        messages = list(messages)
+        return await self._aroute(lambda client: client.achat_n(messages, n, **kwargs))
+    
+    async def achat_message(self, messages, **kwargs) -> Dict:
+        """Async variant of ``chat_message``."""
+        messages = list(messages)
+        return await self._aroute(lambda client: client.achat_message(messages, **kwargs))
+    
+    async def achat_tools(self, messages, tools: ToolRegistry, max_rounds: int = 8,
+                          memo: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        """Async variant of ``chat_tools``."""
+        return await atool_loop(self, list(messages), tools, max_rounds, memo, **kwargs)
+    
+    async def astream_chat(self, messages, **kwargs) -> AsyncIterator[str]:
+        """Async variant of ``stream_chat``."""
+        events = self.astream_events(messages, **kwargs)
+        try:
+            async for event in events:
+                yield event.text
+        finally:
+            await events.aclose()
+    
+    def astream_json(self, messages, **kwargs) -> AsyncIterator[Any]:
+        """Async variant of ``stream_json``."""
+        return aiter_json(self.astream_chat(messages, **kwargs))
+    
+    async def astream_events(self, messages, **kwargs) -> AsyncIterator[StreamChunk]:
+        """Async variant of ``stream_events``."""
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._pick(tried)
+            tried.append(endpoint)
+            started = False
+            events = endpoint.client.astream_events(messages, **kwargs)
+            try:
+                async for event in events:
+                    started = True
+                    yield event
+            except Exception as e:
+                self._release(endpoint, error=e)
+                if started or not self._can_fail_over(e, tried):
+                    raise
+                continue
+            except BaseException:
+                self._release(endpoint, cancelled=True)
+                raise
+            finally:
+                await events.aclose()
+            self._release(endpoint)
+            return
+    
+    def close(self):
+        """Close every endpoint's connection pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+    
+    async def aclose(self):
+        """Close every endpoint's async connection pool."""
+        for endpoint in self.endpoints:
+            await endpoint.client.aclose()
@@ -0,0 +1,252 @@
+"""Priority scheduling of model requests with weighted fairness across sessions."""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .hooks import current_labels
+except ImportError:
+    from hooks import current_labels
+
+
+INTERACTIVE = "interactive"
+AGENT = "agent"
+BATCH = "batch"
+# Classes from most to least urgent.
+PRIORITIES = (INTERACTIVE, AGENT, BATCH)
+
+_priority: ContextVar[Optional[str]] = ContextVar("llm_request_priority", default=None)
+
+
+@contextmanager
+def request_priority(priority: str):
+    """Schedule model calls made inside the block in the given priority class."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        try:
+            _priority.reset(token)
+        except ValueError:
+            # A generator finalized from another context; its priority dies with it.
+            pass
+
+
+class _Waiter:
+    __slots__ = ("priority", "enqueued", "event", "future", "loop", "granted", "cancelled")
+    
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.event: Optional[threading.Event] = None
+        self.future = None
+        self.loop = None
+        self.granted = False
+        self.cancelled = False
+    
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._resolve)
+    
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class _QueueStats:
+    __slots__ = ("requests", "total_wait", "max_wait", "recent")
+    
+    def __init__(self, window: int):
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent: deque = deque(maxlen=window)
+    
+    def observe(self, wait: float):
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent.append(wait)
+    
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RequestScheduler:
+    """Admits model requests under a global concurrency cap, most urgent first.
+
+    Requests are classed ``interactive``, ``agent`` or ``batch``: the class
+    set with ``request_priority``, else ``agent`` for calls attributed to an
+    agent by ``call_context``, else ``default_priority``. A free slot always
+    goes to the most urgent waiting class, and ``reserve`` slots are never
+    given to batch requests, so interactive requests do not queue behind a
+    pool full of batch work while batch still uses the remaining capacity.
+    Within a class, sessions (or agents) share slots by start-time fair
+    queuing in proportion to their weight, so one busy session cannot starve
+    the others. Share one scheduler between clients to cap them together.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        reserve: int = 1,
+        default_priority: str = INTERACTIVE,
+        weights: Optional[Dict[str, float]] = None,
+        window: int = 1000,
+    ):
+        if default_priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {default_priority!r}")
+        self.max_concurrency = max_concurrency
+        self.reserve = max(0, min(reserve, max_concurrency - 1))
+        self.default_priority = default_priority
+        self.weights: Dict[str, float] = dict(weights or {})
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues: Dict[str, List[Tuple[float, int, _Waiter]]] = {p: [] for p in PRIORITIES}
+        # Per class: virtual time and the finish tag of each session's last request.
+        self._virtual: Dict[str, float] = {p: 0.0 for p in PRIORITIES}
+        self._finish: Dict[str, Dict[str, float]] = {p: {} for p in PRIORITIES}
+        self._stats = {p: _QueueStats(window) for p in PRIORITIES}
+    
+    def set_weight(self, session: str, weight: float):
+        """Give a session (or agent) a larger or smaller share within its class."""
+        self.weights[session] = weight
+    
+    def classify(self) -> Tuple[str, str]:
+        """Priority class and fairness key of a call made in the current context."""
+        agent, session = current_labels()
+        priority = _priority.get() or (AGENT if agent else self.default_priority)
+        return priority, session or agent or ""
+    
+    def _limit(self, priority: str) -> int:
+        return self.max_concurrency - self.reserve if priority == BATCH else self.max_concurrency
+    
+    def _tag(self, priority: str, key: str) -> float:
+        """Start tag of a new request; advances the session's finish tag."""
+        finish = self._finish[priority]
+        tag = max(self._virtual[priority], finish.get(key, 0.0))
+        finish[key] = tag + 1.0 / self.weights.get(key, 1.0)
+        if len(finish) > 4096:
+            # Sessions that are not ahead of virtual time need no entry.
+            virtual = self._virtual[priority]
+            for stale in [k for k, f in finish.items() if f <= virtual]:
+                del finish[stale]
+        return tag
+    
+    def _enqueue(self, waiter: _Waiter, key: str) -> bool:
+        """Queue a request and admit what fits; returns whether this one was admitted."""
+        with self._lock:
+            tag = self._tag(waiter.priority, key)
+            heapq.heappush(self._queues[waiter.priority], (tag, next(self._seq), waiter))
+            self._dispatch()
+            return waiter.granted
+    
+    def _dispatch(self):
+        """Hand free slots to the most urgent waiters; called with the lock held."""
+        while self.in_flight < self.max_concurrency:
+            for priority in PRIORITIES:
+                queue = self._queues[priority]
+                while queue and queue[0][2].cancelled:
+                    heapq.heappop(queue)
+                if queue:
+                    break
+            else:
+                return
+            if self.in_flight >= self._limit(priority):
+                return
+            tag, _, waiter = heapq.heappop(queue)
+            self.in_flight += 1
+            self._virtual[priority] = tag
+            waiter.granted = True
+            self._stats[priority].observe(time.perf_counter() - waiter.enqueued)
+            waiter.wake()
+    
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+    
+    def _abandon(self, waiter: _Waiter):
+        """Withdraw a waiter whose caller gave up, freeing its slot if it was just granted."""
+        with self._lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                return
+        self._release()
+    
+    @staticmethod
+    def _label(record, priority: str, waiter: _Waiter):
+        if record is not None:
+            record.priority = priority
+            # A retried request queues once per attempt.
+            record.queue_time = (record.queue_time or 0.0) + time.perf_counter() - waiter.enqueued
+    
+    @contextmanager
+    def slot(self, record=None):
+        """Hold one request slot for the duration of the block.
+
+        Blocks while the request is queued; the priority and queue time are
+        written to ``record`` (a ``CallRecord``) when given.
+        """
+        priority, key = self.classify()
+        waiter = _Waiter(priority)
+        waiter.event = threading.Event()
+        if not self._enqueue(waiter, key):
+            try:
+                waiter.event.wait()
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        self._label(record, priority, waiter)
+        try:
+            yield
+        finally:
+            self._release()
+    
+    @asynccontextmanager
+    async def aslot(self, record=None):
+        """Async variant of ``slot``; waiting does not block the event loop."""
+        priority, key = self.classify()
+        waiter = _Waiter(priority)
+        waiter.loop = asyncio.get_running_loop()
+        waiter.future = waiter.loop.create_future()
+        if not self._enqueue(waiter, key):
+            try:
+                await waiter.future
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        self._label(record, priority, waiter)
+        try:
+            yield
+        finally:
+            self._release()
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-class queue metrics: requests admitted, now waiting, and wait times in seconds."""
+        with self._lock:
+            return {
+                priority: {
+                    "requests": stats.requests,
+                    "waiting": sum(1 for entry in self._queues[priority] if not entry[2].cancelled),
+                    "mean_wait": stats.total_wait / stats.requests if stats.requests else 0.0,
+                    "p50_wait": stats.percentile(0.5),
+                    "p95_wait": stats.percentile(0.95),
+                    "max_wait": stats.max_wait,
+                }
+                for priority, stats in self._stats.items()
+            }
@@ -0,0 +1,400 @@
+"""Multi-session asyncio HTTP chat server with an OpenAI-compatible API."""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional
+
+try:
+    from .conversation import Conversation
+    from .agent import Agent
+    from .session_store import SessionStore
+    from .chat import load_config, build_client
+    from .hooks import MetricsAggregator
+except ImportError:
+    from conversation import Conversation
+    from agent import Agent
+    from session_store import SessionStore
+    from chat import load_config, build_client
+    from hooks import MetricsAggregator
+
+
+MAX_BODY = 16 * 1024 * 1024
+WRITE_BUFFER_HIGH = 64 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 429: "Too Many Requests", 431: "Request Header Fields Too Large",
+               500: "Internal Server Error",
+               502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Error that is reported to the client with a status code."""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    """A parsed HTTP request."""
+    
+    __slots__ = ("method", "path", "headers", "body")
+    
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+    
+    def json(self) -> Dict:
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+    
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "keep-alive").lower() != "close"
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Read one HTTP/1.1 request, or None when the client closed the connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), path.split("?", 1)[0], headers, body)
+
+
+async def send_body(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str,
+                    keep_alive: bool = True):
+    """Write a complete response."""
+    writer.write(
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+    """Write a complete JSON response."""
+    await send_body(writer, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                    "application/json", keep_alive)
+
+
+async def start_sse(writer: asyncio.StreamWriter):
+    """Write the headers of a server-sent events response."""
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+        b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+    )
+    await writer.drain()
+
+
+async def send_sse(writer: asyncio.StreamWriter, data: str):
+    """Write one SSE event, waiting while the client is slow to read."""
+    writer.write(f"data: {data}\n\n".encode("utf-8"))
+    await writer.drain()
+
+
+def completion_payload(completion_id: str, model: str, content: str) -> Dict:
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+    }
+
+
+def chunk_payload(completion_id: str, model: str, content: Optional[str], finish_reason: Optional[str] = None) -> Dict:
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class Session:
+    """A hosted conversation with a lock serializing its turns."""
+    
+    __slots__ = ("conversation", "lock")
+    
+    def __init__(self, conversation: Conversation, lock: Optional[asyncio.Lock] = None):
+        self.conversation = conversation
+        self.lock = lock or asyncio.Lock()
+
+
+class ChatServer:
+    """Hosts many conversations on one event loop.
+
+    Routes:
+      POST   /v1/chat/completions      OpenAI-compatible; with ``session_id`` in the
+                                       body (or an ``X-Session-Id`` header) only the
+                                       last user message is used and the server keeps
+                                       the history
+      POST   /v1/sessions              create a session from ``system_prompt`` or an
+                                       ``agent`` spec (name, role, personality, background)
+      POST   /v1/sessions/{id}/messages  send ``content``; ``stream`` for SSE
+      GET    /v1/sessions/{id}         session history
+      DELETE /v1/sessions/{id}         drop a session
+      GET    /health
+      GET    /metrics                  Prometheus text, when ``metrics`` is given
+
+    Turns on one session are serialized with a per-session lock. Streaming
+    waits for each chunk to be flushed to the client before reading the next
+    one, so a slow client slows its own upstream stream instead of growing
+    server buffers. With a ``store``, its cache is the only one that holds
+    sessions in memory; without one, the server keeps up to
+    ``max_sessions``. Give the store a ``flush_interval`` so message writes
+    do not block the event loop.
+    """
+    
+    def __init__(
+        self,
+        client,
+        store: Optional[SessionStore] = None,
+        system_prompt: Optional[str] = None,
+        max_sessions: int = 10000,
+        metrics: Optional[MetricsAggregator] = None,
+    ):
+        self.client = client
+        self.store = store
+        self.system_prompt = system_prompt
+        self.max_sessions = max_sessions
+        self.metrics = metrics
+        # Sessions held by the server itself, used only without a store.
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # Turn locks of stored conversations; an entry lives as long as the store keeps its conversation.
+        self._locks: "weakref.WeakKeyDictionary[Conversation, asyncio.Lock]" = weakref.WeakKeyDictionary()
+    
+    @property
+    def model(self) -> str:
+        return getattr(self.client, "model", "")
+    
+    @property
+    def session_count(self) -> int:
+        """Sessions currently held in memory."""
+        return self.store.cached if self.store is not None else len(self.sessions)
+    
+    async def get_session(self, session_id: str, system_prompt: Optional[str] = None, create: bool = True) -> Session:
+        """Look up a session, loading or creating it as needed.
+        
+        Store lookups run on the default executor: they may read or write
+        SQLite, or wait for the store's background writer.
+        """
+        if self.store is not None:
+            conversation = await asyncio.get_running_loop().run_in_executor(
+                None, self.store.get, session_id, system_prompt or self.system_prompt, create)
+            if conversation is None:
+                raise HTTPError(404, f"Unknown session: {session_id}")
+            lock = self._locks.get(conversation)
+            if lock is None:
+                lock = self._locks[conversation] = asyncio.Lock()
+            return Session(conversation, lock)
+        session = self.sessions.get(session_id)
+        if session is None:
+            if not create:
+                raise HTTPError(404, f"Unknown session: {session_id}")
+            conversation = Conversation(self.client, system_prompt or self.system_prompt)
+            conversation.session_id = session_id
+            session = Session(conversation)
+            self.sessions[session_id] = session
+            self._evict()
+        self.sessions.move_to_end(session_id)
+        return session
+    
+    def _evict(self):
+        """Drop least recently used idle sessions beyond ``max_sessions``."""
+        for session_id in list(self.sessions):
+            if len(self.sessions) <= self.max_sessions:
+                break
+            if not self.sessions[session_id].lock.locked():
+                del self.sessions[session_id]
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until it closes."""
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = await self.dispatch(request, writer)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": {"message": str(e)}}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Route a request; returns whether the connection can be reused."""
+        parts = [p for p in request.path.split("/") if p]
+        try:
+            if parts == ["health"]:
+                await send_json(writer, 200, {"status": "ok", "sessions": self.session_count}, request.keep_alive)
+                return request.keep_alive
+            if parts == ["metrics"] and self.metrics is not None:
+                await send_body(writer, 200, self.metrics.render().encode("utf-8"),
+                                "text/plain; version=0.0.4", request.keep_alive)
+                return request.keep_alive
+            if parts == ["v1", "chat", "completions"] and request.method == "POST":
+                return await self.chat_completions(request, writer)
+            if parts == ["v1", "sessions"] and request.method == "POST":
+                return await self.create_session(request, writer)
+            if len(parts) == 3 and parts[:2] == ["v1", "sessions"]:
+                if request.method == "GET":
+                    session = await self.get_session(parts[2], create=False)
+                    await send_json(writer, 200, {"id": parts[2], "messages": session.conversation.get_history()},
+                                    request.keep_alive)
+                    return request.keep_alive
+                if request.method == "DELETE":
+                    self.sessions.pop(parts[2], None)
+                    if self.store is not None:
+                        await asyncio.get_running_loop().run_in_executor(None, self.store.delete, parts[2])
+                    await send_json(writer, 200, {"id": parts[2], "deleted": True}, request.keep_alive)
+                    return request.keep_alive
+                raise HTTPError(405, "Method not allowed")
+            if len(parts) == 4 and parts[:2] == ["v1", "sessions"] and parts[3] == "messages":
+                if request.method != "POST":
+                    raise HTTPError(405, "Method not allowed")
+                body = request.json()
+                if not isinstance(body.get("content"), str):
+                    raise HTTPError(400, "'content' must be a string")
+                session = await self.get_session(parts[2], create=False)
+                return await self.run_turn(session, body["content"], body, writer, request.keep_alive)
+            raise HTTPError(404, f"No route for {request.method} {request.path}")
+        except HTTPError:
+            raise
+        except Exception as e:
+            raise HTTPError(502, f"{type(e).__name__}: {e}")
+    
+    async def create_session(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        body = request.json()
+        session_id = body.get("session_id") or uuid.uuid4().hex
+        system_prompt = body.get("system_prompt")
+        if body.get("agent"):
+            spec = body["agent"]
+            agent = Agent(self.client, name=spec.get("name", "Agent"), role=spec.get("role", ""),
+                          personality=spec.get("personality", ""), background=spec.get("background", ""))
+            system_prompt = agent.conversation.messages[0]["content"]
+        await self.get_session(session_id, system_prompt)
+        await send_json(writer, 200, {"id": session_id}, request.keep_alive)
+        return request.keep_alive
+    
+    async def chat_completions(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        body = request.json()
+        messages = body.get("messages")
+        if not isinstance(messages, list) or not messages:
+            raise HTTPError(400, "'messages' must be a non-empty list")
+        session_id = body.get("session_id") or request.headers.get("x-session-id")
+        if session_id:
+            system = next((m["content"] for m in messages if m.get("role") == "system"), None)
+            session = await self.get_session(session_id, system)
+            return await self.run_turn(session, messages[-1].get("content") or "", body, writer,
+                                       request.keep_alive)
+        
+        kwargs = self._overrides(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if not body.get("stream"):
+            content = await self.client.achat(messages, **kwargs)
+            await send_json(writer, 200, completion_payload(completion_id, self.model, content), request.keep_alive)
+            return request.keep_alive
+        await self._stream(self.client.astream_chat(messages, **kwargs), completion_id, writer)
+        return False
+    
+    async def run_turn(self, session: Session, content: str, body: Dict, writer: asyncio.StreamWriter,
+                       keep_alive: bool) -> bool:
+        """Run one turn on a session, holding its lock for the whole turn."""
+        kwargs = self._overrides(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        async with session.lock:
+            if not body.get("stream"):
+                reply = await session.conversation.asend(content, **kwargs)
+                await send_json(writer, 200, completion_payload(completion_id, self.model, reply), keep_alive)
+                return keep_alive
+            await self._stream(session.conversation.astream_send(content, **kwargs), completion_id, writer)
+            return False
+    
+    async def _stream(self, chunks, completion_id: str, writer: asyncio.StreamWriter):
+        """Relay an async chunk iterator to the client as OpenAI-style SSE."""
+        await start_sse(writer)
+        try:
+            async for chunk in chunks:
+                await send_sse(writer, json.dumps(chunk_payload(completion_id, self.model, chunk), ensure_ascii=False))
+            await send_sse(writer, json.dumps(chunk_payload(completion_id, self.model, None, "stop")))
+            await send_sse(writer, "[DONE]")
+        except ConnectionError:
+            pass
+        except Exception as e:
+            await send_sse(writer, json.dumps({"error": {"message": f"{type(e).__name__}: {e}"}}))
+        finally:
+            await chunks.aclose()
+    
+    @staticmethod
+    def _overrides(body: Dict) -> Dict:
+        return {k: body[k] for k in ("temperature", "max_tokens") if body.get(k) is not None}
+    
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        """Run the server forever."""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Serve chat sessions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--store", default=None, help="SQLite file for durable sessions")
+    parser.add_argument("--system-prompt", default=None)
+    args = parser.parse_args()
+    
+    client = build_client(load_config(args.config))
+    store = SessionStore(args.store, client, flush_interval=0.05) if args.store else None
+    metrics = MetricsAggregator()
+    client.add_hook(metrics)
+    server = ChatServer(client, store=store, system_prompt=args.system_prompt, metrics=metrics)
+    print(f"Serving on http://{args.host}:{args.port}")
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Durable SQLite session store for conversations."""
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+try:
+    from .llm_client import LLMClient
+    from .conversation import Conversation
+except ImportError:
+    from llm_client import LLMClient
+    from conversation import Conversation
+
+
+class SessionStore:
+    """Persists conversations message by message and caches a bounded set in memory.
+
+    Every ``add_message`` on a stored conversation inserts one row; nothing is
+    rewritten. Sessions are loaded lazily on ``get`` and dropped from memory
+    when the cache is full or they have been idle for ``idle_seconds``. The
+    system prompt is kept at sequence 0 so it can be replaced in place.
+    
+    With ``flush_interval`` set, ``append`` only queues the row, and a
+    background thread writes queued rows in one transaction at most that
+    many seconds later. Callers on an event loop then never wait for a
+    commit, and a crash loses at most the last interval. Reads, deletes and
+    ``close`` write the queue first.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        client: LLMClient,
+        max_cached: int = 1000,
+        idle_seconds: Optional[float] = 600.0,
+        context_policy_factory=None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.client = client
+        self.max_cached = max_cached
+        self.idle_seconds = idle_seconds
+        self.context_policy_factory = context_policy_factory
+        self.flush_interval = flush_interval
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # Evicted sessions still referenced elsewhere must not be loaded twice.
+        self._live: "weakref.WeakValueDictionary[str, Conversation]" = weakref.WeakValueDictionary()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+            "content TEXT, extra TEXT, PRIMARY KEY (session_id, seq))"
+        )
+        self._db.commit()
+        self._queue: List[Tuple] = []
+        self._queue_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        if flush_interval is not None:
+            self._writer = threading.Thread(target=self._write_loop, name="session-store-writer", daemon=True)
+            self._writer.start()
+    
+    def get(self, session_id: str, system_prompt: Optional[str] = None, create: bool = True) -> Optional[Conversation]:
+        """Get a session, loading it from disk or creating it on first use.
+        
+        With ``create`` off, returns None for a session that is not stored.
+        """
+        with self._lock:
+            self.evict_idle()
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache[session_id] = (entry[0], time.monotonic())
+                self._cache.move_to_end(session_id)
+                return entry[0]
+            conversation = self._live.get(session_id) or self._load(session_id)
+            if conversation is None:
+                if not create:
+                    return None
+                conversation = self._create(session_id, system_prompt)
+            self._live[session_id] = conversation
+            self._cache[session_id] = (conversation, time.monotonic())
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+            return conversation
+    
+    def exists(self, session_id: str) -> bool:
+        """Check whether a session is stored."""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            return row is not None
+    
+    def list_sessions(self) -> List[str]:
+        """Ids of all stored sessions."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM sessions ORDER BY created")]
+    
+    def delete(self, session_id: str):
+        """Remove a session from memory and disk."""
+        with self._lock:
+            self.flush()
+            self._cache.pop(session_id, None)
+            self._live.pop(session_id, None)
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+    
+    def evict_idle(self):
+        """Drop sessions idle for longer than ``idle_seconds`` from memory."""
+        if self.idle_seconds is None:
+            return
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            while self._cache:
+                session_id, (_, last_used) = next(iter(self._cache.items()))
+                if last_used >= cutoff:
+                    break
+                self._cache.popitem(last=False)
+    
+    @property
+    def cached(self) -> int:
+        """Number of sessions pinned in the memory cache."""
+        return len(self._cache)
+    
+    def _new_conversation(self) -> Conversation:
+        policy = self.context_policy_factory() if self.context_policy_factory else None
+        return Conversation(self.client, context_policy=policy)
+    
+    def _create(self, session_id: str, system_prompt: Optional[str]) -> Conversation:
+        now = time.time()
+        self._db.execute("INSERT OR IGNORE INTO sessions (id, created, updated) VALUES (?, ?, ?)",
+                         (session_id, now, now))
+        self._db.commit()
+        conversation = self._new_conversation()
+        conversation.attach_store(self, session_id)
+        if system_prompt:
+            conversation.set_system_prompt(system_prompt)
+        return conversation
+    
+    def _load(self, session_id: str) -> Optional[Conversation]:
+        if not self.exists(session_id):
+            return None
+        self.flush()
+        messages = []
+        next_seq = 1
+        for seq, role, content, extra in self._db.execute(
+            "SELECT seq, role, content, extra FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ):
+            message = {"role": role, "content": content}
+            if extra:
+                message.update(json.loads(extra))
+            messages.append(message)
+            next_seq = max(next_seq, seq + 1)
+        conversation = self._new_conversation()
+        conversation.messages = messages
+        conversation.attach_store(self, session_id, next_seq)
+        return conversation
+    
+    def append(self, session_id: str, seq: int, message: Dict):
+        """Write one message row, or queue it when ``flush_interval`` is set."""
+        extra = {k: v for k, v in message.items() if k not in ("role", "content")}
+        row = (session_id, seq, message["role"], message.get("content"),
+               json.dumps(extra, ensure_ascii=False) if extra else None)
+        if self._writer is None:
+            with self._lock:
+                self._write([row])
+            return
+        with self._queue_lock:
+            self._queue.append(row)
+        self._wake.set()
+    
+    def _write(self, rows: List[Tuple]):
+        """Insert message rows in one transaction; called with the lock held."""
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO messages (session_id, seq, role, content, extra) VALUES (?, ?, ?, ?, ?)", rows)
+        self._db.executemany("UPDATE sessions SET updated = ? WHERE id = ?",
+                             [(now, session_id) for session_id in {row[0] for row in rows}])
+        self._db.commit()
+    
+    def flush(self):
+        """Write queued message rows now."""
+        with self._lock:
+            with self._queue_lock:
+                rows, self._queue = self._queue, []
+            if rows:
+                self._write(rows)
+    
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            # Let the batch fill up before paying for a commit.
+            time.sleep(self.flush_interval)
+            with self._lock:
+                if not self._closed:
+                    self.flush()
+    
+    def truncate(self, session_id: str, keep_system: bool = True):
+        """Delete a session's messages, optionally keeping the system prompt."""
+        with self._lock:
+            self.flush()
+            if keep_system:
+                self._db.execute("DELETE FROM messages WHERE session_id = ? AND seq > 0", (session_id,))
+            else:
+                self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.commit()
+    
+    def close(self):
+        """Write queued messages and close the database."""
+        with self._lock:
+            self.flush()
+            self._closed = True
+            self._wake.set()
+            self._cache.clear()
+            self._db.close()
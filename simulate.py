@@ -0,0 +1,181 @@
+"""Run many seeded Werewolf games concurrently and report aggregate results."""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+try:
+    from .agent import WerewolfPlayer
+    from .multi_agent import WerewolfGame, VILLAGE_WINS, WEREWOLVES_WIN, DRAW
+    from .mock_client import MockLLMClient
+    from .chat import load_config, build_client
+except ImportError:
+    from agent import WerewolfPlayer
+    from multi_agent import WerewolfGame, VILLAGE_WINS, WEREWOLVES_WIN, DRAW
+    from mock_client import MockLLMClient
+    from chat import load_config, build_client
+
+
+def build_game(client, players: int, seed: int, **options) -> WerewolfGame:
+    """Create a game of ``players`` fresh players sharing ``client``."""
+    game = WerewolfGame(seed=seed, **options)
+    for index in range(players):
+        game.add_agent(WerewolfPlayer(f"P{index + 1}", client))
+    return game
+
+
+def _new_tally() -> Dict:
+    return {"games": 0, "failed": 0, "days": 0, "invalid": 0, "errors": 0,
+            "wins": {VILLAGE_WINS: 0, WEREWOLVES_WIN: 0, DRAW: 0}}
+
+
+def _merge(total: Dict, part: Dict):
+    for key in ("games", "failed", "days", "invalid", "errors"):
+        total[key] += part[key]
+    for side, count in part["wins"].items():
+        total["wins"][side] += count
+
+
+def summarize(tally: Dict, elapsed: float) -> Dict:
+    """Turn raw counts into win rates and throughput."""
+    finished = tally["games"] - tally["failed"]
+    return {
+        **tally,
+        "win_rates": {side: count / finished if finished else 0.0 for side, count in tally["wins"].items()},
+        "mean_days": tally["days"] / finished if finished else 0.0,
+        "elapsed": elapsed,
+        "games_per_minute": 60 * finished / max(elapsed, 1e-9),
+    }
+
+
+async def _play_many(client, games: int, players: int, concurrency: int, seed: int, **options) -> Dict:
+    """Play games ``seed`` .. ``seed + games - 1`` and return raw counts."""
+    tally = _new_tally()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def play(game_seed: int):
+        async with semaphore:
+            game = build_game(client, players, game_seed, **options)
+            tally["games"] += 1
+            try:
+                winner = await game.aplay()
+            except Exception:
+                tally["failed"] += 1
+                return
+            tally["wins"][winner] += 1
+            tally["days"] += game.game_state["day"]
+            tally["invalid"] += game.game_state["invalid"]
+            tally["errors"] += game.game_state["errors"]
+    
+    await asyncio.gather(*(play(seed + index) for index in range(games)))
+    return tally
+
+
+async def asimulate(
+    client,
+    games: int = 100,
+    players: int = 6,
+    concurrency: int = 16,
+    seed: int = 0,
+    **options
+) -> Dict:
+    """Play ``games`` games, ``concurrency`` at a time, on the event loop.
+    
+    Game ``i`` is seeded with ``seed + i``; extra options go to ``WerewolfGame``.
+    """
+    start = time.perf_counter()
+    tally = await _play_many(client, games, players, concurrency, seed, **options)
+    return summarize(tally, time.perf_counter() - start)
+
+
+def simulate(client, games: int = 100, players: int = 6, concurrency: int = 16, seed: int = 0, **options) -> Dict:
+    """Blocking wrapper around ``asimulate``."""
+    return asyncio.run(asimulate(client, games, players, concurrency, seed, **options))
+
+
+def _worker(config: Optional[str], mock_latency: Optional[float], games: int, players: int,
+            concurrency: int, seed: int, options: Dict) -> Dict:
+    """Process-pool entry point; every worker builds its own client."""
+    client = MockLLMClient(latency=mock_latency) if mock_latency is not None else build_client(load_config(config))
+    return asyncio.run(_play_many(client, games, players, concurrency, seed, **options))
+
+
+def simulate_processes(
+    config: Optional[str] = None,
+    mock_latency: Optional[float] = None,
+    games: int = 100,
+    players: int = 6,
+    concurrency: int = 16,
+    seed: int = 0,
+    processes: int = 2,
+    **options
+) -> Dict:
+    """Split the games over a process pool, each running ``concurrency`` games at a time.
+    
+    Workers build their own client from ``config``, or a ``MockLLMClient``
+    when ``mock_latency`` is given. Results match a single-process run with
+    the same seed.
+    """
+    start = time.perf_counter()
+    processes = max(1, min(processes, games))
+    shares = [games // processes + (1 if index < games % processes else 0) for index in range(processes)]
+    tally = _new_tally()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures, offset = [], seed
+        for share in shares:
+            futures.append(pool.submit(_worker, config, mock_latency, share, players, concurrency, offset, options))
+            offset += share
+        for future in futures:
+            _merge(tally, future.result())
+    return summarize(tally, time.perf_counter() - start)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Simulate many Werewolf games and report win rates.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--werewolves", type=int, default=None)
+    parser.add_argument("--max-days", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16, help="games in flight per process")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--mock", action="store_true", help="use the offline mock model")
+    parser.add_argument("--mock-latency", type=float, default=0.0, help="seconds per mock call")
+    parser.add_argument("--cassette", default=None, help="record API traffic to, or replay it from, this file")
+    parser.add_argument("--cassette-mode", choices=("record", "replay", "auto"), default="replay")
+    parser.add_argument("--replay-speed", type=float, default=None, help="pace replays; omit to replay instantly")
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON")
+    args = parser.parse_args()
+    if args.cassette and (args.mock or args.processes > 1):
+        parser.error("--cassette needs the configured API client and a single process")
+    
+    options = {"max_days": args.max_days, "werewolves": args.werewolves}
+    if args.processes > 1:
+        result = simulate_processes(args.config, args.mock_latency if args.mock else None, args.games,
+                                    args.players, args.concurrency, args.seed, args.processes, **options)
+    else:
+        if args.mock:
+            client = MockLLMClient(latency=args.mock_latency)
+        else:
+            config = load_config(args.config)
+            if args.cassette:
+                config['cassette'] = {"path": args.cassette, "mode": args.cassette_mode, "speed": args.replay_speed}
+            client = build_client(config)
+        result = simulate(client, args.games, args.players, args.concurrency, args.seed, **options)
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    rates = result["win_rates"]
+    print(f"games {result['games']} (failed {result['failed']}), mean days {result['mean_days']:.2f}")
+    print(f"village {rates[VILLAGE_WINS]:.1%}, werewolves {rates[WEREWOLVES_WIN]:.1%}, draw {rates[DRAW]:.1%}")
+    print(f"invalid answers {result['invalid']}, failed calls {result['errors']}")
+    print(f"{result['games_per_minute']:.1f} games/min, {result['elapsed']:.1f}s elapsed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Client-side stop conditions evaluated incrementally over streamed text."""
+import copy
+import re
+from typing import Callable, Iterable, List, Optional, Pattern, Union
+
+
+class StopCondition:
+    """Base class for stop conditions.
+
+    ``feed`` sees each new chunk once, with the offset of the chunk in the
+    whole reply, and returns the offset to cut the reply at once the
+    condition is met. Conditions keep only a bounded tail of earlier text,
+    which ``reset`` clears for a new stream.
+    """
+    
+    def feed(self, chunk: str, offset: int) -> Optional[int]:
+        raise NotImplementedError
+    
+    def reset(self):
+        """Forget the text seen so far."""
+    
+    def pending(self) -> int:
+        """Characters at the end of the text so far that may begin a match and are held back."""
+        return 0
+
+
+class Substring(StopCondition):
+    """Stop at the first occurrence of ``text``, cut before it unless ``include`` is set.
+
+    The end of the text that could be the start of ``text`` is held back,
+    so the stop text is never streamed when excluded.
+    """
+    
+    def __init__(self, text: str, include: bool = False):
+        if not text:
+            raise ValueError("stop text must not be empty")
+        self.text = text
+        self.include = include
+        self._tail = ""
+    
+    def reset(self):
+        self._tail = ""
+    
+    def feed(self, chunk: str, offset: int) -> Optional[int]:
+        window = self._tail + chunk
+        found = window.find(self.text)
+        if found >= 0:
+            start = offset - len(self._tail) + found
+            return start + len(self.text) if self.include else start
+        keep = len(self.text) - 1
+        self._tail = window[-keep:] if keep else ""
+        return None
+    
+    def pending(self) -> int:
+        for size in range(len(self._tail), 0, -1):
+            if self.text.startswith(self._tail[-size:]):
+                return size
+        return 0
+
+
+class Regex(StopCondition):
+    """Stop at the first match of ``pattern``, cut before it unless ``include`` is set.
+
+    The pattern is searched in the new chunk plus the last ``window``
+    characters before it, so matches may be at most that long. Nothing is
+    held back: with ``include`` off, the part of a match that was streamed
+    before the match completed is not taken back.
+    """
+    
+    def __init__(self, pattern: Union[str, Pattern], include: bool = False, window: int = 256):
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.include = include
+        self.window = window
+        self._tail = ""
+    
+    def reset(self):
+        self._tail = ""
+    
+    def feed(self, chunk: str, offset: int) -> Optional[int]:
+        text = self._tail + chunk
+        match = self.pattern.search(text)
+        if match:
+            base = offset - len(self._tail)
+            return base + (match.end() if self.include else match.start())
+        self._tail = text[-self.window:]
+        return None
+
+
+# ASCII sentence ends count once followed by whitespace, so "3.14" and "e.g" do not.
+_SENTENCE_END = re.compile(r"[.!?…]+(?=\s)|[。！？]+")
+# ``\Z``, not ``$``: ``$`` also matches before a final newline, and that end was already counted.
+_TRAILING_END = re.compile(r"[.!?…]+\Z")
+
+
+class MaxSentences(StopCondition):
+    """Stop after ``count`` sentences, keeping the last sentence's end punctuation."""
+    
+    def __init__(self, count: int):
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        self.count = count
+        self.seen = 0
+        self._tail = ""
+    
+    def reset(self):
+        self.seen = 0
+        self._tail = ""
+    
+    def feed(self, chunk: str, offset: int) -> Optional[int]:
+        text = self._tail + chunk
+        base = offset - len(self._tail)
+        for match in _SENTENCE_END.finditer(text):
+            self.seen += 1
+            if self.seen >= self.count:
+                return base + match.end()
+        # Punctuation at the very end is counted once the next character arrives.
+        trailing = _TRAILING_END.search(text)
+        self._tail = trailing.group() if trailing else ""
+        return None
+
+
+class _Callback(StopCondition):
+    """Wraps ``fn(chunk)``: True stops after the chunk, an int keeps that many of its characters."""
+    
+    def __init__(self, fn: Callable[[str], Union[bool, int, None]]):
+        self.fn = fn
+    
+    def feed(self, chunk: str, offset: int) -> Optional[int]:
+        result = self.fn(chunk)
+        if result is None or result is False:
+            return None
+        if result is True:
+            return offset + len(chunk)
+        return offset + max(0, min(int(result), len(chunk)))
+
+
+StopSpec = Union[str, Pattern, StopCondition, Callable[[str], Union[bool, int, None]]]
+
+
+def as_condition(spec: StopSpec) -> StopCondition:
+    """Build a condition: strings are substrings, compiled patterns regexes, callables callbacks.
+
+    A ``StopCondition`` is copied and reset, so one instance can be shared
+    by any number of streams.
+    """
+    if isinstance(spec, StopCondition):
+        condition = copy.copy(spec)
+        condition.reset()
+        return condition
+    if isinstance(spec, str):
+        return Substring(spec)
+    if isinstance(spec, re.Pattern):
+        return Regex(spec)
+    if callable(spec):
+        return _Callback(spec)
+    raise TypeError(f"unsupported stop condition: {spec!r}")
+
+
+class StopMatcher:
+    """Applies stop conditions to a stream of text chunks.
+
+    ``feed`` returns the text that may be passed on now, which can lag the
+    input by what a ``Substring`` holds back; ``stopped`` turns true once a
+    condition is met and the text has been cut. ``flush`` releases held-back
+    text when the stream ends without stopping.
+    """
+    
+    def __init__(self, conditions: Iterable[StopSpec]):
+        self.conditions: List[StopCondition] = [as_condition(spec) for spec in conditions]
+        self.stopped = False
+        self._length = 0
+        self._released = 0
+        self._held = ""
+    
+    @classmethod
+    def create(cls, stop_when: Union[StopSpec, Iterable[StopSpec], None]) -> Optional["StopMatcher"]:
+        """A matcher for a ``stop_when`` argument: one condition, several, or None for no matcher.
+
+        Matchers are stateful, so every stream needs a new one; conditions
+        passed in are copied rather than fed themselves.
+        """
+        if stop_when is None:
+            return None
+        if isinstance(stop_when, (list, tuple)):
+            return cls(stop_when) if stop_when else None
+        return cls([stop_when])
+    
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text to release."""
+        if self.stopped or not chunk:
+            return ""
+        offset = self._length
+        self._length += len(chunk)
+        self._held += chunk
+        cut = None
+        for condition in self.conditions:
+            position = condition.feed(chunk, offset)
+            if position is not None and (cut is None or position < cut):
+                cut = position
+        if cut is not None:
+            self.stopped = True
+            end = max(cut, self._released)
+        else:
+            end = self._length - max((condition.pending() for condition in self.conditions), default=0)
+        released = self._held[:end - self._released]
+        self._held = self._held[end - self._released:]
+        self._released = end
+        return released
+    
+    def flush(self) -> str:
+        """Text still held back; empty once the stream was stopped."""
+        if self.stopped:
+            return ""
+        held, self._held = self._held, ""
+        self._released = self._length
+        return held
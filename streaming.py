@@ -0,0 +1,135 @@
+"""Streaming events and latency metrics."""
+import time
+from collections import deque
+from typing import List, Dict, Optional, Callable
+
+
+class StreamMetrics:
+    """Timing and usage of one streamed request."""
+    
+    __slots__ = ("model", "start", "first_chunk_at", "last_chunk_at", "end",
+                 "chunks", "chars", "gaps", "usage", "cached", "stopped")
+    
+    def __init__(self, model: str = "", cached: bool = False):
+        self.model = model
+        self.start = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.last_chunk_at: Optional[float] = None
+        self.end: Optional[float] = None
+        self.chunks = 0
+        self.chars = 0
+        self.gaps: List[float] = []
+        self.usage: Optional[Dict[str, int]] = None
+        self.cached = cached
+        # Set when a client-side stop condition cut the reply short.
+        self.stopped = False
+    
+    def record(self, text: str) -> float:
+        """Record the arrival of a chunk and return its timestamp."""
+        now = time.perf_counter()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        else:
+            self.gaps.append(now - self.last_chunk_at)
+        self.last_chunk_at = now
+        self.chunks += 1
+        self.chars += len(text)
+        return now
+    
+    def finish(self):
+        """Mark the stream as finished."""
+        self.end = time.perf_counter()
+    
+    @property
+    def ttft(self) -> Optional[float]:
+        """Time to first token in seconds."""
+        if self.first_chunk_at is None:
+            return None
+        return self.first_chunk_at - self.start
+    
+    @property
+    def total_duration(self) -> float:
+        """Wall time from request to end of stream in seconds."""
+        return (self.end or time.perf_counter()) - self.start
+    
+    @property
+    def chunks_per_second(self) -> float:
+        """Chunk rate after the first chunk arrived."""
+        if self.first_chunk_at is None or self.chunks < 2:
+            return 0.0
+        elapsed = self.last_chunk_at - self.first_chunk_at
+        return (self.chunks - 1) / elapsed if elapsed > 0 else 0.0
+    
+    @property
+    def mean_gap(self) -> float:
+        """Mean inter-chunk latency in seconds."""
+        return sum(self.gaps) / len(self.gaps) if self.gaps else 0.0
+    
+    @property
+    def max_gap(self) -> float:
+        """Largest inter-chunk latency in seconds."""
+        return max(self.gaps) if self.gaps else 0.0
+    
+    def as_dict(self) -> Dict:
+        """Summarize the metrics as a plain dict."""
+        return {
+            "model": self.model,
+            "cached": self.cached,
+            "stopped": self.stopped,
+            "ttft": self.ttft,
+            "total_duration": self.total_duration,
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "chunks_per_second": self.chunks_per_second,
+            "mean_gap": self.mean_gap,
+            "max_gap": self.max_gap,
+            "usage": self.usage,
+        }
+
+
+class StreamChunk:
+    """A piece of streamed text with its arrival time."""
+    
+    __slots__ = ("text", "timestamp", "metrics")
+    
+    def __init__(self, text: str, timestamp: float, metrics: StreamMetrics):
+        self.text = text
+        self.timestamp = timestamp
+        self.metrics = metrics
+    
+    def __repr__(self) -> str:
+        return f"StreamChunk({self.text!r}, {self.timestamp:.6f})"
+
+
+MetricsSink = Callable[[StreamMetrics], None]
+
+
+class MetricsCollector:
+    """Metrics sink that keeps recent streams and summarizes them."""
+    
+    def __init__(self, max_records: int = 1000):
+        self.records: "deque[StreamMetrics]" = deque(maxlen=max_records)
+    
+    def __call__(self, metrics: StreamMetrics):
+        self.records.append(metrics)
+    
+    @property
+    def last(self) -> Optional[StreamMetrics]:
+        """Most recently finished stream."""
+        return self.records[-1] if self.records else None
+    
+    def summary(self) -> Dict[str, float]:
+        """Percentiles of TTFT and duration over the recorded streams."""
+        ttfts = sorted(m.ttft for m in self.records if m.ttft is not None)
+        durations = sorted(m.total_duration for m in self.records)
+        
+        def pct(values: List[float], q: float) -> float:
+            return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+        
+        return {
+            "streams": len(self.records),
+            "ttft_p50": pct(ttfts, 0.5),
+            "ttft_p95": pct(ttfts, 0.95),
+            "duration_p50": pct(durations, 0.5),
+            "duration_p95": pct(durations, 0.95),
+        }
@@ -0,0 +1,97 @@
+import json
+import os
+
+from batch import BatchRunner
+
+
+class FakeClient:
+    """Answers prompts, failing those listed in ``failures`` with the given exception once each."""
+    
+    retry_policy = None
+    
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.prompts = []
+    
+    async def achat(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        error = self.failures.pop(prompt, None)
+        if error is not None:
+            raise error
+        return "re: " + prompt
+
+
+def write_input(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"user_prompt": f"p{i}"}) + "\n")
+
+
+def run(client, input_path, output_path, **kwargs):
+    return BatchRunner(client, on_progress=lambda stats: None, **kwargs).run(str(input_path), str(output_path))
+
+
+def latest(output_path):
+    records = {}
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            records[record["index"]] = record
+    return records
+
+
+def test_resume_retries_only_transient_failures(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, 20)
+    client = FakeClient({"p3": TimeoutError("read timed out"), "p5": ValueError("bad request"),
+                         "p17": TimeoutError("read timed out")})
+    stats = run(client, source, output, concurrency=4, checkpoint_every=3)
+    assert (stats["completed"], stats["failed"]) == (17, 3)
+    
+    retry = FakeClient()
+    run(retry, source, output)
+    assert sorted(retry.prompts) == ["p17", "p3"]
+    records = latest(output)
+    assert len(records) == 20
+    assert [index for index, record in records.items() if "error" in record] == [5]
+    
+    again = FakeClient()
+    run(again, source, output)
+    assert again.prompts == []
+
+
+def test_transient_failures_survive_a_lost_checkpoint(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, 10)
+    run(FakeClient({"p4": TimeoutError("read timed out")}), source, output, checkpoint_every=1000)
+    os.remove(str(output) + ".ckpt")
+    retry = FakeClient()
+    run(retry, source, output)
+    assert retry.prompts == ["p4"]
+
+
+def test_invalid_lines_are_final(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    source.write_text('{"user_prompt": "ok"}\nnot json\n[1, 2]\n\n{"user_prompt": 3}\n', encoding="utf-8")
+    stats = run(FakeClient(), source, output)
+    assert (stats["completed"], stats["failed"], stats["skipped"]) == (1, 3, 1)
+    records = latest(output)
+    assert records[0]["response"] == "re: ok"
+    assert all("invalid input line" in records[index]["error"] for index in (1, 2, 4))
+    retry = FakeClient()
+    run(retry, source, output)
+    assert retry.prompts == []
+
+
+def test_partial_last_line_is_dropped_and_redone(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, 5)
+    run(FakeClient(), source, output)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"index": 9, "resp')
+    os.remove(str(output) + ".ckpt")
+    retry = FakeClient()
+    run(retry, source, output)
+    assert retry.prompts == []
+    assert sorted(latest(output)) == [0, 1, 2, 3, 4]
@@ -0,0 +1,42 @@
+import pytest
+
+from cache import ResponseCache, make_cache_key
+
+
+@pytest.mark.parametrize("params, cacheable", [
+    ({"temperature": 0}, True),
+    ({"temperature": 0.0}, True),
+    ({"temperature": None}, False),
+    ({}, False),
+    ({"temperature": 0.7}, False),
+])
+def test_only_explicit_zero_temperature_is_cacheable(params, cacheable):
+    cache = ResponseCache()
+    assert cache.is_cacheable(params) is cacheable
+    assert cache.bypasses == (0 if cacheable else 1)
+
+
+@pytest.mark.parametrize("params", [{}, {"temperature": None}, {"temperature": 1.0}])
+def test_cache_sampled_caches_everything(params):
+    cache = ResponseCache(cache_sampled=True)
+    assert cache.is_cacheable(params)
+    assert cache.bypasses == 0
+
+
+def test_key_ignores_dict_order():
+    a = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+    b = {"temperature": 0, "messages": [{"content": "hi", "role": "user"}], "model": "m"}
+    assert make_cache_key(a) == make_cache_key(b)
+
+
+def test_disk_entries_survive_and_overwrites_count_once(tmp_path):
+    path = str(tmp_path / "responses.db")
+    cache = ResponseCache(path=path)
+    cache.set("k", ["Hel", "lo"])
+    cache.set("k", ["Hello"])
+    assert cache.stats()["disk_entries"] == 1
+    cache.close()
+    reopened = ResponseCache(path=path)
+    assert reopened.get("k") == ["Hello"]
+    assert reopened.stats()["disk_entries"] == 1
+    reopened.close()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+from coalesce import SingleFlight
+
+
+class Boom(Exception):
+    pass
+
+
+def failing(error, gate):
+    yield "a"
+    gate.wait(5)
+    raise error
+
+
+def consume(stream, results, name):
+    received = []
+    try:
+        for chunk in stream:
+            received.append(chunk)
+    except BaseException as e:
+        results[name] = (received, type(e))
+    else:
+        results[name] = (received, None)
+
+
+@pytest.mark.parametrize("error", [Boom("upstream failed"), KeyboardInterrupt()])
+def test_stream_error_reaches_every_subscriber(error):
+    flights = SingleFlight()
+    gate = threading.Event()
+    first, shared_first = flights.stream("k", lambda: failing(error, gate))
+    second, shared_second = flights.stream("k", lambda: pytest.fail("started twice"))
+    assert (shared_first, shared_second) == (False, True)
+    results = {}
+    threads = [threading.Thread(target=consume, args=(stream, results, name))
+               for name, stream in (("first", first), ("second", second))]
+    for thread in threads:
+        thread.start()
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert results == {"first": (["a"], type(error)), "second": (["a"], type(error))}
+    # The failed stream is forgotten, so the next caller starts a new one.
+    again, shared = flights.stream("k", lambda: iter(["b"]))
+    assert (list(again), shared) == (["b"], False)
+
+
+def test_do_error_reaches_the_waiting_caller():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    
+    def call():
+        started.set()
+        release.wait(5)
+        raise Boom("upstream failed")
+    
+    leader = {}
+    thread = threading.Thread(target=lambda: leader.update(error=pytest.raises(Boom, flights.do, "k", call)))
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.05, release.set).start()
+    with pytest.raises(Boom):
+        flights.do("k", lambda: pytest.fail("called twice"))
+    thread.join(5)
+    assert "error" in leader
+
+
+def test_async_stream_error_reaches_every_subscriber():
+    async def source():
+        yield "a"
+        await asyncio.sleep(0.01)
+        raise Boom("upstream failed")
+    
+    async def consume_async(stream):
+        received = []
+        with pytest.raises(Boom):
+            async for chunk in stream:
+                received.append(chunk)
+        return received
+    
+    async def main():
+        flights = SingleFlight()
+        first, _ = flights.astream("k", source)
+        second, shared = flights.astream("k", source)
+        assert shared
+        return await asyncio.gather(consume_async(first), consume_async(second))
+    
+    assert asyncio.run(main()) == [["a"], ["a"]]
+
+
+def test_async_cancelled_subscriber_leaves_the_stream_running():
+    async def source():
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield chunk
+    
+    async def main():
+        flights = SingleFlight()
+        first, _ = flights.astream("k", source)
+        second, _ = flights.astream("k", source)
+        
+        async def read(stream):
+            return [chunk async for chunk in stream]
+        
+        cancelled = asyncio.ensure_future(read(first))
+        await asyncio.sleep(0.015)
+        cancelled.cancel()
+        return await read(second)
+    
+    assert asyncio.run(main()) == ["a", "b", "c"]
@@ -0,0 +1,29 @@
+from memory import MemoryStore
+
+
+def texts(store, query):
+    return [text for text, _ in store.search([query])[0]]
+
+
+def test_fork_recalls_parent_memories_but_keeps_later_ones_apart():
+    parent = MemoryStore(min_score=0.0)
+    parent.add("the red lighthouse keeper")
+    branch = parent.fork()
+    parent.add("the red lighthouse burned down")
+    branch.add("the red lighthouse was repainted blue")
+    
+    assert len(parent) == len(branch) == 2
+    assert sorted(texts(parent, "red lighthouse")) == ["the red lighthouse burned down", "the red lighthouse keeper"]
+    assert sorted(texts(branch, "red lighthouse")) == ["the red lighthouse keeper", "the red lighthouse was repainted blue"]
+
+
+def test_fork_of_a_fork_sees_the_whole_chain():
+    root = MemoryStore(min_score=0.0)
+    root.add("apples grow in the orchard")
+    child = root.fork()
+    child.add("apples were picked in autumn")
+    grandchild = child.fork()
+    child.add("apples rotted in the cellar")
+    
+    assert len(grandchild) == 2
+    assert sorted(texts(grandchild, "apples")) == ["apples grow in the orchard", "apples were picked in autumn"]
@@ -0,0 +1,73 @@
+import random
+import re
+
+import pytest
+
+from stop import MaxSentences, Regex, StopMatcher, Substring
+
+TEXTS = [
+    "One. Two.\n Three! Four? Five…  six. 七。八！",
+    "a.\n.\nb. c",
+    "Hi...\n\nThere. x",
+    "e.g. 3.14 is pi. Yes!\n No.",
+    "Q: first\nA: answer END trailing Q: second",
+]
+
+
+def run(stop_when, chunks):
+    matcher = StopMatcher.create(stop_when)
+    return "".join(matcher.feed(chunk) for chunk in chunks) + matcher.flush(), matcher.stopped
+
+
+def chunkings(text, count=200):
+    for seed in range(count):
+        rnd = random.Random(seed)
+        chunks, i = [], 0
+        while i < len(text):
+            size = rnd.randint(1, 4)
+            chunks.append(text[i:i + size])
+            i += size
+        yield chunks
+
+
+@pytest.mark.parametrize("make", [
+    lambda: MaxSentences(1),
+    lambda: MaxSentences(2),
+    lambda: MaxSentences(3),
+    lambda: Substring("END"),
+    lambda: Substring("Q:", include=True),
+    lambda: Regex(r"\n\n", include=True),
+    lambda: Regex(re.compile(r"[!?]"), include=True),
+])
+@pytest.mark.parametrize("text", TEXTS)
+def test_chunking_does_not_change_the_result(make, text):
+    expected = run(make(), [text])
+    for chunks in chunkings(text):
+        assert run(make(), chunks) == expected
+
+
+def test_excluded_regex_only_leaks_the_start_of_its_match():
+    text = "Hi...\n\nThere. x"
+    for chunks in chunkings(text):
+        released, stopped = run(Regex(r"\n\n"), chunks)
+        assert stopped and released in ("Hi...", "Hi...\n")
+
+
+def test_sentence_end_before_trailing_newline_counts_once():
+    assert run(MaxSentences(2), [".", ".", "\n", " "]) == ("..\n ", False)
+    assert run(MaxSentences(2), ["One.", "\n", "Two. Three."]) == ("One.\nTwo.", True)
+
+
+def test_shared_condition_is_not_fed_across_streams():
+    shared = MaxSentences(1)
+    first = run(shared, ["Hello there. ", "More."])
+    second = run([shared, Substring("zzz")], ["Hello there. ", "More."])
+    assert first == second == ("Hello there.", True)
+    assert shared.seen == 0
+
+
+def test_substring_holds_back_a_partial_match():
+    matcher = StopMatcher.create("STOP")
+    assert matcher.feed("abc ST") == "abc "
+    assert matcher.feed("OP def") == ""
+    assert matcher.stopped
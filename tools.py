@@ -0,0 +1,232 @@
+"""Tool (function) calling: a registry of Python callables and the model/tool loop."""
+import asyncio
+import contextvars
+import inspect
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# JSON schema types for annotated parameters; anything else is left untyped.
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+class Tool:
+    """A Python callable exposed to the model with a JSON schema for its arguments."""
+    
+    __slots__ = ("name", "fn", "description", "parameters", "idempotent")
+    
+    def __init__(self, name: str, fn: Callable, description: str = "",
+                 parameters: Optional[Dict] = None, idempotent: bool = False):
+        self.name = name
+        self.fn = fn
+        self.description = description
+        self.parameters = parameters if parameters is not None else infer_parameters(fn)
+        self.idempotent = idempotent
+    
+    def schema(self) -> Dict:
+        """The tool in the OpenAI ``tools`` request format."""
+        return {"type": "function", "function": {
+            "name": self.name, "description": self.description, "parameters": self.parameters}}
+
+
+def infer_parameters(fn: Callable) -> Dict:
+    """Build a JSON schema from a function signature; parameters without defaults are required."""
+    properties, required = {}, []
+    for name, param in inspect.signature(fn).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        annotation = param.annotation
+        origin = getattr(annotation, "__origin__", annotation)
+        properties[name] = {"type": _JSON_TYPES[origin]} if origin in _JSON_TYPES else {}
+        if param.default is param.empty:
+            required.append(name)
+    return {"type": "object", "properties": properties, "required": required}
+
+
+class ToolRegistry:
+    """Named tools the model may call.
+
+    Tool calls from one model turn run concurrently, on a thread pool or on
+    the event loop, so a turn costs the slowest tool rather than the sum.
+    Results of tools registered as ``idempotent`` are memoized in the
+    ``memo`` dict passed in, keyed by tool name and arguments; a
+    ``Conversation`` keeps one per session. Failures are returned to the
+    model as the tool result instead of raising.
+    """
+    
+    def __init__(self, max_workers: int = 16):
+        self.tools: Dict[str, Tool] = {}
+        self.max_workers = max_workers
+    
+    def register(self, fn: Optional[Callable] = None, *, name: Optional[str] = None,
+                 description: Optional[str] = None, parameters: Optional[Dict] = None,
+                 idempotent: bool = False):
+        """Register ``fn``; usable as ``@registry.register`` or ``@registry.register(idempotent=True)``.
+
+        The name defaults to the function name, the description to the first
+        docstring line and the schema to one inferred from the signature.
+        """
+        def add(fn: Callable) -> Callable:
+            doc = (inspect.getdoc(fn) or "").split("\n")[0]
+            tool = Tool(name or fn.__name__, fn, description if description is not None else doc,
+                        parameters, idempotent)
+            self.tools[tool.name] = tool
+            return fn
+        
+        return add(fn) if fn is not None else add
+    
+    def __len__(self) -> int:
+        return len(self.tools)
+    
+    def schemas(self) -> List[Dict]:
+        """Schemas of every tool for the request's ``tools`` parameter."""
+        return [tool.schema() for tool in self.tools.values()]
+    
+    def _prepare(self, call: Dict) -> Tuple[Optional[Tool], Any, Optional[str]]:
+        """Look up a call's tool and arguments; the last item is an error message, if any."""
+        function = call.get("function", {})
+        tool = self.tools.get(function.get("name"))
+        if tool is None:
+            return None, None, f"Error: unknown tool {function.get('name')!r}"
+        try:
+            arguments = json.loads(function.get("arguments") or "{}")
+        except ValueError as e:
+            return tool, None, f"Error: arguments are not valid JSON: {e}"
+        if not isinstance(arguments, dict):
+            return tool, None, "Error: arguments must be a JSON object"
+        return tool, arguments, None
+    
+    @staticmethod
+    def _memo_key(tool: Tool, arguments: Dict) -> Optional[str]:
+        if not tool.idempotent:
+            return None
+        return tool.name + ":" + json.dumps(arguments, sort_keys=True, ensure_ascii=False)
+    
+    @staticmethod
+    def _format(result: Any) -> str:
+        return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+    
+    def _invoke(self, tool: Tool, arguments: Dict) -> str:
+        try:
+            result = tool.fn(**arguments)
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+            return self._format(result)
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
+    
+    async def _ainvoke(self, tool: Tool, arguments: Dict) -> str:
+        try:
+            if inspect.iscoroutinefunction(tool.fn):
+                result = await tool.fn(**arguments)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, contextvars.copy_context().run, lambda: tool.fn(**arguments))
+            return self._format(result)
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
+    
+    def _plan(self, calls: List[Dict], memo: Optional[Dict]) -> Tuple[List[Optional[str]], Dict[str, Tuple[Tool, Dict, List[int]]]]:
+        """Resolve errors and memo hits, and group the calls that still have to run.
+
+        Identical idempotent calls in one turn run once.
+        """
+        results: List[Optional[str]] = [None] * len(calls)
+        pending: Dict[str, Tuple[Tool, Dict, List[int]]] = {}
+        for index, call in enumerate(calls):
+            tool, arguments, error = self._prepare(call)
+            if error is not None:
+                results[index] = error
+                continue
+            key = self._memo_key(tool, arguments)
+            if key is not None and memo is not None and key in memo:
+                results[index] = memo[key]
+            elif key is not None and key in pending:
+                pending[key][2].append(index)
+            else:
+                pending[key or f"#{index}"] = (tool, arguments, [index])
+        return results, pending
+    
+    @staticmethod
+    def _messages(calls: List[Dict], results: List[str]) -> List[Dict]:
+        return [{"role": "tool", "tool_call_id": call.get("id"), "content": result}
+                for call, result in zip(calls, results)]
+    
+    def run(self, calls: List[Dict], memo: Optional[Dict] = None) -> List[Dict]:
+        """Execute one turn's tool calls in parallel and return the ``tool`` messages in call order."""
+        results, pending = self._plan(calls, memo)
+        jobs = list(pending.items())
+        if len(jobs) == 1:
+            outputs = [self._invoke(*jobs[0][1][:2])]
+        elif jobs:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, self._invoke, tool, arguments)
+                           for _, (tool, arguments, _) in jobs]
+                outputs = [future.result() for future in futures]
+        else:
+            outputs = []
+        self._store(jobs, outputs, results, memo)
+        return self._messages(calls, results)
+    
+    async def arun(self, calls: List[Dict], memo: Optional[Dict] = None) -> List[Dict]:
+        """Async variant of ``run``; coroutine tools are awaited, plain ones run in the default executor."""
+        results, pending = self._plan(calls, memo)
+        jobs = list(pending.items())
+        outputs = await asyncio.gather(*(self._ainvoke(tool, arguments) for _, (tool, arguments, _) in jobs))
+        self._store(jobs, outputs, results, memo)
+        return self._messages(calls, results)
+    
+    @staticmethod
+    def _store(jobs: List, outputs: List[str], results: List[Optional[str]], memo: Optional[Dict]):
+        for (key, (tool, _, indexes)), output in zip(jobs, outputs):
+            for index in indexes:
+                results[index] = output
+            if memo is not None and tool.idempotent and not output.startswith("Error:"):
+                memo[key] = output
+
+
+def _request(registry: ToolRegistry, round_index: int, max_rounds: int) -> Dict:
+    """Per-round request options; the last round forbids further tool calls."""
+    return {"tools": registry.schemas(), "tool_choice": "none" if round_index == max_rounds else "auto"}
+
+
+def _wants_tools(reply: Dict, round_index: int, max_rounds: int) -> bool:
+    """Whether to run the reply's tool calls; calls past the last round are dropped."""
+    if reply.get("tool_calls") and round_index < max_rounds:
+        return True
+    reply.pop("tool_calls", None)
+    return False
+
+
+def tool_loop(client, messages: List[Dict], registry: ToolRegistry, max_rounds: int = 8,
+              memo: Optional[Dict] = None, **kwargs) -> List[Dict]:
+    """Run model -> tools -> model until the model answers without tool calls.
+
+    ``client`` must provide ``chat_message``. Returns the new messages: the
+    assistant tool-call messages and tool results of each round, ending with
+    the final assistant message. After ``max_rounds`` rounds of tool calls
+    the model is asked to answer without tools.
+    """
+    messages = list(messages)
+    added: List[Dict] = []
+    for round_index in range(max_rounds + 1):
+        reply = client.chat_message(messages + added, **_request(registry, round_index, max_rounds), **kwargs)
+        added.append(reply)
+        if not _wants_tools(reply, round_index, max_rounds):
+            break
+        added.extend(registry.run(reply["tool_calls"], memo))
+    return added
+
+
+async def atool_loop(client, messages: List[Dict], registry: ToolRegistry, max_rounds: int = 8,
+                     memo: Optional[Dict] = None, **kwargs) -> List[Dict]:
+    """Async variant of ``tool_loop``; ``client`` must provide ``achat_message``."""
+    messages = list(messages)
+    added: List[Dict] = []
+    for round_index in range(max_rounds + 1):
+        reply = await client.achat_message(messages + added, **_request(registry, round_index, max_rounds), **kwargs)
+        added.append(reply)
+        if not _wants_tools(reply, round_index, max_rounds):
+            break
+        added.extend(await registry.arun(reply["tool_calls"], memo))
+    return added
@@ -0,0 +1,50 @@
+"""Shared append-only transcript for multi-agent conversations."""
+import sys
+from typing import List, Dict, Optional, Iterator
+
+
+class TranscriptEntry:
+    """A compact public utterance; speaker names are interned."""
+    
+    __slots__ = ("speaker", "content")
+    
+    def __init__(self, speaker: Optional[str], content: str):
+        self.speaker = sys.intern(speaker) if speaker else None
+        self.content = content
+    
+    def render(self, viewer: Optional[str]) -> Dict[str, str]:
+        """Render as a chat message from the point of view of ``viewer``."""
+        if self.speaker is not None and self.speaker == viewer:
+            return {"role": "assistant", "content": self.content}
+        if self.speaker is None:
+            return {"role": "user", "content": self.content}
+        return {"role": "user", "content": f"{self.speaker}: {self.content}"}
+
+
+class SharedTranscript:
+    """Append-only log of public utterances referenced by every agent in a system.
+
+    Each utterance is stored once, no matter how many agents can see it.
+    Agents render their own request view from it lazily.
+    """
+    
+    def __init__(self):
+        self.entries: List[TranscriptEntry] = []
+    
+    def append(self, speaker: Optional[str], content: str) -> int:
+        """Append an utterance; ``speaker`` None marks a narrator message. Returns its index."""
+        self.entries.append(TranscriptEntry(speaker, content))
+        return len(self.entries) - 1
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def render(self, viewer: Optional[str], start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """Render a range of entries as chat messages for ``viewer``."""
+        entries = self.entries
+        for index in range(start, len(entries) if stop is None else stop):
+            yield entries[index].render(viewer)
+    
+    def clear(self):
+        """Drop every entry."""
+        self.entries = []